@@ -7,10 +7,17 @@ from typing import TYPE_CHECKING
 
 from lektor.build_programs import BuildProgram
 from lektor.context import get_ctx
+from lektor.pluginsystem import get_plugin
+
+from .sourceobj import IndexRoot
 
 if TYPE_CHECKING:
     from lektor.builder import Artifact
-    from lektor.sourceobj import SourceObject
+    from lektor.environment import Environment
+
+    from .plugin import IndexPagesPlugin
+    from .prerender import Prerenderer
+    from .sourceobj import IndexBase
 
 
 class IndexBuildProgram(BuildProgram):  # type: ignore[misc]
@@ -18,39 +25,93 @@ class IndexBuildProgram(BuildProgram):  # type: ignore[misc]
         source = self.source
         record = source.record
 
-        if source.is_visible:
-            pagination_enabled = source.datamodel.pagination_config.enabled
-            if not pagination_enabled or source.page_num is not None:
-                artifact_name = source.url_path
-                if artifact_name.endswith("/"):
-                    artifact_name += "index.html"
-                # We don't really depend on record — the index doesn't
-                # change if the parent page contents do.  However, if
-                # no sources are listed here, the index will be pruned
-                # immediately after the build.  I guess this will do.
-                sources = [record.source_filename]
-                self.declare_artifact(artifact_name, sources=sources)
+        artifact_name = get_artifact_name(source)
+        if artifact_name is not None:
+            # We don't really depend on record — the index doesn't
+            # change if the parent page contents do.  However, if
+            # no sources are listed here, the index will be pruned
+            # immediately after the build.  I guess this will do.
+            sources = [record.source_filename]
+            self.declare_artifact(artifact_name, sources=sources)
+
+        if isinstance(source, IndexRoot):
+            prerenderer = get_prerenderer(source.pad.env)
+            if prerenderer is not None:
+                prerenderer.prerender(source, self.build_state)
 
     def build_artifact(self, artifact: Artifact) -> None:
         config_filename = self.source.datamodel.filename
         template = self.source._data["_template"]
 
+        ctx = get_ctx()
         if config_filename is not None:
-            ctx = get_ctx()
             if ctx is not None:
                 ctx.record_dependency(config_filename)
 
+        prerenderer = get_prerenderer(self.source.pad.env)
+        if prerenderer is not None:
+            rendered = prerenderer.take(artifact.artifact_name)
+            if rendered is not None:
+                rendered.write_into(artifact, ctx)
+                return
+
         artifact.render_template_into(template, this=self.source)
 
-    def iter_child_sources(self) -> Generator[SourceObject]:
-        source = self.source
-        pagination_config = source.datamodel.pagination_config
+    def iter_child_sources(self) -> Generator[IndexBase]:
+        return iter_child_sources(self.source)
+
+
+def get_artifact_name(source: IndexBase) -> str | None:
+    """Get the name of the artifact produced by an index source.
+
+    Returns ``None`` if the source does not produce an artifact.
+
+    """
+    if source.is_visible:
+        pagination_enabled = source.datamodel.pagination_config.enabled
+        if not pagination_enabled or source.page_num is not None:
+            artifact_name: str = source.url_path
+            if artifact_name.endswith("/"):
+                artifact_name += "index.html"
+            return artifact_name
+    return None
+
+
+def iter_child_sources(source: IndexBase) -> Generator[IndexBase]:
+    """Iterate over the (direct) child sources of an index source."""
+    pagination_config = source.datamodel.pagination_config
+
+    if pagination_config.enabled and source.page_num is None:
+        num_pages = pagination_config.count_pages(source)
+        for page_num in range(1, num_pages + 1):
+            yield source.__for_page__(page_num)
+
+    subindexes = getattr(source, "subindexes", None)
+    if subindexes is not None:
+        yield from subindexes
+
+
+def iter_index_tree(source: IndexBase) -> Generator[IndexBase]:
+    """Iterate over an index source and all of its descendants.
+
+    Each descendant is produced only once.  (The subindexes of a
+    paginated index are the children of each of its pages.)
+
+    """
+    seen = set()
+    stack = [source]
+    while stack:
+        source = stack.pop()
+        if source.path not in seen:
+            seen.add(source.path)
+            yield source
+            stack.extend(reversed(list(iter_child_sources(source))))
 
-        if pagination_config.enabled and source.page_num is None:
-            num_pages = pagination_config.count_pages(source)
-            for page_num in range(1, num_pages + 1):
-                yield source.__for_page__(page_num)
 
-        subindexes = getattr(source, "subindexes", None)
-        if subindexes is not None:
-            yield from subindexes
+def get_prerenderer(env: Environment) -> Prerenderer | None:
+    try:
+        plugin: IndexPagesPlugin = get_plugin("index-pages", env)
+    except LookupError:
+        return None  # testing
+    else:
+        return plugin.prerenderer
@@ -0,0 +1,319 @@
+"""Compact storage for the children of index nodes.
+
+Every node in an index tree selects its children from the same
+sequence of items: the items of the index root.  For indexes with many
+keys (e.g. thousands of tags) storing a separate list of id strings for
+each node duplicates the same ids many times over.
+
+Here, the ids of the items are stored once, in an ``IdTable``.  The
+children of each node are stored as an array of integer ordinals into
+that table.  The ids are only looked up when the children are iterated
+over.
+
+"""
+
+from __future__ import annotations
+
+import posixpath
+from array import array
+from bisect import bisect_left
+from typing import Any
+from typing import Final
+from typing import Generator
+from typing import Iterable
+from typing import Iterator
+from typing import overload
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+from lektor.context import get_ctx
+from lektor.db import Record
+from lektor.environment import PRIMARY_ALT
+from lektorlib.query import get_source
+from lektorlib.query import PrecomputedQuery
+
+if TYPE_CHECKING:
+    from lektor.db import Pad
+
+
+# Typecode for arrays of ordinals.  (Guaranteed to be at least 32 bits
+# on all platforms we care about.)
+ORDINAL_TYPECODE: Final = "I"
+
+
+class IdTable:
+    """An interned, ordered table of the ids of an index root's items.
+
+    ``undiscoverable`` should be set if any of the items is undiscoverable
+    (or hidden.)  Queries over such items may skip some of them when
+    iterated over.
+
+    """
+
+    __slots__ = ("ids", "undiscoverable", "_ordinals")
+
+    def __init__(self, ids: Iterable[str], undiscoverable: bool = False):
+        self.ids = tuple(ids)
+        self.undiscoverable = undiscoverable
+        self._ordinals = {id_: n for n, id_ in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # The ordinals dict is rebuilt, rather than pickled
+        return IdTable, (self.ids, self.undiscoverable)
+
+    def ordinal(self, id_: str) -> int | None:
+        """Get the ordinal of ``id_``, or ``None`` if it is not in the table."""
+        return self._ordinals.get(id_)
+
+    def all(self) -> ChildIds:
+        """Get a ``ChildIds`` containing all ids in the table."""
+        return ChildIds(self, range(len(self.ids)))
+
+    def select(self, ids: Iterable[str]) -> ChildIds:
+        """Get a ``ChildIds`` containing the given ids.
+
+        The result is always in table order.  Ids which are not in the
+        table are ignored.
+
+        """
+        ordinals = map(self._ordinals.get, ids)
+        return ChildIds(self, (n for n in ordinals if n is not None))
+
+
+class ChildIds(Sequence[str]):
+    """An ordered subset of the ids in an ``IdTable``.
+
+    The subset is stored as a sorted array of ordinals.  Since the
+    ordinals are sorted, iteration is in table order, and membership
+    can be tested by bisection.
+
+    (The ordinals may also be a read-only ``memoryview`` into a
+    memory-mapped key file.  See ``lektor_index_pages.keyfile``.)
+
+    """
+
+    __slots__ = ("table", "ordinals")
+
+    ordinals: Sequence[int]
+
+    def __init__(self, table: IdTable, ordinals: Iterable[int]):
+        self.table = table
+        self.ordinals = array(ORDINAL_TYPECODE, sorted(set(ordinals)))
+
+    @classmethod
+    def _from_sorted(cls, table: IdTable, ordinals: Sequence[int]) -> ChildIds:
+        rv = cls.__new__(cls)
+        rv.table = table
+        rv.ordinals = ordinals
+        return rv
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> ChildIds: ...
+
+    def __getitem__(self, index: int | slice) -> str | ChildIds:
+        if isinstance(index, slice):
+            return self._from_sorted(self.table, self.ordinals[index])
+        return self.table.ids[self.ordinals[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.table.ids.__getitem__, self.ordinals)
+
+    def __contains__(self, id_: object) -> bool:
+        if not isinstance(id_, str):
+            return False
+        ordinal = self.table.ordinal(id_)
+        if ordinal is None:
+            return False
+        ordinals = self.ordinals
+        i = bisect_left(ordinals, ordinal)
+        return i < len(ordinals) and ordinals[i] == ordinal
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        ordinals = array(ORDINAL_TYPECODE, self.ordinals)
+        return ChildIds._from_sorted, (self.table, ordinals)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {list(self)!r}>"
+
+
+def item_id(items_path: str, path: str) -> str:
+    """The id of the item at ``path``, relative to ``items_path``.
+
+    Normally, the items of an index are the children of a single record,
+    and the id of each is simply its ``_id``.  The items of indexes with
+    several ``source_paths`` are queried relative to the root record, so
+    their ids are their full paths (less the leading slash.)
+
+    """
+    prefix = items_path.rstrip("/") + "/"
+    assert path.startswith(prefix)
+    return path[len(prefix) :]
+
+
+class ChildQuery(PrecomputedQuery[Record]):
+    """A ``PrecomputedQuery`` whose children are given by a ``ChildIds``.
+
+    ``PrecomputedQuery`` copies its child ids into an ``OrderedDict``.
+    Its methods only ever iterate over, count, or test membership in that
+    collection, all of which ``ChildIds`` supports directly.  We override
+    each of those methods to use our ``ChildIds`` instead, so that no copy
+    is made.  (``PrecomputedQuery``'s own, private, copy is left empty.)
+
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pad: Pad,
+        child_ids: ChildIds,
+        alt: str = PRIMARY_ALT,
+    ):
+        super().__init__(path, pad, (), alt=alt)
+        self.child_ids = child_ids
+
+    def _get(
+        self,
+        id: str,
+        persist: bool = True,
+        page_num: Any = Ellipsis,
+    ) -> Record | None:
+        if id not in self.child_ids:
+            return None  # not in our query set
+        return self._load(id, persist, page_num)
+
+    def _load(
+        self, id: str, persist: bool = True, page_num: Any = Ellipsis
+    ) -> Record | None:
+        """Load one of our children, without checking that it is one."""
+        return get_source(
+            self.pad,
+            path=f"{self.path}/{id}",
+            page_num=self._page_num if page_num is Ellipsis else page_num,
+            alt=self.alt,
+            persist=persist,
+        )
+
+    def _track_dependencies(self) -> None:
+        """Record the dependencies of iterating over this query."""
+        self_record = self.pad.get(self.path, alt=self.alt)
+        if self_record is not None:
+            self.pad.db.track_record_dependency(self_record)
+
+    def _iterate(self) -> Generator[Record]:
+        self._track_dependencies()
+        # (Our ids need not be checked for membership, which, for
+        # ``SqlChildIds``, would take a query per id.)
+        for id_ in self.child_ids:
+            record = self._load(id_, persist=False)
+            if record is None:
+                raise RuntimeError(f"could not load source for {self.path}/{id_}")
+            if not record.is_attachment and self._matches(record):
+                yield record
+
+    def count(self) -> int:
+        if self._pristine:
+            return len(self.child_ids)
+        return super(PrecomputedQuery, self).count()  # type: ignore[no-any-return]
+
+    def get(self, id: str, page_num: Any = Ellipsis) -> Record | None:
+        if id in self.child_ids:
+            return self._get(id, page_num=page_num)
+        return None
+
+    def __bool__(self) -> bool:
+        if self._pristine:
+            return len(self.child_ids) > 0
+        return super(PrecomputedQuery, self).__bool__()  # type: ignore[no-any-return]
+
+    def _may_skip_records(self) -> bool:
+        """Whether iteration may skip any of our children."""
+        if self._filters:
+            return True
+        if not self.child_ids.table.undiscoverable:
+            # (Hidden records are also undiscoverable.)
+            return False
+        include_hidden = self._include_hidden
+        return not self._include_undiscoverable or (
+            include_hidden is not None and not include_hidden
+        )
+
+    def __iter__(self) -> Iterator[Record]:
+        # When the query is only offset and/or limited (as for a page of
+        # a paginated index), slice our ids rather than skipping over
+        # records.  (For ``SqlChildIds`` this becomes a range query.)
+        # This is only possible if no records are skipped, and the order
+        # of our ids is kept.
+        if (
+            (self._offset is None and self._limit is None)
+            or self._order_by
+            or self._may_skip_records()
+        ):
+            return super().__iter__()  # type: ignore[no-any-return]
+        start = self._offset or 0
+        stop = start + self._limit if self._limit else None
+        sliced = self._clone()
+        sliced._offset = sliced._limit = None
+        sliced.child_ids = self.child_ids[start:stop]
+        return iter(sliced)
+
+
+class ItemsQuery(ChildQuery):
+    """A ``ChildQuery`` standing in for the materialized items of an index root.
+
+    When iterated over, a live Lektor query records a dependency on its
+    parent record, and on the directory of that record, so that adding or
+    removing children triggers a rebuild.  Since this stands in for such a
+    query, we do the same.  (For items gathered from several
+    ``source_paths``, we record dependencies on each source record, and
+    its directory, rather than on the root record.  For ``recursive``
+    items, which include the children of other items, we also record a
+    dependency on the directory of each item, whichever page of them is
+    iterated over.)
+
+    Our items have already been selected by the items query, which may
+    have included hidden or undiscoverable records.  So, by default, they
+    are not filtered again by visibility.
+
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pad: Pad,
+        child_ids: ChildIds,
+        alt: str = PRIMARY_ALT,
+        source_paths: Sequence[str] = (),
+        recursive: bool = False,
+    ):
+        super().__init__(path, pad, child_ids, alt=alt)
+        self._include_hidden = True
+        self._include_undiscoverable = True
+        self.source_paths = tuple(source_paths) or (path,)
+        self.recursive = recursive
+        # All of our items.  (When iterating over a page of a paginated
+        # index, ``child_ids`` is sliced to the items on that page.)
+        self.item_ids = child_ids
+
+    def _track_dependencies(self) -> None:
+        pad = self.pad
+        for path in self.source_paths:
+            source = pad.get(path, alt=self.alt)
+            if source is not None:
+                pad.db.track_record_dependency(source)
+        ctx = get_ctx()
+        if ctx is not None:
+            to_fs_path = pad.db.to_fs_path
+            for path in self.source_paths:
+                ctx.record_dependency(to_fs_path(path))
+            if self.recursive:
+                for id_ in self.item_ids:
+                    ctx.record_dependency(to_fs_path(posixpath.join(self.path, id_)))
@@ -0,0 +1,134 @@
+"""Command line tools for inspecting index-pages configurations.
+
+Lektor (as of 3.3) provides no way for plugins to add subcommands to
+the ``lektor`` command, so these are installed as a separate
+``lektor-index-pages`` command.
+
+"""
+
+from __future__ import annotations
+
+from typing import TextIO
+
+import click
+from lektor.builder import PathCache
+from lektor.db import Database
+from lektor.environment import PRIMARY_ALT
+from lektor.pluginsystem import get_plugin
+from lektor.project import Project
+
+from .plan import iter_plans
+from .plan import write_plan
+from .stats import iter_index_stats
+
+
+@click.group()
+@click.option(
+    "--project",
+    type=click.Path(),
+    help="The path to the lektor project to work with.",
+)
+@click.pass_context
+def cli(ctx: click.Context, project: str | None) -> None:
+    """Inspect the indexes of a Lektor project."""
+    if project is not None:
+        lektor_project = Project.from_path(project)
+    else:
+        lektor_project = Project.discover()
+    if lektor_project is None:
+        raise click.UsageError("Could not find a Lektor project.")
+    ctx.obj = lektor_project
+
+
+@cli.command()
+@click.option(
+    "--alt",
+    default=PRIMARY_ALT,
+    help="The alternative to compute the indexes for.",
+)
+@click.pass_obj
+def stats(project: Project, alt: str) -> None:
+    """Compute every configured index, and report statistics.
+
+    For each level of each index, this reports the number of keys, the
+    maximum and median number of children per key, and the number of
+    pages which will be generated.  Also reported, for each index, are the
+    time taken to compute it, and the memory used by its cached data.
+
+    """
+    env = project.make_env(load_plugins=True)
+    plugin = get_plugin("index-pages", env)
+    config = plugin.read_config()
+    pad = Database(env).new_pad()
+
+    for index_stats in iter_index_stats(config, pad, plugin.cache, alt):
+        click.echo(
+            f"[{index_stats.index_name}]  "
+            f"{index_stats.seconds * 1000:.1f} ms, "
+            f"{index_stats.cache_bytes / 1024:.1f} KiB cached"
+        )
+        for level in index_stats.levels:
+            click.echo(
+                f"  {level.name}: {level.keys} keys, "
+                f"children per key: max {level.max_children}, "
+                f"median {level.median_children:g}, "
+                f"{level.pages} pages"
+            )
+
+
+@cli.command()
+@click.pass_obj
+def check(project: Project) -> None:
+    """Check the configuration for errors.
+
+    This compiles the Jinja expressions of every configured index.
+    (Otherwise, each expression is compiled only when first used.)
+
+    """
+    env = project.make_env(load_plugins=True)
+    plugin = get_plugin("index-pages", env)
+    try:
+        plugin.read_config().validate()
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo("No errors found.")
+
+
+@cli.command()
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="The file to write the plan to.  (Defaults to standard output.)",
+)
+@click.pass_obj
+def plan(project: Project, output: TextIO) -> None:
+    """List the artifacts which would be built for the indexes.
+
+    Every configured index is computed, for every alternative, and the
+    name and source checksum of each artifact which would be produced is
+    written out.  No templates are rendered.
+
+    """
+    env = project.make_env(load_plugins=True)
+    plugin = get_plugin("index-pages", env)
+    pad = Database(env).new_pad()
+    write_plan(iter_plans(plugin.read_config(), pad, PathCache(env)), output)
+
+
+@cli.command("write-keys")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.pass_obj
+def write_keys(project: Project, output: str) -> None:
+    """Compute every configured index, and write a key file.
+
+    The key file contains the grouping of the items of every index, for
+    every alternative.  Passing the ``index-pages:keys=OUTPUT`` extra
+    flag to ``lektor build`` loads the groupings from the key file, rather
+    than computing them.
+
+    """
+    env = project.make_env(load_plugins=True)
+    plugin = get_plugin("index-pages", env)
+    plugin.write_key_file(Database(env).new_pad(), output)
@@ -3,7 +3,10 @@
 from __future__ import annotations
 
 from itertools import chain
+from typing import Container
 from typing import Generator
+from typing import Iterable
+from typing import NamedTuple
 from typing import Sequence
 from typing import TYPE_CHECKING
 
@@ -12,7 +15,9 @@ from lektorlib.recordcache import get_or_create_virtual
 
 from .indexmodel import index_models_from_ini
 from .indexmodel import VIRTUAL_PATH_PREFIX
+from .sourceobj import get_cache
 from .sourceobj import IndexRoot
+from .sourceobj import IndexSource
 
 if TYPE_CHECKING:
     from inifile import IniFile
@@ -21,16 +26,72 @@ if TYPE_CHECKING:
     from lektor.environment import Environment
 
     from .indexmodel import IndexRootModel
-    from .sourceobj import IndexSource
 
 
 class NoSuchIndex(KeyError):
     pass
 
 
+class ResolvedPath(NamedTuple):
+    """A pad-independent description of the index source at a virtual path.
+
+    The source is found by descending from the index root through the
+    subindexes with ids ``subindex_ids``, then selecting page ``page_num``.
+
+    """
+
+    subindex_ids: tuple[str, ...]
+    page_num: int | None
+
+    @classmethod
+    def from_source(cls, source: IndexRoot | IndexSource) -> ResolvedPath:
+        page_num = source.page_num
+        ids = []
+        while isinstance(source, IndexSource):
+            ids.append(source._id)
+            source = source.parent
+        return cls(tuple(reversed(ids)), page_num)
+
+    def get_source(self, index_root: IndexRoot) -> IndexRoot | IndexSource:
+        source: IndexRoot | IndexSource = index_root
+        for id_ in self.subindex_ids:
+            source = source._get_subindex(id_)
+        if self.page_num is not None:
+            source = source.__for_page__(self.page_num)
+        return source
+
+
+# Storage backends for the index groupings
+CACHE_BACKENDS = ("memory", "sqlite")
+
+
 class Config:
-    def __init__(self, index_models: dict[str, IndexRootModel]):
+    def __init__(
+        self,
+        index_models: dict[str, IndexRootModel],
+        *,
+        prerender_workers: int = 0,
+        lazy_resolve: bool = False,
+        persist_cache: bool = False,
+        cache_backend: str = "memory",
+    ):
         self.index_models = index_models
+        self.prerender_workers = prerender_workers
+        self.lazy_resolve = lazy_resolve
+        self.persist_cache = persist_cache
+        self.cache_backend = cache_backend
+
+    def validate(self, index_names: Iterable[str] | None = None) -> None:
+        """Compile the expressions of the configured indexes.
+
+        If ``index_names`` is given, only the named indexes are validated.
+        This raises ``RuntimeError`` if any expression is invalid.
+
+        """
+        if index_names is None:
+            index_names = self.index_models
+        for index_name in index_names:
+            self.index_models[index_name].validate()
 
     def get_index_root(
         self, index_name: str, pad: Pad, alt: str = PRIMARY_ALT
@@ -46,9 +107,19 @@ class Config:
             )
         return IndexRoot.get_index(index_model, record)
 
-    def iter_index_roots(self, record: Record) -> Generator[IndexRoot]:
+    def iter_index_roots(
+        self, record: Record, index_names: Container[str] | None = None
+    ) -> Generator[IndexRoot]:
+        """Iterate over the roots of the indexes whose parent is ``record``.
+
+        If ``index_names`` is given, only the roots of the named indexes are
+        produced.
+
+        """
         record_path = record.path
-        for index_model in self.index_models.values():
+        for index_name, index_model in self.index_models.items():
+            if index_names is not None and index_name not in index_names:
+                continue
             if index_model.parent_path == record_path:
                 yield IndexRoot.get_index(index_model, record)
 
@@ -71,10 +142,33 @@ class Config:
         self, record: Record, pieces: Sequence[str]
     ) -> IndexRoot | IndexSource | None:
         index_model = self.index_models.get(pieces[0])
-        if index_model and index_model.parent_path == record.path:
-            index_root = IndexRoot.get_index(index_model, record)
-            return index_root.resolve_virtual_path(pieces[1:])
-        return None
+        if not index_model or index_model.parent_path != record.path:
+            return None
+        index_root = IndexRoot.get_index(index_model, record)
+
+        # The devserver uses a fresh pad for each request, so the above
+        # caching on the pad does not help much there.  We also cache, in
+        # the plugin cache, a description of where the resolved source is
+        # in the index tree, so that we need not search for it again.
+        # (Failures are not cached, since the devserver may be asked for
+        # any number of missing paths.)
+        def resolve() -> ResolvedPath | None:
+            source = index_root.resolve_virtual_path(pieces[1:])
+            return None if source is None else ResolvedPath.from_source(source)
+
+        path = "/".join(chain([index_root.path], pieces[1:]))
+        cache_key = "resolved_path", path, record.alt
+        cache = get_cache(record.pad)
+        if cache_key in cache:
+            resolved = cache.get_or_create(cache_key, resolve)
+        else:
+            resolved = resolve()
+            if resolved is not None:
+                found = resolved
+                cache.get_or_create(cache_key, lambda: found)
+        if resolved is None:
+            return None
+        return resolved.get_source(index_root)
 
     def resolve_url_path(
         self, record: Record, url_path: Sequence[str]
@@ -91,4 +185,16 @@ class Config:
         for root_model in index_models_from_ini(env, inifile):
             index_name = root_model.index_name
             index_models[index_name] = root_model
-        return cls(dict(index_models))
+        cache_backend = inifile.get("cache.backend", "memory")
+        if cache_backend not in CACHE_BACKENDS:
+            raise RuntimeError(
+                f"{inifile.filename}: section [cache]: "
+                f"unknown backend {cache_backend!r}"
+            )
+        return cls(
+            dict(index_models),
+            prerender_workers=inifile.get_int("prerender.workers", 0),
+            lazy_resolve=inifile.get_bool("resolver.lazy", False),
+            persist_cache=inifile.get_bool("cache.persist", False),
+            cache_backend=cache_backend,
+        )
@@ -0,0 +1,120 @@
+"""Memoized rendering of item fragments.
+
+An item (e.g. a blog post) typically appears on many index pages: on
+its year page, on its month page, on the page of each of its tags, and
+so on.  Index templates commonly render a teaser for each of their
+items.  The ``index_fragment`` template global renders such a fragment
+(a template whose ``this`` is the item) just once per build, and reuses
+the resulting HTML on every index page on which the item appears.
+
+The dependencies recorded while a fragment is rendered (e.g. on the
+template files) are remembered, and replayed into the build context of
+each index page which reuses the fragment, so that Lektor still knows
+when to rebuild those pages.
+
+A memoized fragment is discarded when the fingerprint of the item's
+source files (their names, sizes and modification times) changes.  All
+memoized fragments are discarded at the start of each build.
+
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+from lektor.context import get_ctx
+from markupsafe import Markup
+
+if TYPE_CHECKING:
+    from lektor.context import Context
+    from lektor.db import Record
+    from lektor.sourceobj import VirtualSourceObject
+
+
+class Fragment(NamedTuple):
+    """A rendered fragment, and the dependencies recorded while rendering it."""
+
+    html: str
+    dependencies: frozenset[str]
+    # The (path, alt) of each virtual source depended on.  (The sources
+    # themselves are bound to the pad they were rendered with.)
+    virtual_dependencies: frozenset[tuple[str, str]]
+
+    def replay_dependencies(self, ctx: Context) -> None:
+        """Record our dependencies in a build context."""
+        for filename in self.dependencies:
+            ctx.record_dependency(filename)
+        for path, alt in self.virtual_dependencies:
+            virtual_source = ctx.pad.get(path, alt=alt)
+            if virtual_source is not None:
+                ctx.record_virtual_dependency(virtual_source)
+
+
+def source_fingerprint(record: Record) -> str:
+    """Compute a fingerprint of the source files of a record."""
+    h = hashlib.sha1()
+    for filename in record.iter_source_filenames():
+        try:
+            st = os.stat(filename)
+        except OSError:
+            h.update(f"{filename}\0missing\0".encode())
+        else:
+            h.update(f"{filename}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    return h.hexdigest()
+
+
+class FragmentCache:
+    """Render item fragments, memoizing the results."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.fragments: dict[tuple[str, str, str], tuple[str, Fragment]] = {}
+
+    def render(self, template: str, item: Record) -> Markup:
+        """Render ``template`` with ``this`` set to ``item``.
+
+        The rendered HTML is reused for subsequent calls with the same
+        template, item, and alternative.
+
+        """
+        key = template, item.path, item.alt
+        fingerprint = source_fingerprint(item)
+        with self.lock:
+            memoized = self.fragments.get(key)
+        ctx = get_ctx()
+        if memoized is not None and memoized[0] == fingerprint:
+            fragment = memoized[1]
+            if ctx is not None:
+                fragment.replay_dependencies(ctx)
+        else:
+            fragment = _render(template, item, ctx)
+            with self.lock:
+                self.fragments[key] = fingerprint, fragment
+        return Markup(fragment.html)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.fragments.clear()
+
+
+def _render(template: str, item: Record, ctx: Context | None) -> Fragment:
+    dependencies: set[str] = set()
+    virtual_dependencies: set[tuple[str, str]] = set()
+
+    def collect(dependency: str | VirtualSourceObject) -> None:
+        if isinstance(dependency, str):
+            dependencies.add(dependency)
+        else:
+            virtual_dependencies.add((dependency.path, dependency.alt))
+
+    env = item.pad.env
+    if ctx is None:
+        html = env.render_template(template, item.pad, this=item)
+    else:
+        with ctx.gather_dependencies(collect):
+            html = env.render_template(template, item.pad, this=item)
+    return Fragment(html, frozenset(dependencies), frozenset(virtual_dependencies))
@@ -2,6 +2,16 @@
 
 from __future__ import annotations
 
+import datetime
+import re
+import unicodedata
+from bisect import bisect_right
+from collections.abc import Hashable
+from itertools import groupby
+from itertools import islice
+from operator import itemgetter
+from typing import Any
+from typing import Callable
 from typing import Generator
 from typing import Iterable
 from typing import Sequence
@@ -13,10 +23,14 @@ from jinja2 import TemplateSyntaxError
 from lektor.environment import Expression
 from lektor.utils import slugify
 from more_itertools import always_iterable
+from werkzeug.utils import cached_property
+
+from .childids import item_id
 
 if TYPE_CHECKING:
     from _typeshed import StrPath
     from inifile import IniFile
+    from lektor.db import Pad
     from lektor.db import Query
     from lektor.db import Record
     from lektor.environment import Environment
@@ -81,9 +95,132 @@ class IndexModelBase:
         self.datamodel = datamodel
         self.subindex_model = subindex_model
 
+    def validate(self) -> None:
+        """Compile our expressions, and those of our sub-indexes.
+
+        Expressions are otherwise compiled only when first used.  This
+        raises ``RuntimeError`` if any expression is invalid.
+
+        """
+        if self.subindex_model is not None:
+            self.subindex_model.validate()
+
+
+class ItemsModel:
+    """The set of items indexed by one or more index roots.
+
+    Index roots configured with the same ``parent_path`` and ``items``
+    (or ``source_paths``, ``order_by`` and ``recursive``) index the same
+    items.  They share an ``ItemsModel``, so that the items need only be
+    enumerated — and their keys evaluated — once for all of those indexes.
+
+    If ``source_paths`` are given, the items are the children of each of
+    the records at those paths.  They are ordered by ``order_by``, if
+    given, otherwise by source, then by each source's own child order.
+
+    If ``recursive`` is set, the items are all the descendants of the
+    parent record (or of each of the ``source_paths``), rather than just
+    their children.  The tree is walked depth-first, each record being
+    followed by its descendants.  Undiscoverable (e.g. hidden) records,
+    along with all of their descendants, are skipped.
+
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        parent_path: str,
+        items: str | None = None,
+        *,
+        source_paths: Sequence[str] = (),
+        order_by: Sequence[str] = (),
+        recursive: bool = False,
+        section: str,
+        config_filename: StrPath,
+    ):
+        expr = ExpressionCompiler(env, section=section, filename=config_filename)
+        self.parent_path = parent_path
+        self.items = items
+        self.items_expr = expr("items", items) if items else None
+        self.source_paths = tuple(source_paths)
+        self.order_by = tuple(order_by)
+        self.recursive = recursive
+        self.index_models: list[IndexRootModel] = []
+
+    @property
+    def cache_id(self) -> Hashable:
+        """Identifies our items, among those of the same parent, in cache keys."""
+        if self.source_paths or self.recursive:
+            return self.source_paths, self.order_by, self.recursive
+        return self.items
+
+    def validate(self) -> None:
+        if self.items_expr is not None:
+            self.items_expr.validate()
+
+    def get_items(self, record: IndexBase) -> Query:
+        items_expr = self.items_expr
+        if items_expr is None:
+            return record.children
+        return items_expr.__get__(record)
+
+    def get_item_ids(self, record: IndexBase) -> tuple[str, str, list[str], bool]:
+        """Enumerate the items to be indexed.
+
+        Returns the path and alt of the query the items belong to, the ids
+        (see ``item_id``) of the items, in order, and whether any of the
+        items is undiscoverable.
+
+        """
+        if self.source_paths:
+            path = "/"
+            sources = [
+                record.pad.get(source_path, alt=record.alt)
+                for source_path in self.source_paths
+            ]
+        elif self.recursive:
+            path = record.path
+            sources = [record]
+        else:
+            items = self.get_items(record)
+            records = list(items)
+            return (
+                items.path,
+                items.alt,
+                [post["_id"] for post in records],
+                any(post.is_undiscoverable for post in records),
+            )
+
+        posts: list[Record] = []
+        for source in sources:
+            if source is not None:
+                posts.extend(self._iter_children(source))
+        if self.order_by:
+            order_by = self.order_by
+            # (The sort is stable, so ties are kept in source order.)
+            posts.sort(key=lambda post: post.get_sort_key(order_by))
+        # (The children queries skip undiscoverable records.)
+        return path, record.alt, [item_id(path, post.path) for post in posts], False
+
+    def _iter_children(self, record: Record) -> Generator[Record]:
+        if not self.recursive:
+            yield from record.children
+            return
+        # Walk the tree once, depth-first.  (The default children query
+        # skips undiscoverable records, so their subtrees are pruned.)
+        stack = [iter(record.children)]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+            else:
+                yield child
+                stack.append(iter(child.children))
+
 
 class IndexRootModel(IndexModelBase):
     data_descriptors = ()
+    subindex_model: IndexModel
 
     def __init__(
         self,
@@ -93,6 +230,7 @@ class IndexRootModel(IndexModelBase):
         *,
         parent_path: str | None = None,
         items: str | None = None,
+        items_model: ItemsModel | None = None,
         config_filename: StrPath,
     ):
         super().__init__(
@@ -101,12 +239,25 @@ class IndexRootModel(IndexModelBase):
 
         if parent_path is None:
             parent_path = "/"
-
-        expr = ExpressionCompiler(env, section=index_name, filename=config_filename)
+        if items_model is None:
+            items_model = ItemsModel(
+                env,
+                parent_path,
+                items,
+                section=index_name,
+                config_filename=config_filename,
+            )
+        assert items_model.parent_path == parent_path
+        assert items_model.items == items
+        items_model.index_models.append(self)
 
         self.index_name = index_name
         self.parent_path = parent_path
-        self.items_expr = expr("items", items) if items else None
+        self.items_model = items_model
+
+    def validate(self) -> None:
+        self.items_model.validate()
+        super().validate()
 
     def get_virtual_path(
         self, parent: SourceObject, id_: str | None = None, page_num: int | None = None
@@ -119,17 +270,14 @@ class IndexRootModel(IndexModelBase):
         return None
 
     def get_items(self, record: IndexBase) -> Query:
-        items_expr = self.items_expr
-        if items_expr is None:
-            return record.children
-        return items_expr.__get__(record)
+        return self.items_model.get_items(record)
 
 
 class IndexModel(IndexModelBase):
     def __init__(
         self,
         env: Environment,
-        key: str,
+        key: str | None,
         *,
         template: str | None = None,
         slug_format: str | None = None,
@@ -149,18 +297,28 @@ class IndexModel(IndexModelBase):
         if template is None:
             template = "index-pages.html"
         expr = ExpressionCompiler(env, section=index_name, filename=config_filename)
+        self.index_name = index_name
         self.template = template
-        self.key_expr = expr("key", key)
+        # (Subclasses which compute keys natively pass key=None)
+        self.key_expr = expr("key", key) if key is not None else None
         self.slug_expr = expr("slug_format", slug_format) if slug_format else None
 
         fields_section = f"{index_name}.fields"
         field = ExpressionCompiler(
             env, section=fields_section, filename=config_filename
         )
-        self.data_descriptors = [
+        self.data_descriptors: list[tuple[str, Any]] = [
             (name, field(name, expr)) for name, expr in dict(fields or ()).items()
         ]
 
+    def validate(self) -> None:
+        descriptors = [self.key_expr, self.slug_expr]
+        descriptors.extend(descriptor for _, descriptor in self.data_descriptors)
+        for descriptor in descriptors:
+            if isinstance(descriptor, FieldDescriptor):
+                descriptor.validate()
+        super().validate()
+
     def get_virtual_path(
         self, parent: IndexBase, id_: str, page_num: int | None = None
     ) -> str:
@@ -189,6 +347,7 @@ class IndexModel(IndexModelBase):
         return None
 
     def keys_for_post(self, record: Record) -> Iterable[str]:
+        assert self.key_expr is not None
         keys = self.key_expr.evaluate(
             record.pad, values={"item": record}, alt=record.alt
         )
@@ -203,10 +362,320 @@ class IndexModel(IndexModelBase):
         return slugify(slug)  # type: ignore[no-any-return]
 
 
+class FieldIndexModel(IndexModel):
+    """Base for index types which natively group items by a field value.
+
+    These do not evaluate any Jinja expressions to determine the keys.
+
+    """
+
+    def __init__(self, env: Environment, field: str, **kwargs: Any):
+        super().__init__(env, None, **kwargs)
+        self.field = field
+
+    def get_value(self, record: Record) -> object:
+        # Items which lack the field (e.g. those of a different model)
+        # are not indexed.
+        return record[self.field] if self.field in record else None
+
+    def keys_for_post(self, record: Record) -> Iterable[str]:
+        # The keys for an item may depend on the values of the other items
+        raise TypeError(f"{self.__class__.__name__} only groups items natively")
+
+    def group_items(self, posts: Sequence[Record]) -> dict[str, list[int]]:
+        """Group items by key.
+
+        Returns a dict mapping each key to the (ascending) positions in
+        ``posts`` of the items having that key.
+
+        """
+        raise NotImplementedError()
+
+
+DATE_LEVELS = ("year", "month", "day")
+
+
+class DateIndexModel(FieldIndexModel):
+    """One level (year, month, or day) of a date hierarchy index.
+
+    Items are grouped by the value of a ``date`` (or ``datetime``) field.
+    The groups are ordered newest first.
+
+    """
+
+    def __init__(self, env: Environment, field: str, level: str, **kwargs: Any):
+        if level not in DATE_LEVELS:
+            raise RuntimeError(f"unknown date index level {level!r}")
+        super().__init__(env, field, **kwargs)
+        self.level = level
+
+        date_fields = ("date",) + DATE_LEVELS[: DATE_LEVELS.index(level) + 1]
+        self.data_descriptors = [
+            (name, DateFieldDescriptor(name)) for name in date_fields
+        ] + self.data_descriptors
+
+    def _get_level_value(self, record: Record) -> int | None:
+        value = self.get_value(record)
+        if not isinstance(value, datetime.date):
+            return None
+        return getattr(value, self.level)  # type: ignore[no-any-return]
+
+    def _format_key(self, value: int) -> str:
+        return f"{value:04d}" if self.level == "year" else f"{value:02d}"
+
+    def group_items(self, posts: Sequence[Record]) -> dict[str, list[int]]:
+        level_values = map(self._get_level_value, posts)
+        dated = [
+            (value, n) for n, value in enumerate(level_values) if value is not None
+        ]
+        # Newest first, then in item order
+        dated.sort(key=lambda item: (-item[0], item[1]))
+        return {
+            self._format_key(value): [n for _, n in group]
+            for value, group in groupby(dated, key=itemgetter(0))
+        }
+
+
+class DateFieldDescriptor:
+    """Typed fields for the sources of a date index.
+
+    The values are computed from the keys of the source and its ancestors.
+
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, source: IndexBase) -> int | datetime.date:
+        parts = {}
+        while isinstance(source._model, DateIndexModel):
+            parts[source._model.level] = int(source._id)
+            source = source.parent
+        if self.name == "date":
+            return datetime.date(
+                parts["year"], parts.get("month", 1), parts.get("day", 1)
+            )
+        return parts[self.name]
+
+
+class RangeIndexModel(FieldIndexModel):
+    """An index which groups items into buckets by a numeric field value.
+
+    The buckets are delimited either by a fixed ascending sequence of
+    ``edges``, or (if ``nbuckets`` is given instead) by edges chosen so
+    that each bucket contains roughly the same number of items.  Each
+    bucket includes its lower edge.  The last bucket is open-ended.
+    Items whose value is below the first edge are not indexed.
+
+    The buckets are ordered by ascending value.
+
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        field: str,
+        *,
+        edges: Sequence[float] | None = None,
+        nbuckets: int | None = None,
+        **kwargs: Any,
+    ):
+        if (edges is None) == (nbuckets is None):
+            raise ValueError("exactly one of edges or nbuckets must be given")
+        if edges is not None and (
+            not edges or any(lo >= hi for lo, hi in zip(edges, edges[1:]))
+        ):
+            raise ValueError("bucket edges must be strictly ascending")
+        if nbuckets is not None and nbuckets < 1:
+            raise ValueError("the number of buckets must be positive")
+        super().__init__(env, field, **kwargs)
+        self.edges = tuple(edges) if edges is not None else None
+        self.nbuckets = nbuckets
+
+        self.data_descriptors = [
+            (name, RangeFieldDescriptor(name)) for name in ("low", "high")
+        ] + self.data_descriptors
+
+    def _get_numeric_value(self, record: Record) -> float | None:
+        value = self.get_value(record)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value
+
+    def _equal_frequency_edges(self, values: Sequence[float]) -> list[float]:
+        assert self.nbuckets is not None
+        nvalues = len(values)
+        if nvalues == 0:
+            return []
+        quantiles = (values[nvalues * i // self.nbuckets] for i in range(self.nbuckets))
+        return sorted(set(quantiles))
+
+    def group_items(self, posts: Sequence[Record]) -> dict[str, list[int]]:
+        values = list(map(self._get_numeric_value, posts))
+        edges: Sequence[float]
+        if self.edges is not None:
+            edges = self.edges
+        else:
+            edges = self._equal_frequency_edges(
+                sorted(value for value in values if value is not None)
+            )
+
+        buckets: dict[int, list[int]] = {}
+        for n, value in enumerate(values):
+            if value is not None:
+                bucket = bisect_right(edges, value) - 1
+                if bucket >= 0:
+                    buckets.setdefault(bucket, []).append(n)
+
+        nedges = len(edges)
+        return {
+            range_key(
+                edges[bucket], edges[bucket + 1] if bucket + 1 < nedges else None
+            ): buckets[bucket]
+            for bucket in sorted(buckets)
+        }
+
+
+# Numbers in range keys are encoded so that the keys are slug-safe: a
+# minus sign is written as "m", and a decimal point as "p".
+_NUMBER_ENCODING = str.maketrans({"-": "m", ".": "p", "+": None})
+_NUMBER_DECODING = str.maketrans({"m": "-", "p": "."})
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).translate(_NUMBER_ENCODING)
+
+
+def _parse_number(value: str) -> float:
+    value = value.translate(_NUMBER_DECODING)
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def range_key(low: float, high: float | None) -> str:
+    """Compute the key for the range bucket from ``low`` up to ``high``.
+
+    The last bucket, which is open-ended, has ``high`` set to ``None``.
+    The keys contain only lower-case letters, digits and a single hyphen
+    (e.g. ``m2p5-10`` for the bucket from -2.5 up to 10), so that they are
+    unchanged when slugified.
+
+    """
+    high_str = _format_number(high) if high is not None else "up"
+    return f"{_format_number(low)}-{high_str}"
+
+
+_RANGE_KEY_RE = re.compile(r"([0-9a-z]+)-([0-9a-z]+)\Z")
+
+
+def parse_range_key(key: str) -> tuple[float, float | None]:
+    """Parse a key computed by ``range_key`` back to the bucket bounds."""
+    m = _RANGE_KEY_RE.match(key)
+    if m is None:
+        raise ValueError(f"invalid range key {key!r}")
+    low, high = m.groups()
+    return _parse_number(low), (_parse_number(high) if high != "up" else None)
+
+
+class RangeFieldDescriptor:
+    """The ``low`` and ``high`` fields of a range index source."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, source: IndexBase) -> float | None:
+        low, high = parse_range_key(source._id)
+        return low if self.name == "low" else high
+
+
+class PrefixIndexModel(FieldIndexModel):
+    """An alphabetical (A–Z) index, grouping items by the prefix of a field.
+
+    The prefix is formed from the first ``prefix_length`` alphanumeric
+    characters of the field value, upper-cased.  If ``fold`` is set,
+    accents and other diacritical marks are first stripped.  Items
+    whose field value contains no alphanumeric characters are not
+    indexed.
+
+    The buckets are sorted by prefix.  Prefixes which slugify alike (e.g.
+    ``E`` and ``É``, or ``SS`` and ``ß``) would share a URL, so their
+    buckets are merged, under the first of those prefixes.
+
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        field: str,
+        *,
+        prefix_length: int = 1,
+        fold: bool = False,
+        **kwargs: Any,
+    ):
+        if prefix_length < 1:
+            raise ValueError("prefix_length must be positive")
+        super().__init__(env, field, **kwargs)
+        self.prefix_length = prefix_length
+        self.fold = fold
+
+        self.data_descriptors = [
+            ("count", CountDescriptor()),
+        ] + self.data_descriptors
+
+    def get_prefix(self, record: Record) -> str | None:
+        value = self.get_value(record)
+        if value is None:
+            return None
+        text = str(value)
+        if self.fold:
+            text = fold_diacritics(text)
+        chars = filter(str.isalnum, text.upper())
+        prefix = "".join(islice(chars, self.prefix_length))
+        return prefix or None
+
+    def group_items(self, posts: Sequence[Record]) -> dict[str, list[int]]:
+        buckets: dict[str, list[int]] = {}
+        for n, prefix in enumerate(map(self.get_prefix, posts)):
+            if prefix is not None:
+                buckets.setdefault(prefix, []).append(n)
+
+        by_slug: dict[str, tuple[str, list[int]]] = {}
+        for prefix in sorted(buckets):
+            slug = slugify(prefix)
+            if slug in by_slug:
+                first, positions = by_slug[slug]
+                by_slug[slug] = first, sorted(positions + buckets[prefix])
+            else:
+                by_slug[slug] = prefix, buckets[prefix]
+        return dict(by_slug.values())
+
+
+def fold_diacritics(text: str) -> str:
+    """Strip accents and other combining marks from ``text``."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class CountDescriptor:
+    """The ``count`` field of a source: the number of its children."""
+
+    def __get__(self, source: IndexBase) -> int:
+        # This does not iterate over (and so does not record dependencies on)
+        # the children.
+        return source.children.count()
+
+
 class ExpressionCompiler:
     # This is here to provide useful error messages in case
     # there is a jinja syntax error within one of the evaluated
     # fields in the config file.
+    #
+    # Expressions are compiled lazily, when first used (or when the
+    # model they belong to is validated.)
 
     def __init__(self, env: Environment, filename: StrPath, section: str):
         self.env = env
@@ -223,8 +692,11 @@ class ExpressionCompiler:
         return "".join(bits)
 
     def __call__(self, name: str, expr: str) -> FieldDescriptor:
+        return FieldDescriptor(self, name, expr)
+
+    def compile(self, name: str, expr: str) -> Expression:
         try:
-            return FieldDescriptor(self.env, expr)
+            return Expression(self.env, expr)
         except TemplateSyntaxError as exc:
             raise RuntimeError(
                 f"Jinja expression syntax error in config file: {exc}\n"
@@ -234,14 +706,63 @@ class ExpressionCompiler:
 
 
 class FieldDescriptor:
-    def __init__(self, env: Environment, expr: str):
+    def __init__(self, compiler: ExpressionCompiler, name: str, expr: str):
+        self.compiler = compiler
+        self.name = name
         self.expr = expr
-        self.evaluate = Expression(env, expr).evaluate
+
+    @cached_property
+    def expression(self) -> Expression:
+        return self.compiler.compile(self.name, self.expr)
+
+    def validate(self) -> None:
+        """Compile the expression, raising ``RuntimeError`` if it is invalid."""
+        self.expression  # noqa: B018
+
+    def evaluate(
+        self,
+        pad: Pad,
+        this: object = None,
+        values: dict[str, Any] | None = None,
+        alt: str | None = None,
+    ) -> Any:
+        return self.expression.evaluate(pad, this=this, values=values, alt=alt)
 
     def __get__(self, source: SourceObject) -> object:
         return self.evaluate(source.pad, this=source, alt=source.alt)
 
 
+def group_items(
+    models: Sequence[IndexModel], posts: Sequence[Record]
+) -> list[dict[str, list[int]]]:
+    """Group items by key for several index models at once.
+
+    This makes a single pass over ``posts``, evaluating the keys of each
+    of the ``models`` for each post.  (Models which group natively group
+    the posts themselves.)  It returns a list containing, for
+    each model, a dict mapping each key to the (ascending) positions in
+    ``posts`` of the items having that key.  For models using a Jinja
+    ``key`` expression, the keys are ordered by first appearance.
+
+    """
+    groupings: list[dict[str, list[int]]] = [
+        model.group_items(posts) if isinstance(model, FieldIndexModel) else {}
+        for model in models
+    ]
+    keyed = [
+        (model, grouping)
+        for model, grouping in zip(models, groupings)
+        if not isinstance(model, FieldIndexModel)
+    ]
+    for n, post in enumerate(posts):
+        for model, grouping in keyed:
+            for key in model.keys_for_post(post):
+                positions = grouping.setdefault(key, [])
+                if not positions or positions[-1] != n:
+                    positions.append(n)
+    return groupings
+
+
 def _idify(value: object) -> str:
     """Coerce value to valid path component."""
     # Must be strings.  Can not contain '@'
@@ -254,18 +775,50 @@ def index_models_from_ini(
     def is_index(section_name: str) -> bool:
         if "." in section_name:
             return False
-        return (section_name + ".key") in inifile
+        return section_name + ".key" in inifile or section_name + ".type" in inifile
+
+    items_models: dict[tuple[str, Hashable], ItemsModel] = {}
 
     for index_name in filter(is_index, inifile.sections()):
-        parent_path = inifile.get(index_name + ".parent_path")
+        parent_path = inifile.get(index_name + ".parent_path", "/")
         items = inifile.get(index_name + ".items")
+        source_paths = _list_from_ini(inifile, index_name, "source_paths")
+        order_by = _list_from_ini(inifile, index_name, "order_by")
+        recursive = inifile.get_bool(index_name + ".recursive", False)
+        if items and (source_paths or recursive):
+            raise RuntimeError(
+                f"{inifile.filename}: section [{index_name}]: "
+                "items may not be set along with source_paths or recursive"
+            )
+        if order_by and not (source_paths or recursive):
+            raise RuntimeError(
+                f"{inifile.filename}: section [{index_name}]: "
+                "order_by requires source_paths or recursive"
+            )
         index_model = _index_model_from_ini(env, inifile, index_name)
 
+        # Indexes with the same parent_path and items (or source_paths,
+        # order_by and recursive) share their items.
+        items_model = ItemsModel(
+            env,
+            parent_path,
+            items,
+            source_paths=list(dict.fromkeys(source_paths)),
+            order_by=order_by,
+            recursive=recursive,
+            section=index_name,
+            config_filename=inifile.filename,
+        )
+        items_model = items_models.setdefault(
+            (parent_path, items_model.cache_id), items_model
+        )
+
         model = IndexRootModel(
             env,
             index_name=index_name,
             parent_path=parent_path,
             items=items,
+            items_model=items_model,
             index_model=index_model,
             config_filename=inifile.filename,
         )
@@ -282,37 +835,158 @@ def _index_model_from_ini(
         # (We ignore them on subindexes.)
         pass
 
+    index_type = inifile.get(prefix + "type")
+    if index_type is not None:
+        reader = _TYPED_INDEX_READERS.get(index_type)
+        if reader is None:
+            raise RuntimeError(
+                f"{inifile.filename}: section [{index_name}]: "
+                f"unknown index type {index_type!r}"
+            )
+        return reader(env, inifile, index_name)
+
     key = inifile.get(prefix + "key")
-    slug_format = inifile.get(prefix + "slug_format")
-    template = inifile.get(prefix + "template")
     if not key:
         raise RuntimeError("key required")
 
-    fields = _field_config_from_ini(inifile, index_name)
-    pagination_config = _pagination_config_from_ini(env, inifile, index_name)
+    return IndexModel(
+        env,
+        key=key,
+        subindex_model=_subindex_model_from_ini(env, inifile, index_name),
+        **_model_kwargs_from_ini(env, inifile, index_name),
+    )
+
 
+def _model_kwargs_from_ini(
+    env: Environment, inifile: IniFile, index_name: str
+) -> dict[str, Any]:
+    """Read the settings common to all index types."""
+    prefix = index_name + "."
+    return {
+        "template": inifile.get(prefix + "template"),
+        "slug_format": inifile.get(prefix + "slug_format"),
+        "fields": _field_config_from_ini(inifile, index_name),
+        "pagination_config": _pagination_config_from_ini(env, inifile, index_name),
+        "index_name": index_name,
+        "config_filename": inifile.filename,
+    }
+
+
+def _subindex_model_from_ini(
+    env: Environment, inifile: IniFile, index_name: str
+) -> IndexModel | None:
+    prefix = index_name + "."
     subindex = inifile.get(prefix + "subindex")
     if not subindex:
-        subindex_model = None
-    else:
-        subindex_name = prefix + subindex
-        subindex_model = _index_model_from_ini(
-            env, inifile, subindex_name, is_subindex=True
+        return None
+    subindex_name = prefix + subindex
+    return _index_model_from_ini(env, inifile, subindex_name, is_subindex=True)
+
+
+def _list_from_ini(inifile: IniFile, index_name: str, name: str) -> list[str]:
+    """Read a comma (or whitespace) separated list."""
+    value = inifile.get(f"{index_name}.{name}", "")
+    return value.replace(",", " ").split()
+
+
+def _required_from_ini(inifile: IniFile, index_name: str, name: str) -> str:
+    value: str | None = inifile.get(f"{index_name}.{name}")
+    if not value:
+        raise RuntimeError(
+            f"{inifile.filename}: section [{index_name}]: {name} required"
         )
+    return value
 
-    return IndexModel(
+
+def _date_index_model_from_ini(
+    env: Environment, inifile: IniFile, index_name: str
+) -> DateIndexModel:
+    # The configuration for the levels below the first is read from
+    # sub-sections named after the level.  E.g., for levels = year, month,
+    # the month-level configuration goes in [<index-name>.month].
+    field = _required_from_ini(inifile, index_name, "field")
+    levels = inifile.get(index_name + ".levels", "year").replace(",", " ").split()
+    if not levels or tuple(levels) != DATE_LEVELS[: len(levels)]:
+        raise RuntimeError(
+            f"{inifile.filename}: section [{index_name}]: "
+            f"levels must be one of 'year', 'year, month', or 'year, month, day'"
+        )
+
+    names = [index_name]
+    for level in levels[1:]:
+        names.append(f"{names[-1]}.{level}")
+
+    # The deepest level may have an explicitly configured subindex
+    subindex_model = _subindex_model_from_ini(env, inifile, names[-1])
+    for name, level in reversed(list(zip(names, levels))):
+        model = DateIndexModel(
+            env,
+            field,
+            level,
+            subindex_model=subindex_model,
+            **_model_kwargs_from_ini(env, inifile, name),
+        )
+        subindex_model = model
+    return model
+
+
+def _range_index_model_from_ini(
+    env: Environment, inifile: IniFile, index_name: str
+) -> RangeIndexModel:
+    # ``buckets`` is either a list of bucket edges, or (if it is a single
+    # integer) the number of equal-frequency buckets to use.
+    field = _required_from_ini(inifile, index_name, "field")
+    buckets = _required_from_ini(inifile, index_name, "buckets")
+    edges: list[float] | None = None
+    nbuckets: int | None = None
+    try:
+        if buckets.strip().isdigit():
+            nbuckets = int(buckets)
+        else:
+            edges = [_parse_number(edge) for edge in buckets.replace(",", " ").split()]
+        return RangeIndexModel(
+            env,
+            field,
+            edges=edges,
+            nbuckets=nbuckets,
+            subindex_model=_subindex_model_from_ini(env, inifile, index_name),
+            **_model_kwargs_from_ini(env, inifile, index_name),
+        )
+    except ValueError as exc:
+        raise RuntimeError(
+            f"{inifile.filename}: section [{index_name}]: "
+            f"invalid buckets {buckets!r}: {exc}"
+        ) from exc
+
+
+def _prefix_index_model_from_ini(
+    env: Environment, inifile: IniFile, index_name: str
+) -> PrefixIndexModel:
+    prefix = index_name + "."
+    field = _required_from_ini(inifile, index_name, "field")
+    prefix_length = inifile.get_int(prefix + "prefix_length", 1)
+    if prefix_length < 1:
+        raise RuntimeError(
+            f"{inifile.filename}: section [{index_name}]: "
+            f"prefix_length must be positive"
+        )
+    return PrefixIndexModel(
         env,
-        key=key,
-        template=template,
-        slug_format=slug_format,
-        fields=fields,
-        pagination_config=pagination_config,
-        subindex_model=subindex_model,
-        index_name=index_name,
-        config_filename=inifile.filename,
+        field,
+        prefix_length=prefix_length,
+        fold=inifile.get_bool(prefix + "fold", False),
+        subindex_model=_subindex_model_from_ini(env, inifile, index_name),
+        **_model_kwargs_from_ini(env, inifile, index_name),
     )
 
 
+_TYPED_INDEX_READERS: dict[str, Callable[[Environment, IniFile, str], IndexModel]] = {
+    "date": _date_index_model_from_ini,
+    "range": _range_index_model_from_ini,
+    "prefix": _prefix_index_model_from_ini,
+}
+
+
 def _field_config_from_ini(inifile: IniFile, index_name: str) -> dict[str, str]:
     section_name = index_name + ".fields"
     fields: dict[str, str] = inifile.section_as_dict(section_name)
@@ -0,0 +1,197 @@
+"""Key files: precomputed index groupings, shared between processes.
+
+When a build is sharded across several processes, each would normally
+enumerate the items of every index, and evaluate their keys, for
+itself.  Instead, the groupings may be computed once, and written to a
+key file.  Worker processes then load the key file into their caches,
+and skip key evaluation entirely.
+
+A key file contains the contents of the plugin's ``Cache`` (other than
+the parsed configuration.)  The children of the index nodes are
+written as one packed array of ordinals at the end of the file.  That
+array is memory-mapped, read-only, by the processes which read the key
+file, so that they share the operating system's page cache rather than
+each holding a private copy.
+
+The format of a key file is:
+
+- A fixed size header, giving a magic number, the format version, and
+  the length of the pickle which follows.
+
+- A pickle of the cached data, in which each ``ChildIds`` is replaced
+  by the offset and length of its ordinals in the packed array.
+
+- Padding to an eight-byte boundary.
+
+- The packed array of ordinals, in native byte order.
+
+"""
+
+from __future__ import annotations
+
+import io
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from collections.abc import Hashable
+from typing import Any
+from typing import BinaryIO
+from typing import Mapping
+from typing import TYPE_CHECKING
+
+from .buildprog import iter_index_tree
+from .childids import ChildIds
+from .childids import ORDINAL_TYPECODE
+from .config import NoSuchIndex
+from .sqlstore import SqlChildIds
+
+if TYPE_CHECKING:
+    from lektor.db import Pad
+
+    from .config import Config
+    from .plugin import Cache
+
+
+MAGIC = b"LIPKEYS\0"
+
+# Bump this when the format of key files changes
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<8sIQ")
+
+_ALIGNMENT = 8
+
+
+def compute_indexes(config: Config, pad: Pad) -> None:
+    """Compute (and cache) every configured index, for every alternative."""
+    for alt in pad.config.iter_alternatives():
+        for index_name in config.index_models:
+            try:
+                index_root = config.get_index_root(index_name, pad, alt)
+            except NoSuchIndex:
+                continue
+            for _ in iter_index_tree(index_root):
+                pass
+
+
+def write_key_file(
+    filename: str, config_hash: str, data: Mapping[Hashable, Any]
+) -> None:
+    """Write cached index data to a key file.
+
+    (The parsed configuration, which is cached under the key ``"config"``,
+    is not written.)
+
+    """
+    data = {key: value for key, value in data.items() if key != "config"}
+    ordinals = array(ORDINAL_TYPECODE)
+    header = io.BytesIO()
+    _Pickler(header, ordinals).dump(
+        (config_hash, sys.byteorder, ordinals.itemsize, data)
+    )
+
+    data_offset = _data_offset(len(header.getbuffer()))
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    tmpname = f"{filename}.{os.getpid()}.tmp"
+    with open(tmpname, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header.getbuffer())))
+        fp.write(header.getbuffer())
+        fp.write(b"\0" * (data_offset - fp.tell()))
+        ordinals.tofile(fp)
+    os.replace(tmpname, filename)
+
+
+def read_key_file(filename: str, config_hash: str) -> dict[Hashable, Any]:
+    """Read cached index data from a key file.
+
+    The ordinals of the children of the index nodes are not read, but
+    are memory-mapped.
+
+    Raises ``RuntimeError`` if the key file is not valid, or was written
+    for a different configuration.
+
+    """
+    with open(filename, "rb") as fp:
+        magic, version, header_len = _read_header(fp, filename)
+        if (magic, version) != (MAGIC, FORMAT_VERSION):
+            raise RuntimeError(f"{filename}: not a version {FORMAT_VERSION} key file")
+        header = fp.read(header_len)
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data_offset = _data_offset(header_len)
+    ordinals = memoryview(mapped)[data_offset:].cast(ORDINAL_TYPECODE)
+    saved_hash, byteorder, itemsize, data = _Unpickler(
+        io.BytesIO(header), ordinals
+    ).load()
+    if (byteorder, itemsize) != (sys.byteorder, ordinals.itemsize):
+        raise RuntimeError(f"{filename}: key file was written on another platform")
+    if saved_hash != config_hash:
+        raise RuntimeError(
+            f"{filename}: key file was written for a different configuration"
+        )
+    return data  # type: ignore[no-any-return]
+
+
+def load_key_file(cache: Cache, filename: str, config_hash: str) -> None:
+    """Load the index data in a key file into ``cache``."""
+    data = read_key_file(filename, config_hash)
+    with cache.lock:
+        cache.data.update(data)
+
+
+def _read_header(fp: BinaryIO, filename: str) -> tuple[bytes, int, int]:
+    try:
+        header: tuple[bytes, int, int] = _HEADER.unpack(fp.read(_HEADER.size))
+    except struct.error:
+        raise RuntimeError(f"{filename}: not a key file") from None
+    return header
+
+
+def _data_offset(header_len: int) -> int:
+    end = _HEADER.size + header_len
+    return -(-end // _ALIGNMENT) * _ALIGNMENT
+
+
+class _Pickler(pickle.Pickler):
+    """Pickle cached data, appending the ordinals of each ``ChildIds`` to an array."""
+
+    def __init__(self, file: BinaryIO, ordinals: array[int]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.ordinals = ordinals
+        self.written: dict[int, tuple[ChildIds, int, int]] = {}
+
+    def persistent_id(self, obj: Any) -> tuple[Any, ...] | None:
+        if not isinstance(obj, ChildIds):
+            return None
+        written = self.written.get(id(obj))
+        if written is None:
+            offset = len(self.ordinals)
+            if isinstance(obj, SqlChildIds):
+                self.ordinals.extend(obj._all_ordinals())
+            else:
+                self.ordinals.extend(obj.ordinals)
+            # (Keep a reference to obj, so that its id is not reused)
+            written = self.written[id(obj)] = obj, offset, len(self.ordinals)
+        _, start, stop = written
+        return "child_ids", obj.table, start, stop
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file: BinaryIO, ordinals: memoryview):
+        super().__init__(file)
+        self.ordinals = ordinals
+        self.loaded: dict[tuple[int, int, int], ChildIds] = {}
+
+    def persistent_load(self, pid: Any) -> ChildIds:
+        tag, table, start, stop = pid
+        if tag != "child_ids":
+            raise pickle.UnpicklingError(f"unsupported persistent id {tag!r}")
+        key = id(table), start, stop
+        child_ids = self.loaded.get(key)
+        if child_ids is None:
+            child_ids = ChildIds._from_sorted(table, self.ordinals[start:stop])
+            self.loaded[key] = child_ids
+        return child_ids
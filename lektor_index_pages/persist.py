@@ -0,0 +1,172 @@
+"""Persistence of the index cache across restarts.
+
+Each time ``lektor server`` (or ``lektor build``) is started, the
+plugin's ``Cache`` starts out empty, so the first requests (or the first
+build) must recompute all of the index groupings.
+
+When persistence is enabled, the contents of the cache are saved, after
+each build, to a file in Lektor's cache directory, and are reloaded
+before the next build.  The saved data is only used if it is still
+valid: the plugin configuration must be unchanged, as must the
+modification times of the project file, the datamodel definitions, the
+databags, and the source files of the parent records of the indexes.
+Otherwise the saved data is discarded.
+
+If only the source files of some of the indexed items have changed,
+the saved data is loaded, along with a list of the changed items, so
+that the groupings may be patched incrementally.  (See
+``lektor_index_pages.rekey``.)
+
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import posixpath
+from collections.abc import Hashable
+from typing import Any
+from typing import Iterable
+from typing import Mapping
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from lektor.environment import PRIMARY_ALT
+from lektor.utils import get_cache_dir
+
+from .childids import ChildIds
+
+if TYPE_CHECKING:
+    from inifile import IniFile
+    from lektor.db import Pad
+    from lektor.environment import Environment
+
+
+# Bump this when the format of the cached data changes
+FORMAT_VERSION = 3
+
+# The (path, alt) of an indexed item
+ItemKey = Tuple[str, str]
+
+
+def get_cache_filename(env: Environment) -> str:
+    """The name of the file used to persist the cache for a project."""
+    project_id = env.project.id
+    return os.path.join(get_cache_dir(), "index-pages", f"{project_id}.pickle")
+
+
+def config_hash(inifile: IniFile) -> str:
+    """Compute a hash of the plugin configuration."""
+    data = sorted(inifile.to_dict().items())
+    return hashlib.sha1(repr(data).encode("utf-8")).hexdigest()
+
+
+def iter_covered_files(
+    pad: Pad, data: Mapping[Hashable, Any]
+) -> Iterable[tuple[str, ItemKey | None]]:
+    """Iterate over the source files which the cached ``data`` depends on.
+
+    These are the project file, the datamodel definitions, the databags,
+    and the directories and contents files of the parent records and items
+    of each cached set of index items.  Each filename is paired with the
+    ``(path, alt)`` of the indexed item it belongs to, or with ``None`` if
+    it does not belong to an indexed item.
+
+    Other records (e.g. those looked up with ``site.get`` by an index's
+    ``key`` expression) are not covered.
+
+    """
+    project_file = pad.env.project.project_file
+    if project_file is not None:
+        yield project_file, None
+    for dirname in ("models", "databags"):
+        dir_path = os.path.join(pad.env.root_path, dirname)
+        yield dir_path, None
+        if os.path.isdir(dir_path):
+            for filename in sorted(os.listdir(dir_path)):
+                yield os.path.join(dir_path, filename), None
+
+    for key, value in data.items():
+        if isinstance(key, tuple) and key[0] == "items":
+            path, alt, child_ids = value
+            assert isinstance(child_ids, ChildIds)
+            items_id = key[3]
+            # The items of an index with source_paths are the children (or
+            # descendants) of each of those (see ItemsModel.cache_id.)  The
+            # directories of recursive items are covered as those of items.
+            source_paths = items_id[0] if isinstance(items_id, tuple) else ()
+            for source_path in source_paths or [path]:
+                for filename in _iter_record_files(pad, source_path, alt):
+                    yield filename, None
+            for id_ in child_ids:
+                item = posixpath.join(path, id_), alt
+                for filename in _iter_record_files(pad, *item):
+                    yield filename, item
+
+
+def _iter_record_files(pad: Pad, path: str, alt: str) -> Iterable[str]:
+    fs_path = pad.db.to_fs_path(path)
+    yield fs_path
+    yield os.path.join(fs_path, "contents.lr")
+    if alt != PRIMARY_ALT:
+        yield os.path.join(fs_path, f"contents+{alt}.lr")
+
+
+def get_mtime(filename: str) -> int:
+    """Get the modification time of a file, or -1 if it does not exist."""
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return -1
+
+
+class CacheStore:
+    """Saves and loads the contents of the plugin's ``Cache``."""
+
+    def __init__(self, filename: str, config_hash: str):
+        self.filename = filename
+        self.config_hash = config_hash
+
+    def load(self, pad: Pad) -> tuple[dict[Hashable, Any], set[ItemKey]]:
+        """Load the saved cache data.
+
+        Returns the saved data, and the set of the ``(path, alt)`` of the
+        indexed items whose source files have changed since it was saved.
+        The data is empty if there is no saved data, or if the saved data
+        is no longer valid.
+
+        """
+        try:
+            with open(self.filename, "rb") as fp:
+                version, config_hash, mtimes, data = pickle.load(fp)
+        except Exception:
+            return {}, set()
+        if (version, config_hash) != (FORMAT_VERSION, self.config_hash):
+            return {}, set()
+        changed_items = set()
+        for filename, (mtime, item) in mtimes.items():
+            if get_mtime(filename) != mtime:
+                if item is None:
+                    return {}, set()
+                changed_items.add(item)
+        return data, changed_items
+
+    def save(self, pad: Pad, data: Mapping[Hashable, Any]) -> None:
+        """Save cache data.
+
+        (The parsed configuration, which is cached under the key ``"config"``,
+        is not saved.)
+
+        """
+        data = {key: value for key, value in data.items() if key != "config"}
+        mtimes = {
+            filename: (get_mtime(filename), item)
+            for filename, item in iter_covered_files(pad, data)
+        }
+        state = (FORMAT_VERSION, self.config_hash, mtimes, data)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmpname = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmpname, "wb") as fp:
+            pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, self.filename)
@@ -0,0 +1,84 @@
+"""Dry-run build planning.
+
+A build plan lists every artifact which the index pages would produce,
+along with the checksum of its source.  Computing it runs all of the
+grouping, slug, and pagination logic of the index source objects, but
+renders no templates.
+
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Generator
+from typing import Iterable
+from typing import NamedTuple
+from typing import TextIO
+from typing import TYPE_CHECKING
+
+from .buildprog import get_artifact_name
+from .buildprog import iter_index_tree
+from .config import NoSuchIndex
+
+if TYPE_CHECKING:
+    from lektor.builder import PathCache
+    from lektor.db import Pad
+
+    from .config import Config
+    from .sourceobj import IndexRoot
+
+
+class PlannedArtifact(NamedTuple):
+    artifact_name: str
+    checksum: str
+
+
+class IndexPlan(NamedTuple):
+    """The planned artifacts for one index tree."""
+
+    index_name: str
+    alt: str
+    artifacts: tuple[PlannedArtifact, ...]
+    seconds: float
+
+
+def plan_index(index_root: IndexRoot, path_cache: PathCache) -> IndexPlan:
+    """Compute the artifacts which would be produced by an index tree."""
+    start = time.perf_counter()
+    artifacts = []
+    for source in iter_index_tree(index_root):
+        artifact_name = get_artifact_name(source)
+        if artifact_name is not None:
+            checksum = source.get_checksum(path_cache)
+            artifacts.append(PlannedArtifact(artifact_name, checksum))
+    seconds = time.perf_counter() - start
+    return IndexPlan(index_root._id, index_root.alt, tuple(artifacts), seconds)
+
+
+def iter_plans(config: Config, pad: Pad, path_cache: PathCache) -> Generator[IndexPlan]:
+    """Plan every configured index, for every alternative."""
+    for alt in pad.config.iter_alternatives():
+        for index_name in config.index_models:
+            try:
+                index_root = config.get_index_root(index_name, pad, alt)
+            except NoSuchIndex:
+                continue
+            yield plan_index(index_root, path_cache)
+
+
+def write_plan(plans: Iterable[IndexPlan], fp: TextIO) -> None:
+    """Write a build plan.
+
+    For each index, a comment line gives the number of artifacts, and the
+    time taken to compute them.  That is followed by one line per artifact,
+    giving the artifact name and checksum, separated by a tab.
+
+    """
+    for plan in plans:
+        fp.write(
+            f"# [{plan.index_name}] alt={plan.alt}: "
+            f"{len(plan.artifacts)} artifacts, "
+            f"{plan.seconds * 1000:.1f} ms\n"
+        )
+        for artifact in plan.artifacts:
+            fp.write(f"{artifact.artifact_name}\t{artifact.checksum}\n")
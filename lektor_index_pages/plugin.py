@@ -17,14 +17,31 @@ from typing import TYPE_CHECKING
 from typing import TypeVar
 
 import jinja2
+from lektor.builder import PathCache
 from lektor.environment import PRIMARY_ALT
 from lektor.pluginsystem import Plugin
 
 from .buildprog import IndexBuildProgram
 from .config import Config
 from .config import NoSuchIndex
+from .fragments import FragmentCache
 from .indexmodel import VIRTUAL_PATH_PREFIX
+from .keyfile import compute_indexes
+from .keyfile import load_key_file
+from .keyfile import write_key_file
+from .persist import CacheStore
+from .persist import config_hash
+from .persist import get_cache_filename
+from .plan import iter_plans
+from .plan import write_plan
+from .prerender import Prerenderer
+from .rekey import rekey
 from .sourceobj import IndexBase
+from .sqlstore import get_store_filename
+from .sqlstore import SqliteGroupStore
+from .urlmap import lookup_url_path
+from .urlmap import UrlMapper
+from .urlmap import UrlMisses
 
 if TYPE_CHECKING:
     from inifile import IniFile
@@ -33,6 +50,7 @@ if TYPE_CHECKING:
     from lektor.db import Record
     from lektor.environment import Environment
     from lektorlib.query import PrecomputedQuery
+    from markupsafe import Markup
 
     from .sourceobj import IndexRoot
     from .sourceobj import IndexSource
@@ -40,6 +58,11 @@ if TYPE_CHECKING:
 
 _T = TypeVar("_T")
 
+DEFAULT_PLAN_FILENAME = "index-pages-plan.txt"
+
+# Flags which take no value
+FLAG_NAMES = frozenset(["skip-build", "plan"])
+
 
 class Cache:
     """Cache expensive computations by the indexes.
@@ -64,6 +87,8 @@ class Cache:
     def __init__(self) -> None:
         self.lock = Lock()
         self.data: dict[Hashable, Any] = {}
+        # Incremented each time the cache is cleared
+        self.generation = 0
 
     def get_or_create(self, key: Hashable, creator: Callable[[], _T]) -> _T:
         with self.lock:
@@ -74,9 +99,14 @@ class Cache:
             self.data[key] = value
         return value
 
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.data
+
     def clear(self) -> None:
         with self.lock:
             self.data.clear()
+            self.generation += 1
 
 
 class IndexPagesPlugin(Plugin):  # type: ignore[misc]
@@ -85,19 +115,140 @@ class IndexPagesPlugin(Plugin):  # type: ignore[misc]
 
     _inifile: IniFile | None = None  # for testing
 
+    prerenderer: Prerenderer | None = None
+
+    _group_store: SqliteGroupStore | None = None
+
+    # The persisted cache entries, as last loaded or saved
+    _persisted: dict[Hashable, Any] | None = None
+
+    # Set (by the ``plan`` flag) to write a build plan, rather than building
+    plan_filename: str | None = None
+
+    # Set (by the ``keys`` flag) to load precomputed groupings from a key file
+    keys_filename: str | None = None
+
+    # Set by the ``only`` and ``skip`` flags to build only some indexes
+    only_indexes: set[str] | None = None
+    skip_indexes: frozenset[str] | set[str] = frozenset()
+
     def __init__(self, env: Environment, id: str):
         super().__init__(env, id)
         self.cache = Cache()
+        self.url_mapper = UrlMapper(self.cache)
+        self.url_misses = UrlMisses(self.cache)
+        self.fragments = FragmentCache()
+
+    def _get_inifile(self) -> IniFile:
+        return self._inifile or self.get_config()
 
     def read_config(self) -> Config:
         def parse_config() -> Config:
-            inifile = self._inifile or self.get_config()
-            return Config.from_ini(self.env, inifile)
+            return Config.from_ini(self.env, self._get_inifile())
 
         return self.cache.get_or_create("config", parse_config)
 
+    def get_cache_store(self) -> CacheStore | None:
+        """Get the store used to persist our cache, if persistence is enabled."""
+        if not self.read_config().persist_cache:
+            return None
+        return CacheStore(
+            get_cache_filename(self.env), config_hash(self._get_inifile())
+        )
+
+    def get_group_store(self) -> SqliteGroupStore | None:
+        """Get the store for index groupings, if not stored in our cache."""
+        if self.read_config().cache_backend != "sqlite":
+            return None
+        with self.cache.lock:
+            if self._group_store is None:
+                self._group_store = SqliteGroupStore(get_store_filename(self.env))
+            return self._group_store
+
+    def get_built_index_names(self) -> set[str]:
+        """Get the names of the indexes to be built."""
+        index_names = set(self.read_config().index_models)
+        selected = set(self.skip_indexes)
+        if self.only_indexes is not None:
+            selected.update(self.only_indexes)
+        unknown = selected - index_names
+        if unknown:
+            raise RuntimeError(
+                f"index-pages: unknown index names in flags: {sorted(unknown)}"
+            )
+        if self.only_indexes is not None:
+            index_names &= self.only_indexes
+        return index_names - self.skip_indexes
+
+    def write_key_file(self, pad: Pad, filename: str) -> None:
+        """Compute every index, and write the results to a key file."""
+        compute_indexes(self.read_config(), pad)
+        with self.cache.lock:
+            data = dict(self.cache.data)
+        write_key_file(filename, config_hash(self._get_inifile()), data)
+
     def on_before_build_all(self, builder: Builder, **extra: Any) -> None:
         self.cache.clear()
+        self.fragments.clear()
+        # Report any errors in the expressions of the indexes to be built
+        # up front.  (Expressions are otherwise compiled when first used.)
+        self.read_config().validate(self.get_built_index_names())
+        if self._group_store is not None:
+            self._group_store.clear()
+        cache_store = self.get_cache_store()
+        if cache_store is not None:
+            saved, changed_items = cache_store.load(builder.pad)
+            with self.cache.lock:
+                for key, value in saved.items():
+                    self.cache.data.setdefault(key, value)
+            self._persisted = saved if saved and not changed_items else None
+            if changed_items and not rekey(
+                self.read_config(), builder.pad, self.cache, changed_items
+            ):
+                self.cache.clear()
+        if self.keys_filename is not None:
+            load_key_file(
+                self.cache, self.keys_filename, config_hash(self._get_inifile())
+            )
+        self._close_prerenderer()
+        if self.plan_filename is not None:
+            self._write_plan(builder, self.plan_filename)
+            return
+        prerender_workers = self.read_config().prerender_workers
+        if prerender_workers > 0:
+            self.prerenderer = Prerenderer(builder, prerender_workers)
+
+    def on_after_build_all(self, builder: Builder, **extra: Any) -> None:
+        self._close_prerenderer()
+        cache_store = self.get_cache_store()
+        if cache_store is not None:
+            with self.cache.lock:
+                data = {
+                    key: value
+                    for key, value in self.cache.data.items()
+                    if key != "config"
+                }
+            persisted = self._persisted
+            if (
+                persisted is not None
+                and data.keys() == persisted.keys()
+                and all(data[key] is persisted[key] for key in data)
+            ):
+                # Nothing has changed since the cache was loaded
+                return
+            cache_store.save(builder.pad, data)
+            self._persisted = data
+
+    def _write_plan(self, builder: Builder, filename: str) -> None:
+        plans = iter_plans(self.read_config(), builder.pad, PathCache(self.env))
+        with open(filename, "w", encoding="utf-8") as fp:
+            write_plan(plans, fp)
+
+    def _close_prerenderer(self) -> None:
+        prerenderer = self.prerenderer
+        if prerenderer is not None:
+            self.prerenderer = None
+            prerenderer.close()
 
     def on_setup_env(
         self, extra_flags: dict[str, str] | None = None, **extra: Any
@@ -108,6 +259,30 @@ class IndexPagesPlugin(Plugin):  # type: ignore[misc]
         if extra_flags:
             flags = extra_flags.get("index-pages", "").split(",")
             skip_build = "skip-build" in flags
+            # The set of index names (if any) to which bare names are added
+            index_names: set[str] | None = None
+            for flag in flags:
+                name, sep, value = flag.partition("=")
+                if not sep and name not in FLAG_NAMES and index_names is not None:
+                    # E.g. "series" in "index-pages:only=tags,series"
+                    if name:
+                        index_names.add(name)
+                    continue
+                index_names = None
+                if name == "plan":
+                    # A plan is written in lieu of building the index pages
+                    self.plan_filename = value or DEFAULT_PLAN_FILENAME
+                    skip_build = True
+                elif name == "keys" and value:
+                    self.keys_filename = value
+                elif name == "only" and sep:
+                    if self.only_indexes is None:
+                        self.only_indexes = set()
+                    index_names = self.only_indexes
+                elif name == "skip" and sep:
+                    self.skip_indexes = index_names = set(self.skip_indexes)
+                if index_names is not None and value:
+                    index_names.add(value)
 
         env.add_build_program(IndexBase, IndexBuildProgram)
 
@@ -116,7 +291,7 @@ class IndexPagesPlugin(Plugin):  # type: ignore[misc]
             @env.generator  # type: ignore[misc]
             def generate_index(record: Record) -> Generator[IndexRoot]:
                 config = self.read_config()
-                return config.iter_index_roots(record)
+                return config.iter_index_roots(record, self.get_built_index_names())
 
         @env.virtualpathresolver(VIRTUAL_PATH_PREFIX)  # type: ignore[misc]
         def resolve_virtual_path(
@@ -128,7 +303,18 @@ class IndexPagesPlugin(Plugin):  # type: ignore[misc]
         @env.urlresolver  # type: ignore[misc]
         def resolve_url(record: Record, url_path: Sequence[str]) -> IndexSource | None:
             config = self.read_config()
-            return config.resolve_url_path(record, url_path)
+            miss_key = record.path, record.alt, tuple(url_path)
+            if miss_key in self.url_misses:
+                return None
+            generation = self.cache.generation
+            if not config.lazy_resolve:
+                url_map = self.url_mapper.get_url_map(config, record)
+                if url_map is not None:
+                    return lookup_url_path(config, record, url_map, url_path)
+            source = config.resolve_url_path(record, url_path)
+            if source is None:
+                self.url_misses.add(miss_key, generation)
+            return source
 
         @jinja2.pass_context
         def index_pages(
@@ -147,6 +333,15 @@ class IndexPagesPlugin(Plugin):  # type: ignore[misc]
 
         env.jinja_env.globals["index_pages"] = index_pages
 
+        def index_fragment(
+            template: str, item: Record | jinja2.Undefined
+        ) -> Markup | jinja2.Undefined:
+            if jinja2.is_undefined(item):
+                return item
+            return self.fragments.render(template, item)
+
+        env.jinja_env.globals["index_fragment"] = index_fragment
+
 
 class IndexPages:
     def __init__(self, index_root: IndexRoot):
@@ -0,0 +1,144 @@
+"""Concurrent pre-rendering of index pages.
+
+Normally, the builder renders our index pages one at a time, as it
+reaches each of them.  When pre-rendering is enabled, as soon as the
+builder reaches an index root, all out-of-date index pages in that
+index tree are queued for rendering in a thread pool.  When the builder
+then gets around to building each index page's artifact, the
+pre-rendered result is written to the artifact, and the dependencies
+which were recorded during its rendering are replayed into the
+artifact's build context.
+
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+from lektor.context import Context
+
+from .buildprog import get_artifact_name
+from .buildprog import iter_index_tree
+
+if TYPE_CHECKING:
+    from lektor.builder import Artifact
+    from lektor.builder import Builder
+    from lektor.builder import BuildState
+    from lektor.db import Pad
+    from lektor.sourceobj import VirtualSourceObject
+
+    from .sourceobj import IndexRoot
+
+
+class RenderResult(NamedTuple):
+    """The result of pre-rendering an index page."""
+
+    html: str
+    dependencies: frozenset[str]
+    virtual_dependencies: tuple[VirtualSourceObject, ...]
+
+    def write_into(self, artifact: Artifact, ctx: Context | None) -> None:
+        """Write the result to an artifact, replaying its dependencies."""
+        if ctx is not None:
+            for filename in self.dependencies:
+                ctx.record_dependency(filename)
+            for virtual_source in self.virtual_dependencies:
+                ctx.record_virtual_dependency(virtual_source)
+        with artifact.open("wb") as fp:
+            # This matches what Artifact.render_template_into writes
+            fp.write(self.html.encode("utf-8") + b"\n")
+
+
+class Prerenderer:
+    """Render index pages in a thread pool, ahead of the builder."""
+
+    def __init__(self, builder: Builder, max_workers: int):
+        self._exit_stack = ExitStack()
+        build_state = builder.new_build_state()
+        if hasattr(build_state, "__enter__"):
+            # Lektor < 3.4
+            build_state = self._exit_stack.enter_context(build_state)
+        self.build_state = build_state
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="index-pages"
+        )
+        self._exit_stack.callback(self.executor.shutdown)
+        self.futures: dict[str, Future[RenderResult]] = {}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    def prerender(self, index_root: IndexRoot, build_state: BuildState) -> None:
+        """Queue rendering of all out-of-date pages in an index tree."""
+        for source in iter_index_tree(index_root):
+            artifact_name = get_artifact_name(source)
+            if artifact_name is None:
+                continue
+            artifact = build_state.new_artifact(
+                artifact_name,
+                sources=[source.record.source_filename],
+                source_obj=source,
+            )
+            if artifact.is_current:
+                continue
+            with self.lock:
+                if artifact.artifact_name not in self.futures:
+                    self.futures[artifact.artifact_name] = self.executor.submit(
+                        self._render,
+                        source.path,
+                        source.alt,
+                        source._data["_template"],
+                    )
+
+    def take(self, artifact_name: str) -> RenderResult | None:
+        """Get the pre-rendered result for an artifact.
+
+        This waits for the rendering to complete, if necessary.  Returns
+        ``None`` if the artifact was not pre-rendered, or if its rendering
+        failed.  (In the latter case the caller should render the
+        artifact itself, so that the failure is reported normally.)
+
+        """
+        with self.lock:
+            future = self.futures.pop(artifact_name, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def close(self) -> None:
+        """Shut down the thread pool, discarding any unused results."""
+        with self.lock:
+            futures, self.futures = self.futures, {}
+        for future in futures.values():
+            future.cancel()
+        self._exit_stack.close()
+
+    def _get_pad(self) -> Pad:
+        # Lektor pads are not thread-safe.  Each worker thread uses its own.
+        pad: Pad | None = getattr(self._local, "pad", None)
+        if pad is None:
+            pad = self._local.pad = self.build_state.pad.db.new_pad()
+        return pad
+
+    def _render(self, path: str, alt: str, template: str) -> RenderResult:
+        pad = self._get_pad()
+        source = pad.get(path, alt=alt)
+        if source is None:
+            raise LookupError(f"can not find source for {path!r}")
+        with Context(pad=pad) as ctx:
+            # Set up the context the way the builder does for an artifact
+            ctx.source = source
+            ctx.build_state = self.build_state
+            html = pad.env.render_template(template, pad, this=source)
+        return RenderResult(
+            html,
+            frozenset(ctx.referenced_dependencies),
+            tuple(ctx.referenced_virtual_dependencies.values()),
+        )
@@ -0,0 +1,364 @@
+"""Incremental re-keying of changed items.
+
+When cached groupings are reloaded (see ``lektor_index_pages.persist``)
+and the only sources which have changed are those of some of the
+indexed items, there is no need to regroup all of the items.  Instead,
+the keys of just the changed items are re-evaluated, and the stored
+groupings are patched: each changed item is removed from the keys it
+no longer has, and added to its new keys.
+
+Only the index nodes whose children include a changed item (before or
+after the change) are patched.  The groupings of all other nodes are
+kept as they are, as are their checksums, so that Lektor does not
+rebuild their pages.
+
+"""
+
+from __future__ import annotations
+
+import posixpath
+from array import array
+from bisect import bisect_left
+from bisect import insort
+from collections import defaultdict
+from collections.abc import Hashable
+from typing import Any
+from typing import Collection
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+from lektorlib.context import disable_dependency_recording
+
+from .childids import ChildIds
+from .childids import item_id
+from .childids import ORDINAL_TYPECODE
+from .indexmodel import FieldIndexModel
+from .sourceobj import IndexRoot
+
+if TYPE_CHECKING:
+    from lektor.db import Pad
+    from lektor.db import Record
+
+    from .childids import IdTable
+    from .config import Config
+    from .indexmodel import IndexModel
+    from .plugin import Cache
+    from .sourceobj import IndexBase
+
+
+# Families of cache keys of the form (name, path-of-index-node, ...)
+_NODE_KEY_FAMILIES = ("subindex_ids", "subindex_groups", "child_ids")
+
+
+def rekey(
+    config: Config, pad: Pad, cache: Cache, changed_items: Collection[tuple[str, str]]
+) -> bool:
+    """Patch the cached groupings to account for changed items.
+
+    ``changed_items`` is a collection of the ``(path, alt)`` of the items
+    whose sources have changed.
+
+    Returns ``False`` if the cached groupings could not be patched (e.g.
+    because a changed item has been added to, removed from, or moved
+    within, the items of an index.)  In that case, the cache should be
+    discarded.
+
+    """
+    with cache.lock:
+        items_entries = [
+            (key, value)
+            for key, value in cache.data.items()
+            if isinstance(key, tuple) and key[0] == "items"
+        ]
+    try:
+        for (_, record_path, alt, items_id), value in items_entries:
+            items_path, items_alt, child_ids = value
+            prefixes = tuple(
+                path.rstrip("/") + "/" for path in _source_paths(items_path, items_id)
+            )
+            changed_ids = {
+                item_id(items_path, path)
+                for path, item_alt in changed_items
+                if item_alt == items_alt and path.startswith(prefixes)
+            }
+            if changed_ids:
+                record = pad.get(record_path, alt=alt)
+                if record is None:
+                    return False
+                rekeyer = _Rekeyer(
+                    pad, cache, items_path, items_alt, child_ids.table, changed_ids
+                )
+                if not rekeyer.rekey_items(config, record, items_id):
+                    return False
+    except LookupError:
+        return False
+    return True
+
+
+def _source_paths(items_path: str, items_id: Hashable) -> Sequence[str]:
+    """The paths of the records whose descendants may be items.
+
+    Items gathered from ``source_paths`` are all queried relative to the
+    root record, so we take the source paths from their ``cache_id``.
+
+    """
+    if isinstance(items_id, tuple) and items_id[0]:
+        source_paths: Sequence[str] = items_id[0]
+        return source_paths
+    return (items_path,)
+
+
+class _Rekeyer:
+    """Patch the groupings of the index trees sharing one set of items."""
+
+    def __init__(
+        self,
+        pad: Pad,
+        cache: Cache,
+        items_path: str,
+        items_alt: str,
+        table: IdTable,
+        changed_ids: Collection[str],
+    ):
+        self.pad = pad
+        self.cache = cache
+        self.items_path = items_path
+        self.items_alt = items_alt
+        self.table = table
+        self.changed = {
+            ordinal: id_
+            for ordinal, id_ in zip(map(table.ordinal, changed_ids), changed_ids)
+            if ordinal is not None
+        }
+        self._keys: dict[tuple[int, str], list[str]] = {}
+        # Paths of the nodes whose groupings have been patched
+        self.patched_paths: set[str] = set()
+        # Paths of the nodes whose cached data, and that of their
+        # descendants, is to be discarded
+        self.stale_paths: set[str] = set()
+
+    def rekey_items(self, config: Config, record: Record, items_id: Hashable) -> bool:
+        index_models = [
+            model
+            for model in config.index_models.values()
+            if model.parent_path == record.path
+            and model.items_model.cache_id == items_id
+        ]
+        if not index_models:
+            return False
+        index_roots = [IndexRoot.get_index(model, record) for model in index_models]
+        item_ids = index_roots[0].children.child_ids
+        with disable_dependency_recording():
+            items_model = index_models[0].items_model
+            _, _, current_ids, undiscoverable = items_model.get_item_ids(record)
+            if tuple(current_ids) != self.table.ids:
+                return False
+            if undiscoverable != self.table.undiscoverable:
+                return False
+
+        groups_key = index_roots[0]._subindex_groups_cache_key
+        if groups_key in self.cache:
+            groupings = self._get(groups_key)
+            patched = {}
+            touched: dict[str, set[str]] = {}
+            for index_root in index_roots:
+                name = index_root._model.index_name
+                patched[name], touched[name] = self.patch(
+                    groupings[name], index_root._model.subindex_model, item_ids
+                )
+            self._set(groups_key, patched)
+            for index_root in index_roots:
+                name = index_root._model.index_name
+                self._patched(index_root, patched[name])
+                self._patch_subindexes(index_root, patched[name], touched[name])
+        else:
+            self.stale_paths.update(index_root.path for index_root in index_roots)
+        self._discard_stale()
+        return True
+
+    def _patch_node(self, source: IndexBase) -> None:
+        subindex_model = source._model.subindex_model
+        if subindex_model is None:
+            return
+        groups_key = source._subindex_groups_cache_key
+        if groups_key not in self.cache:
+            self.stale_paths.add(source.path)
+            return
+        groups, touched = self.patch(
+            self._get(groups_key), subindex_model, source.children.child_ids
+        )
+        self._set(groups_key, groups)
+        self._patched(source, groups)
+        self._patch_subindexes(source, groups, touched)
+
+    def _patched(self, source: IndexBase, groups: dict[str, ChildIds]) -> None:
+        self.patched_paths.add(source.path)
+        ids_key = "subindex_ids", source.path
+        if ids_key in self.cache:
+            self._set(ids_key, tuple(groups))
+
+    def _patch_subindexes(
+        self, source: IndexBase, groups: dict[str, ChildIds], touched: set[str]
+    ) -> None:
+        for key in touched:
+            if key in groups:
+                self._patch_node(source._get_subindex(key))
+            else:
+                self.stale_paths.add(f"{source.path}/{key}")
+
+    def _discard_stale(self) -> None:
+        """Discard cached data for nodes which have not been patched."""
+        patched_paths = self.patched_paths
+        stale_prefixes = tuple(f"{path}/" for path in self.stale_paths)
+        page_prefixes = tuple(f"{path}/page/" for path in patched_paths)
+
+        def is_stale(key: Hashable) -> bool:
+            if not isinstance(key, tuple):
+                return False
+            if key[0] in ("resolved_path", "url_map"):
+                # The keys along any resolved path may have changed
+                return True
+            if key[0] not in _NODE_KEY_FAMILIES:
+                return False
+            path = key[1]
+            if key[0] == "child_ids" and path in patched_paths:
+                return True
+            return (
+                path in self.stale_paths
+                or path.startswith(stale_prefixes)
+                or path.startswith(page_prefixes)
+            )
+
+        with self.cache.lock:
+            for key in list(filter(is_stale, self.cache.data)):
+                del self.cache.data[key]
+
+    def patch(
+        self, groups: dict[str, ChildIds], model: IndexModel, members: ChildIds
+    ) -> tuple[dict[str, ChildIds], set[str]]:
+        """Patch the grouping of an index node.
+
+        ``groups`` is the node's current grouping of its children, by the
+        keys of ``model``, and ``members`` are its (current) children.
+
+        Returns the patched grouping, and the set of the keys whose children
+        include a changed item, either before or after the patch.
+
+        """
+        if isinstance(model, FieldIndexModel):
+            return self._regroup(groups, model, members)
+
+        table = self.table
+        changed = self.changed
+        ordinals: dict[str, Sequence[int]] = {
+            key: child_ids.ordinals for key, child_ids in groups.items()
+        }
+        touched = set()
+        for key, key_ordinals in ordinals.items():
+            if any(_contains(key_ordinals, n) for n in changed):
+                touched.add(key)
+                ordinals[key] = array(
+                    ORDINAL_TYPECODE, (n for n in key_ordinals if n not in changed)
+                )
+        for n, id_ in changed.items():
+            if not _contains(members.ordinals, n):
+                continue
+            for key in self._keys_for(id_, model):
+                key_ordinals = ordinals.setdefault(key, array(ORDINAL_TYPECODE))
+                if key not in touched:
+                    touched.add(key)
+                    key_ordinals = ordinals[key] = array(ORDINAL_TYPECODE, key_ordinals)
+                assert isinstance(key_ordinals, array)
+                insort(key_ordinals, n)
+
+        patched = {
+            key: (
+                ChildIds._from_sorted(table, key_ordinals)
+                if key in touched
+                else groups[key]
+            )
+            for key, key_ordinals in ordinals.items()
+            if len(key_ordinals) > 0
+        }
+        return self._ordered(groups, patched, model), touched
+
+    def _ordered(
+        self,
+        groups: dict[str, ChildIds],
+        patched: dict[str, ChildIds],
+        model: IndexModel,
+    ) -> dict[str, ChildIds]:
+        # Keys are ordered by first appearance (see group_items).  Keys which
+        # first appear in the same item are ordered as that item's keys are.
+        first = {key: child_ids.ordinals[0] for key, child_ids in patched.items()}
+        old_first = {key: child_ids.ordinals[0] for key, child_ids in groups.items()}
+        old_position = {key: n for n, key in enumerate(groups)}
+        keys_by_first = defaultdict(list)
+        for key, n in first.items():
+            keys_by_first[n].append(key)
+
+        def rank(key: str) -> int:
+            n = first[key]
+            if n not in self.changed and all(
+                old_first.get(k) == n for k in keys_by_first[n]
+            ):
+                # The relative order of these keys is unchanged
+                return old_position[key]
+            return self._keys_for(self.table.ids[n], model).index(key)
+
+        return {
+            key: patched[key]
+            for key in sorted(patched, key=lambda k: (first[k], rank(k)))
+        }
+
+    def _regroup(
+        self, groups: dict[str, ChildIds], model: FieldIndexModel, members: ChildIds
+    ) -> tuple[dict[str, ChildIds], set[str]]:
+        # Natively grouped indexes are cheap to regroup in full
+        member_ordinals = members.ordinals
+        with disable_dependency_recording():
+            posts = [self._get_post(id_) for id_ in members]
+            grouping = model.group_items(posts)
+        patched = {}
+        touched = set()
+        for key, positions in grouping.items():
+            ordinals = array(ORDINAL_TYPECODE, (member_ordinals[n] for n in positions))
+            child_ids = groups.get(key)
+            if child_ids is None or list(child_ids.ordinals) != ordinals.tolist():
+                child_ids = ChildIds._from_sorted(self.table, ordinals)
+                touched.add(key)
+            elif any(_contains(ordinals, n) for n in self.changed):
+                touched.add(key)
+            patched[key] = child_ids
+        touched.update(set(groups) - set(patched))
+        return patched, touched
+
+    def _keys_for(self, id_: str, model: IndexModel) -> list[str]:
+        cache_key = id(model), id_
+        keys = self._keys.get(cache_key)
+        if keys is None:
+            post = self._get_post(id_)
+            with disable_dependency_recording():
+                keys = list(dict.fromkeys(model.keys_for_post(post)))
+            self._keys[cache_key] = keys
+        return keys
+
+    def _get_post(self, id_: str) -> Record:
+        path = posixpath.join(self.items_path, id_)
+        post = self.pad.get(path, alt=self.items_alt)
+        if post is None:
+            raise LookupError(f"can not find item {path!r}")
+        return post
+
+    def _get(self, key: Hashable) -> Any:
+        with self.cache.lock:
+            return self.cache.data[key]
+
+    def _set(self, key: Hashable, value: Any) -> None:
+        with self.cache.lock:
+            self.cache.data[key] = value
+
+
+def _contains(ordinals: Sequence[int], n: int) -> bool:
+    i = bisect_left(ordinals, n)
+    return i < len(ordinals) and ordinals[i] == n
@@ -2,11 +2,11 @@
 
 from __future__ import annotations
 
+import enum
 import hashlib
 import pickle
+import threading
 from collections.abc import Hashable
-from itertools import chain
-from operator import itemgetter
 from typing import Any
 from typing import Callable
 from typing import Iterable
@@ -24,11 +24,20 @@ from lektor.utils import build_url
 from lektorlib.context import disable_dependency_recording
 from lektorlib.query import PrecomputedQuery
 from lektorlib.recordcache import get_or_create_virtual
-from more_itertools import unique_everseen
 from werkzeug.utils import cached_property
 
+from .childids import ChildIds
+from .childids import ChildQuery
+from .childids import IdTable
+from .childids import item_id
+from .childids import ItemsQuery
+from .indexmodel import FieldIndexModel
+from .indexmodel import group_items
+from .indexmodel import VIRTUAL_PATH_PREFIX
+
 if TYPE_CHECKING:
     from lektor.builder import PathCache
+    from lektor.db import Pad
     from lektor.db import Record
     from lektor.pagination import Pagination
 
@@ -36,6 +45,7 @@ if TYPE_CHECKING:
     from .indexmodel import IndexRootModel
     from .plugin import Cache
     from .plugin import IndexPagesPlugin
+    from .sqlstore import SqliteGroupStore
 
 
 _T = TypeVar("_T")
@@ -71,6 +81,38 @@ def get_system_data(model: IndexModel, id_: str) -> dict[str, Any]:
     }
 
 
+def _get_plugin(pad: Pad) -> IndexPagesPlugin | None:
+    try:
+        plugin: IndexPagesPlugin = get_plugin("index-pages", pad.env)
+    except LookupError:
+        return None  # testing
+    else:
+        return plugin
+
+
+def get_cache(pad: Pad) -> Cache | DummyCache:
+    plugin = _get_plugin(pad)
+    if plugin is None:
+        return DummyCache()
+    return plugin.cache
+
+
+def get_group_store(pad: Pad) -> SqliteGroupStore | None:
+    """Get the store for index groupings, if they are not kept in memory."""
+    plugin = _get_plugin(pad)
+    if plugin is None:
+        return None
+    return plugin.get_group_store()
+
+
+def resolves_lazily(pad: Pad) -> bool:
+    """Whether path resolution should compute only the groups it traverses."""
+    plugin = _get_plugin(pad)
+    if plugin is None:
+        return False
+    return plugin.read_config().lazy_resolve
+
+
 class IndexBase(VirtualSourceObject):  # type: ignore[misc]
     def __init__(
         self,
@@ -111,33 +153,156 @@ class IndexBase(VirtualSourceObject):  # type: ignore[misc]
     def _subindex_ids(self) -> tuple[str, ...]:
         if self._model.subindex_model is None:
             raise AttributeError("no sub-index is configured")
-        subindex_model = self._model.subindex_model
 
         def get_subindex_ids() -> tuple[str, ...]:
-            with disable_dependency_recording():
-                return tuple(
-                    unique_everseen(
-                        chain.from_iterable(
-                            map(subindex_model.keys_for_post, self.children)
-                        )
+            return tuple(self._subindex_groups)
+
+        cache_key = "subindex_ids", self._node_path
+        return self._get_cache().get_or_create(cache_key, get_subindex_ids)
+
+    @cached_property
+    def _subindex_groups(self) -> dict[str, ChildIds]:
+        """The ids of the children of each subindex, keyed by subindex id."""
+        if self._model.subindex_model is None:
+            raise AttributeError("no sub-index is configured")
+        subindex_model = self._model.subindex_model
+
+        def get_subindex_groups() -> dict[str, ChildIds]:
+            return self._group_children([subindex_model])[0]
+
+        return self._get_cache().get_or_create(
+            self._subindex_groups_cache_key, get_subindex_groups
+        )
+
+    @property
+    def _subindex_groups_cache_key(self) -> Hashable:
+        return "subindex_groups", self._node_path
+
+    def _has_subindex_groups(self) -> bool:
+        """Whether ``_subindex_groups`` has already been computed."""
+        return (
+            "_subindex_groups" in self.__dict__
+            or self._subindex_groups_cache_key in self._get_cache()
+        )
+
+    def _get_child_ids(self, id_: str) -> ChildIds:
+        """Get the ids of the children of the subindex with id ``id_``.
+
+        Normally, this groups all of our children by key (if that has not
+        already been done).  In lazy mode, unless our children have already
+        been grouped, only the children having key ``id_`` are found.
+
+        In lazy mode, ids of subindexes which turn out to have no children
+        (e.g. ids taken from arbitrary requested URLs) are not cached, so
+        that requests can not grow the cache without bound.
+
+        """
+        subindex_model = self._model.subindex_model
+        assert subindex_model is not None
+        if (
+            not self._has_subindex_groups()
+            and resolves_lazily(self.pad)
+            # Built-in index types are cheap to group in full
+            and not isinstance(subindex_model, FieldIndexModel)
+        ):
+            cache = self._get_cache()
+            if ("subindex_ids", self._node_path) in cache and (
+                id_ not in self._subindex_ids
+            ):
+                return self._id_table.select(())
+
+            def get_child_ids() -> ChildIds:
+                keys_for_post = subindex_model.keys_for_post
+                items_path = self.children.path
+                with disable_dependency_recording():
+                    return self._id_table.select(
+                        item_id(items_path, post.path)
+                        for post in self.children
+                        if id_ in keys_for_post(post)
                     )
+
+            cache_key = "child_ids", self._node_path, id_
+            if cache_key in cache:
+                return cache.get_or_create(cache_key, get_child_ids)
+            found = get_child_ids()
+            if found:
+                cache.get_or_create(cache_key, lambda: found)
+            return found
+
+        child_ids = self._subindex_groups.get(id_)
+        if child_ids is None:
+            child_ids = self._id_table.select(())
+        return child_ids
+
+    def _group_children(
+        self, models: Sequence[IndexModel]
+    ) -> list[dict[str, ChildIds]]:
+        """Group our children by key, for each of several index models.
+
+        Our children are iterated over just once.
+
+        """
+        id_table = self._id_table
+        # We precompute the groupings while ignoring any dependencies.
+        # Our checksum changes if the composition of the index changes,
+        # so iterating over all of our children here should not make
+        # every child a dependency of every index page.
+        with disable_dependency_recording():
+            posts = list(self.children)
+            groupings = group_items(models, posts)
+        items_path = self.children.path
+        ids = [item_id(items_path, post.path) for post in posts]
+        store = get_group_store(self.pad)
+        if store is not None:
+            return [
+                store.store(
+                    f"{self._group_store_prefix}/{model.index_name}",
+                    self.alt,
+                    id_table,
+                    {
+                        key: (ids[n] for n in positions)
+                        for key, positions in grouping.items()
+                    },
                 )
+                for model, grouping in zip(models, groupings)
+            ]
+        return [
+            {
+                key: id_table.select(ids[n] for n in positions)
+                for key, positions in grouping.items()
+            }
+            for grouping in groupings
+        ]
 
-        cache_key = "subindex_ids", self.path
-        return self._get_cache().get_or_create(cache_key, get_subindex_ids)
+    @property
+    def _group_store_prefix(self) -> str:
+        """Prefix for the names under which we store groupings."""
+        return self._node_path
+
+    @property
+    def _id_table(self) -> IdTable:
+        """The table of the ids of all items in this index tree."""
+        raise NotImplementedError()
 
     def _get_cache(self) -> Cache | DummyCache:
-        try:
-            plugin: IndexPagesPlugin = get_plugin("index-pages", self.pad.env)
-        except LookupError:
-            return DummyCache()  # testing
-        else:
-            return plugin.cache
+        return get_cache(self.pad)
 
     @cached_property
     def path(self) -> str:
         return f"{self.record.path}@{self.virtual_path}"
 
+    @cached_property
+    def _node_path(self) -> str:
+        """Our path, without any page number.
+
+        The groupings of our children do not depend on which page we are on,
+        so data cached about them is keyed by this path.
+
+        """
+        if self.page_num is None:
+            return self.path
+        return self.__for_page__(None).path
+
     def resolve_virtual_path(
         self, pieces: Sequence[str]
     ) -> IndexRoot | IndexSource | None:
@@ -145,7 +310,12 @@ class IndexBase(VirtualSourceObject):  # type: ignore[misc]
             return self
 
         if self.has_subindex:
-            if pieces[0] in self._subindex_ids:
+            if resolves_lazily(self.pad):
+                # Only find the children of the subindex we are traversing
+                has_subindex = len(self._get_child_ids(pieces[0])) > 0
+            else:
+                has_subindex = pieces[0] in self._subindex_ids
+            if has_subindex:
                 subindex = self._get_subindex(pieces[0])
                 return subindex.resolve_virtual_path(pieces[1:])
 
@@ -161,6 +331,14 @@ class IndexBase(VirtualSourceObject):  # type: ignore[misc]
 
         if self.has_subindex:
             subindex: IndexSource
+            if resolves_lazily(self.pad):
+                # Try the subindex whose id matches the first path component.
+                # This avoids computing all of the subindexes in the common
+                # case that the subindex slugs are their ids.
+                if self._get_child_ids(url_path[0]):
+                    subindex = self._get_subindex(url_path[0])
+                    if subindex._slug == url_path[0]:
+                        return subindex.resolve_url_path(url_path[1:])
             for subindex in self.subindexes:
                 slug = subindex._slug.split("/")
                 if url_path[: len(slug)] == slug:
@@ -181,26 +359,15 @@ class IndexBase(VirtualSourceObject):  # type: ignore[misc]
             raise LookupError("no sub-index is configured")
         subindex_model = self._model.subindex_model
 
-        def get_child_ids() -> list[str]:
-            keys_for_post = subindex_model.keys_for_post
-
-            def match_key(post: Record) -> bool:
-                return id_ in keys_for_post(post)
-
-            children = self.children.filter(match_key)
-            # We could just give the subindex the raw query, but if we do,
-            # it generates unnecessary dependencies when iterated over in
-            # a template.
-            #
-            # To avoid this, we precompute the list of matching ids (while
-            # ignoring any dependencies), and return a custom Query class
-            # which will iterate over only those matching children.
-            with disable_dependency_recording():
-                return list(map(itemgetter("_id"), children))
-
-        cache_key = "child_ids", self.path, id_
-        child_ids = self._get_cache().get_or_create(cache_key, get_child_ids)
-        children: PrecomputedQuery[Record] = PrecomputedQuery(
+        # We could just give the subindex the raw query, but if we do,
+        # it generates unnecessary dependencies when iterated over in
+        # a template.
+        #
+        # To avoid this, we use the precomputed list of matching ids,
+        # and return a custom Query class which will iterate over only
+        # those matching children.
+        child_ids = self._get_child_ids(id_)
+        children = ChildQuery(
             self.children.path, self.pad, child_ids, alt=self.children.alt
         )
         return IndexSource.get_index(subindex_model, self, id_, children, page_num)
@@ -274,9 +441,43 @@ class IndexBase(VirtualSourceObject):  # type: ignore[misc]
 class IndexRoot(IndexBase):
     """Root source node for an index tree."""
 
+    _model: IndexRootModel
+    children: ItemsQuery
+
     def __init__(self, model: IndexRootModel, record: Record):
         IndexBase.__init__(
-            self, model, record, id_=model.index_name, children=model.get_items(record)
+            self,
+            model,
+            record,
+            id_=model.index_name,
+            children=self._get_items(model, record),
+        )
+
+    @staticmethod
+    def _get_items(model: IndexRootModel, record: Record) -> ItemsQuery:
+        """Get the (materialized) items to be indexed.
+
+        The items query is evaluated once, and the resulting ids cached,
+        for all index roots which share the same items.
+
+        """
+
+        items_model = model.items_model
+
+        def get_items() -> tuple[str, str, ChildIds]:
+            with disable_dependency_recording():
+                path, alt, ids, undiscoverable = items_model.get_item_ids(record)
+            return path, alt, IdTable(ids, undiscoverable).all()
+
+        cache_key = "items", record.path, record.alt, items_model.cache_id
+        path, alt, child_ids = get_cache(record.pad).get_or_create(cache_key, get_items)
+        return ItemsQuery(
+            path,
+            record.pad,
+            child_ids,
+            alt=alt,
+            source_paths=items_model.source_paths,
+            recursive=items_model.recursive,
         )
 
     @classmethod
@@ -288,6 +489,44 @@ class IndexRoot(IndexBase):
         virtual_path = model.get_virtual_path(record)
         return get_or_create_virtual(record, virtual_path, creator)
 
+    @property
+    def _id_table(self) -> IdTable:
+        return self.children.child_ids.table
+
+    @cached_property
+    def _subindex_groups(self) -> dict[str, ChildIds]:
+        # All index roots which share our items are grouped in a single
+        # pass over those items.
+        index_models = self._model.items_model.index_models
+
+        def get_subindex_groups() -> dict[str, dict[str, ChildIds]]:
+            subindex_models = [model.subindex_model for model in index_models]
+            groupings = self._group_children(subindex_models)
+            return {
+                model.index_name: grouping
+                for model, grouping in zip(index_models, groupings)
+            }
+
+        groupings = self._get_cache().get_or_create(
+            self._subindex_groups_cache_key, get_subindex_groups
+        )
+        return groupings[self._model.index_name]
+
+    @property
+    def _subindex_groups_cache_key(self) -> Hashable:
+        return self._items_cache_key("subindex_groups")
+
+    @property
+    def _group_store_prefix(self) -> str:
+        # All index roots which share our items store their groupings
+        # together
+        return f"{self.record.path}@{VIRTUAL_PATH_PREFIX}"
+
+    def _items_cache_key(self, name: str) -> Hashable:
+        """Cache key for data shared by all roots which share our items."""
+        items_model = self._model.items_model
+        return name, self.record.path, self.alt, items_model.cache_id
+
     @property
     def _slug(self) -> None:
         return None
@@ -327,6 +566,7 @@ class IndexSource(IndexBase):
         self.parent = parent
         self._data = get_system_data(model, id_)
         self._data.update(model.data_descriptors)
+        self._fields = FieldValues(self._data)
 
     @classmethod
     def get_index(
@@ -344,14 +584,10 @@ class IndexSource(IndexBase):
         return get_or_create_virtual(parent.record, virtual_path, creator)
 
     def __contains__(self, name: str) -> bool:
-        return name in self._data and not jinja2.is_undefined(self[name])
+        return self._fields.contains(self, name)
 
     def __getitem__(self, name: str) -> Any:
-        rv = self._data[name]
-        if hasattr(rv, "__get__"):
-            rv = rv.__get__(self)
-            self._data[name] = rv
-        return rv
+        return self._fields.get(self, name)
 
     @cached_property
     def pagination(self) -> Pagination:
@@ -379,6 +615,10 @@ class IndexSource(IndexBase):
         with disable_dependency_recording():
             return pagination_config.get_pagination_controller(self)
 
+    @property
+    def _id_table(self) -> IdTable:
+        return self.parent._id_table
+
     @cached_property
     def _slug(self) -> str:
         return self._model.get_slug(self)
@@ -414,12 +654,100 @@ class IndexSource(IndexBase):
             reverse = field.startswith("-")
             if reverse or field.startswith("+"):
                 field = field[1:]
-            value = self[field] if field in self else None
+            value = self._fields.get_defined(self, field)
             return _CmpHelper(value, reverse)
 
         return [cmp_val(field) for field in fields]
 
 
+class FieldState(enum.Enum):
+    RESOLVED = "resolved"
+    UNDEFINED = "undefined"
+    ERROR = "error"
+
+
+class FieldValues:
+    """The memoized values of the fields of an index source.
+
+    The data of a source maps field names either to values, or to data
+    descriptors (e.g. the Jinja expressions configured in the ``[fields]``
+    section) whose ``__get__`` computes the value.  Each field is
+    resolved at most once.  The outcome — a value, an undefined value, or
+    an exception — is memoized, so that tests for, and lookups of, fields
+    which are undefined or whose expressions fail are not re-evaluated.
+
+    The devserver may access a source from several request threads at
+    once.  Descriptors are evaluated without holding our lock, since a
+    field's expression may refer to other fields of this (or of another)
+    source.  Should two threads race to resolve a field, the outcome
+    stored first wins.
+
+    """
+
+    __slots__ = ("data", "lock", "resolved")
+
+    def __init__(self, data: dict[str, Any]):
+        self.data = data
+        self.lock = threading.Lock()
+        self.resolved: dict[str, tuple[FieldState, Any]] = {}
+
+    def resolve(self, source: IndexSource, name: str) -> tuple[FieldState, Any]:
+        """Get the state and value of a field.
+
+        For fields in the ``ERROR`` state, the value is the exception which
+        was raised while computing the field.  Raises ``KeyError`` if there
+        is no field named ``name``.
+
+        """
+        with self.lock:
+            resolved = self.resolved.get(name)
+        if resolved is not None:
+            return resolved
+        value = self.data[name]
+        if hasattr(value, "__get__"):
+            try:
+                value = value.__get__(source)
+            except Exception as exc:
+                # The traceback is not kept, since its frames would keep
+                # everything referenced by the failed evaluation alive.
+                resolved = FieldState.ERROR, exc.with_traceback(None)
+        if resolved is None:
+            if jinja2.is_undefined(value):
+                resolved = FieldState.UNDEFINED, value
+            else:
+                resolved = FieldState.RESOLVED, value
+        with self.lock:
+            return self.resolved.setdefault(name, resolved)
+
+    def get(self, source: IndexSource, name: str) -> Any:
+        return _field_value(*self.resolve(source, name))
+
+    def contains(self, source: IndexSource, name: str) -> bool:
+        if name not in self.data:
+            return False
+        state, value = self.resolve(source, name)
+        _field_value(state, value)
+        return state is FieldState.RESOLVED
+
+    def get_defined(self, source: IndexSource, name: str) -> Any:
+        """Get the value of a field, or ``None`` if it is missing or undefined."""
+        if name not in self.data:
+            return None
+        state, value = self.resolve(source, name)
+        value = _field_value(state, value)
+        return value if state is FieldState.RESOLVED else None
+
+
+def _field_value(state: FieldState, value: Any) -> Any:
+    if state is FieldState.ERROR:
+        # (Discard the traceback of any previous raise.)
+        raise value.with_traceback(None)
+    return value
+
+
 class DummyCache:
     def get_or_create(self, key: Hashable, creator: Callable[[], _T]) -> _T:
         return creator()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return False
@@ -0,0 +1,245 @@
+"""SQLite storage for the children of index nodes.
+
+For very large sites, holding the children of every index node in
+memory (even as the compact ordinal arrays of ``ChildIds``) may not be
+viable.  When the ``sqlite`` cache backend is configured, the groupings
+computed by the index source objects are written to a SQLite database
+instead, as rows of ``(index, alt, key, ordinal)``.  The children of each
+index node are then represented by a ``SqlChildIds``, which holds only
+its row count.  Iteration, slicing (e.g. for pagination), and
+membership tests are answered by range queries on the table's primary
+key, so memory use is bounded by the size of the slice requested, not
+the size of the group.
+
+The database holds no data which is not recomputed each build, so it
+is private to the process, and is deleted when no longer needed.
+
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import weakref
+from array import array
+from typing import Any
+from typing import Generator
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
+from typing import overload
+from typing import TYPE_CHECKING
+
+from lektor.utils import get_cache_dir
+
+from .childids import ChildIds
+from .childids import ORDINAL_TYPECODE
+
+if TYPE_CHECKING:
+    from lektor.environment import Environment
+
+    from .childids import IdTable
+
+
+# Number of rows fetched at a time while iterating over a group
+BATCH_SIZE = 1000
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS child_ids (
+        "index" TEXT NOT NULL,
+        alt TEXT NOT NULL,
+        key TEXT NOT NULL,
+        ordinal INTEGER NOT NULL,
+        PRIMARY KEY ("index", alt, key, ordinal)
+    ) WITHOUT ROWID
+"""
+
+_GROUP = '"index" = ? AND alt = ? AND key = ?'
+
+
+def get_store_filename(env: Environment) -> str:
+    """The name of the database file used by this process for a project."""
+    project_id = env.project.id
+    return os.path.join(
+        get_cache_dir(), "index-pages", f"{project_id}-{os.getpid()}.sqlite3"
+    )
+
+
+def _close(conn: sqlite3.Connection, filename: str) -> None:
+    conn.close()
+    try:
+        os.unlink(filename)
+    except OSError:
+        pass
+
+
+class SqliteGroupStore:
+    """Store index groupings in a SQLite database.
+
+    The database file is deleted when the store is closed (or garbage
+    collected, or at interpreter exit).
+
+    """
+
+    def __init__(self, filename: str):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.filename = filename
+        self.lock = threading.Lock()
+        # The connection is shared by the builder and any pre-rendering
+        # threads; access to it is serialized by our lock.
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = MEMORY")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute(_SCHEMA)
+        self._finalizer = weakref.finalize(self, _close, self._conn, filename)
+
+    def store(
+        self,
+        index: str,
+        alt: str,
+        table: IdTable,
+        groups: Mapping[str, Iterable[str]],
+    ) -> dict[str, ChildIds]:
+        """Store the ids of the children of each key of an index.
+
+        Any groups previously stored for ``index`` and ``alt`` are replaced.
+        Ids which are not in ``table`` are ignored.  Returns a
+        ``SqlChildIds`` for each key.
+
+        """
+        rv: dict[str, ChildIds] = {}
+        with self.lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM child_ids WHERE "index" = ? AND alt = ?', (index, alt)
+            )
+            for key, ids in groups.items():
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO child_ids VALUES (?, ?, ?, ?)",
+                    (
+                        (index, alt, key, ordinal)
+                        for ordinal in map(table.ordinal, ids)
+                        if ordinal is not None
+                    ),
+                )
+                rv[key] = SqlChildIds(self, table, (index, alt, key), cursor.rowcount)
+        return rv
+
+    def clear(self) -> None:
+        """Delete all stored groups."""
+        with self.lock, self._conn:
+            self._conn.execute("DELETE FROM child_ids")
+
+    def close(self) -> None:
+        """Close the database, and delete its file."""
+        self._finalizer()
+
+    def select_ordinals(
+        self,
+        group: tuple[str, str, str],
+        tail: str = "ORDER BY ordinal",
+        params: tuple[Any, ...] = (),
+    ) -> list[int]:
+        """Select ordinals from a group.
+
+        The SQL in ``tail`` is appended to the ``WHERE`` clause which selects
+        the group.  It may further restrict the rows, and should specify
+        their order.
+
+        """
+        sql = f"SELECT ordinal FROM child_ids WHERE {_GROUP} {tail}"
+        with self.lock:
+            return [row[0] for row in self._conn.execute(sql, group + params)]
+
+    def contains(self, group: tuple[str, str, str], ordinal: int) -> bool:
+        """Whether a group contains an ordinal."""
+        sql = f"SELECT 1 FROM child_ids WHERE {_GROUP} AND ordinal = ?"
+        with self.lock:
+            return self._conn.execute(sql, (*group, ordinal)).fetchone() is not None
+
+
+class SqlChildIds(ChildIds):
+    """A ``ChildIds`` whose ordinals are stored in a ``SqliteGroupStore``.
+
+    Only the number of ordinals is held in memory.
+
+    """
+
+    __slots__ = ("store", "group", "_len")
+
+    def __init__(
+        self,
+        store: SqliteGroupStore,
+        table: IdTable,
+        group: tuple[str, str, str],
+        length: int,
+    ):
+        self.store = store
+        self.table = table
+        self.group = group
+        self._len = length
+
+    def __len__(self) -> int:
+        return self._len
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> ChildIds: ...
+
+    def __getitem__(self, index: int | slice) -> str | ChildIds:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return self._materialize()[index]
+            ordinals = self._select_range(start, max(stop - start, 0))
+            return ChildIds._from_sorted(self.table, ordinals)
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("index out of range")
+        (ordinal,) = self._select_range(index, 1)
+        return self.table.ids[ordinal]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.table.ids.__getitem__, self._iter_ordinals())
+
+    def _iter_ordinals(self) -> Generator[int]:
+        # Iterate in batches, each starting after the last ordinal seen
+        last = -1
+        while True:
+            batch = self.store.select_ordinals(
+                self.group,
+                "AND ordinal > ? ORDER BY ordinal LIMIT ?",
+                (last, BATCH_SIZE),
+            )
+            yield from batch
+            if len(batch) < BATCH_SIZE:
+                return
+            last = batch[-1]
+
+    def _select_range(self, offset: int, limit: int) -> array[int]:
+        ordinals = self.store.select_ordinals(
+            self.group, "ORDER BY ordinal LIMIT ? OFFSET ?", (limit, offset)
+        )
+        return array(ORDINAL_TYPECODE, ordinals)
+
+    def _all_ordinals(self) -> array[int]:
+        return array(ORDINAL_TYPECODE, self.store.select_ordinals(self.group))
+
+    def _materialize(self) -> ChildIds:
+        return ChildIds._from_sorted(self.table, self._all_ordinals())
+
+    def __contains__(self, id_: object) -> bool:
+        if not isinstance(id_, str):
+            return False
+        ordinal = self.table.ordinal(id_)
+        if ordinal is None:
+            return False
+        return self.store.contains(self.group, ordinal)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # When pickled (e.g. to persist the cache), we are materialized
+        # as a plain ``ChildIds``.
+        return ChildIds._from_sorted, (self.table, self._all_ordinals())
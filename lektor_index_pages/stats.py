@@ -0,0 +1,157 @@
+"""Statistics about the configured indexes.
+
+These are used by the ``lektor-index-pages stats`` command to report
+on the shape of each index tree (how many keys, how many children per
+key, how many pages), and on the cost of computing it, without having
+to run a full build.
+
+"""
+
+from __future__ import annotations
+
+import statistics
+import sys
+import time
+from array import array
+from typing import Callable
+from typing import Generator
+from typing import Iterable
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+from lektor.environment import PRIMARY_ALT
+
+from .config import NoSuchIndex
+
+if TYPE_CHECKING:
+    from lektor.db import Pad
+
+    from .config import Config
+    from .plugin import Cache
+    from .sourceobj import IndexBase
+    from .sourceobj import IndexSource
+
+
+class LevelStats(NamedTuple):
+    """Statistics about one level of an index tree."""
+
+    name: str
+    keys: int
+    max_children: int
+    median_children: float
+    pages: int
+
+
+class IndexStats(NamedTuple):
+    """Statistics about an index tree."""
+
+    index_name: str
+    alt: str
+    levels: tuple[LevelStats, ...]
+    seconds: float
+    cache_bytes: int
+
+
+def iter_index_stats(
+    config: Config, pad: Pad, cache: Cache, alt: str = PRIMARY_ALT
+) -> Generator[IndexStats]:
+    """Compute every configured index, and report statistics about each.
+
+    The time taken to compute each index tree is measured, as is the memory
+    used by the entries it adds to ``cache``.  (Entries which are shared
+    with an index computed previously — e.g. the items of indexes with the
+    same ``parent_path`` and ``items`` — are attributed to the index which
+    first computed them.)
+
+    """
+    for index_name in config.index_models:
+        try:
+            index_root = config.get_index_root(index_name, pad, alt)
+        except NoSuchIndex:
+            continue
+        with cache.lock:
+            keys_before = set(cache.data)
+        start = time.perf_counter()
+        levels = tuple(_level_stats(index_root.subindexes))
+        seconds = time.perf_counter() - start
+        with cache.lock:
+            new_entries = [
+                (key, value)
+                for key, value in cache.data.items()
+                if key not in keys_before
+            ]
+        yield IndexStats(index_name, alt, levels, seconds, deep_sizeof(new_entries))
+
+
+def _level_stats(sources: Iterable[IndexSource]) -> Generator[LevelStats]:
+    sources = list(sources)
+    while sources:
+        name = sources[0]._model.index_name
+        nchildren = [source.children.count() for source in sources]
+        yield LevelStats(
+            name,
+            keys=len(sources),
+            max_children=max(nchildren),
+            median_children=statistics.median(nchildren),
+            pages=sum(map(_count_pages, sources)),
+        )
+        sources = [
+            subindex
+            for source in sources
+            if source.has_subindex
+            for subindex in source.subindexes
+        ]
+
+
+def _count_pages(source: IndexBase) -> int:
+    pagination_config = source.datamodel.pagination_config
+    if not pagination_config.enabled:
+        return 1
+    return pagination_config.count_pages(source)  # type: ignore[no-any-return]
+
+
+def deep_sizeof(obj: object) -> int:
+    """Estimate the memory used by an object, and the objects it contains.
+
+    Each object is counted once.  (See ``iter_objects``.)
+
+    """
+    return sum(map(sys.getsizeof, iter_objects([obj])))
+
+
+def iter_objects(
+    roots: Iterable[object],
+    seen: set[int] | None = None,
+    include: Callable[[object], bool] | None = None,
+) -> Generator[object]:
+    """Iterate over the objects reachable from ``roots``.
+
+    This follows the contents of the builtin containers, and the slots
+    and instance dicts of other objects.  Objects for which ``include``
+    returns false are neither yielded, nor looked into.  Objects whose ids
+    are in ``seen`` are skipped; the ids of the objects yielded are added
+    to ``seen``.
+
+    """
+    if seen is None:
+        seen = set()
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or (include is not None and not include(obj)):
+            continue
+        seen.add(id(obj))
+        yield obj
+        if isinstance(obj, (str, bytes, int, float, array, memoryview)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
@@ -0,0 +1,226 @@
+"""A map from URL path to index page, for the devserver's URL resolution.
+
+The devserver calls our URL resolver for nearly every URL it serves
+under a record with indexes — including those for ordinary child pages
+and their attachments.  Resolving a URL by searching the index trees
+for a subindex with a matching slug requires computing the slugs of
+(potentially) all of the subindexes along the way.
+
+Instead, for each record with indexes, we build a map from the URL path
+(relative to the record's URL) of every index page to a description of
+where that page is in its index tree.  Resolving a URL is then a single
+dict lookup, and URLs which are not those of index pages are rejected
+immediately.
+
+The map is built, in a background thread, the first time a URL is
+resolved under its record.  (Until it is ready, URLs are resolved by
+searching the index trees, as usual.)  Maps are kept in the plugin
+cache, so they are discarded, and rebuilt when next needed, whenever
+the cache is cleared.  Should building a map fail, the failure is
+logged, and URLs under its record are resolved by search until the
+cache is next cleared.
+
+URLs which are found, by search, not to resolve are remembered in a
+bounded ``UrlMisses`` cache, so that repeated requests for them (e.g.
+for static assets polled by the devserver's live-reload) are rejected
+immediately, even when no URL map is available.
+
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict
+from typing import Sequence
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from .buildprog import iter_index_tree
+from .config import ResolvedPath
+from .sourceobj import IndexRoot
+from .sourceobj import IndexSource
+
+if TYPE_CHECKING:
+    from lektor.db import Database
+    from lektor.db import Record
+
+    from .config import Config
+    from .plugin import Cache
+
+
+logger = logging.getLogger(__name__)
+
+# Maps URL path pieces to (index name, location of the index page)
+UrlMap = Dict[Tuple[str, ...], Tuple[str, ResolvedPath]]
+
+# (record path, alt, URL path pieces)
+UrlMissKey = Tuple[str, str, Tuple[str, ...]]
+
+# The maximum number of URL misses remembered
+MAX_URL_MISSES = 1024
+
+
+def build_url_map(config: Config, record: Record) -> UrlMap:
+    """Map the URL paths of all index pages under ``record``.
+
+    Where the URLs of pages in different indexes collide, the page in the
+    first configured index wins, as it does when resolving URLs by search.
+
+    """
+    url_map: UrlMap = {}
+    for index_root in config.iter_index_roots(record):
+        prefix = index_root.url_path
+        for source in iter_index_tree(index_root):
+            if not isinstance(source, IndexSource):
+                continue
+            if source.datamodel.pagination_config.enabled and source.page_num is None:
+                # The unpaginated version of a paginated page has no URL
+                # of its own
+                continue
+            url_path = source.url_path
+            if url_path.startswith(prefix):
+                pieces = tuple(url_path[len(prefix) :].strip("/").split("/"))
+                url_map.setdefault(
+                    pieces, (index_root._id, ResolvedPath.from_source(source))
+                )
+    return url_map
+
+
+def lookup_url_path(
+    config: Config, record: Record, url_map: UrlMap, url_path: Sequence[str]
+) -> IndexSource | None:
+    """Find the index page with a URL path in a URL map."""
+    entry = url_map.get(tuple(url_path))
+    if entry is None:
+        return None
+    index_name, resolved = entry
+    index_root = IndexRoot.get_index(config.index_models[index_name], record)
+    source = resolved.get_source(index_root)
+    assert isinstance(source, IndexSource)
+    return source
+
+
+class UrlMapper:
+    """Maintain the URL maps in the plugin cache."""
+
+    def __init__(self, cache: Cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.pending: dict[tuple[str, str], threading.Thread] = {}
+        # The cache generation in which building each map last failed
+        self.failed: dict[tuple[str, str], int] = {}
+
+    def get_url_map(self, config: Config, record: Record) -> UrlMap | None:
+        """Get the URL map for a record.
+
+        If the map has not yet been built, this starts building it in the
+        background, and returns ``None``.
+
+        """
+        cache = self.cache
+        with cache.lock:
+            url_map: UrlMap | None = cache.data.get(
+                ("url_map", record.path, record.alt)
+            )
+            generation = cache.generation
+        if url_map is None:
+            self._refresh(config, record.pad.db, record.path, record.alt, generation)
+        return url_map
+
+    def _refresh(
+        self, config: Config, db: Database, path: str, alt: str, generation: int
+    ) -> None:
+        with self.lock:
+            if (path, alt) in self.pending:
+                return
+            if self.failed.get((path, alt)) == generation:
+                return
+            thread = threading.Thread(
+                target=self._build,
+                args=(config, db, path, alt, generation),
+                name="index-pages-urlmap",
+                daemon=True,
+            )
+            self.pending[path, alt] = thread
+        thread.start()
+
+    def _build(
+        self, config: Config, db: Database, path: str, alt: str, generation: int
+    ) -> None:
+        url_map = None
+        try:
+            # Pads are not shared between threads
+            pad = db.new_pad()
+            record = pad.get(path, alt=alt)
+            if record is not None:
+                url_map = build_url_map(config, record)
+        except Exception:
+            logger.exception("building the URL map for %s failed", path)
+
+        if url_map is not None:
+            cache = self.cache
+            with cache.lock:
+                # Do not store a map computed from data which has since
+                # been discarded
+                if cache.generation == generation:
+                    cache.data["url_map", path, alt] = url_map
+        with self.lock:
+            if url_map is None:
+                self.failed[path, alt] = generation
+            del self.pending[path, alt]
+
+    def wait(self) -> None:
+        """Wait for any maps being built in the background."""
+        with self.lock:
+            threads = list(self.pending.values())
+        for thread in threads:
+            thread.join()
+
+
+class UrlMisses:
+    """A bounded LRU cache of the URLs which are known not to resolve.
+
+    The misses are discarded whenever the plugin cache is cleared (since
+    the groupings of the indexes may then have changed.)
+
+    """
+
+    def __init__(self, cache: Cache, maxsize: int = MAX_URL_MISSES):
+        self.cache = cache
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.misses: OrderedDict[UrlMissKey, None] = OrderedDict()
+        self.generation = cache.generation
+
+    def _check_generation(self) -> int:
+        generation = self.cache.generation
+        if generation != self.generation:
+            self.misses.clear()
+            self.generation = generation
+        return generation
+
+    def __contains__(self, key: UrlMissKey) -> bool:
+        with self.lock:
+            self._check_generation()
+            if key not in self.misses:
+                return False
+            self.misses.move_to_end(key)
+            return True
+
+    def add(self, key: UrlMissKey, generation: int) -> None:
+        """Remember a miss.
+
+        ``generation`` is the generation of the plugin cache at the time
+        the URL was resolved.  If the cache has been cleared since, the
+        miss is not remembered.
+
+        """
+        with self.lock:
+            if self._check_generation() != generation:
+                return
+            self.misses[key] = None
+            self.misses.move_to_end(key)
+            while len(self.misses) > self.maxsize:
+                self.misses.popitem(last=False)
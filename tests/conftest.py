@@ -1,3 +1,4 @@
+import shutil
 import sys
 from contextlib import ExitStack
 from pathlib import Path
@@ -38,6 +39,49 @@ def site_path():
     return Path(__file__).parent / "demo-site"
 
 
+@pytest.fixture
+def news_site_path(site_path, tmp_path):
+    """A copy of the demo site, with an added /news section."""
+    site_copy = tmp_path / "news-site"
+    shutil.copytree(site_path, site_copy)
+    news = site_copy / "content" / "news"
+    news.mkdir()
+    (news / "contents.lr").write_text("_model: blog\n---\ntitle: News\n")
+    for id_, pub_date in [("launch", "2020-03-30"), ("preview", "2019-12-01")]:
+        (news / id_).mkdir()
+        (news / id_ / "contents.lr").write_text(
+            f"_model: blog-post\n---\ntitle: {id_}\n---\npub_date: {pub_date}\n"
+        )
+    return site_copy
+
+
+@pytest.fixture
+def docs_site_path(site_path, tmp_path):
+    """A copy of the demo site, with an added tree of /docs pages."""
+    site_copy = tmp_path / "docs-site"
+    shutil.copytree(site_path, site_copy)
+    (site_copy / "models" / "doc.ini").write_text(
+        "[model]\nname = Doc\n\n[fields.title]\ntype = string\n\n"
+        "[children]\nmodel = doc\norder_by = title\n"
+    )
+    docs = site_copy / "content" / "docs"
+    for path, title, extra in [
+        ("", "Docs", ""),
+        ("guide", "A Guide", ""),
+        ("guide/install", "Install", ""),
+        ("guide/usage", "Usage", ""),
+        ("api", "B API", ""),
+        ("api/internals", "Internals", "---\n_hidden: yes\n"),
+        ("api/internals/secret", "Secret", ""),
+        ("api/reference", "Reference", ""),
+    ]:
+        (docs / path).mkdir()
+        (docs / path / "contents.lr").write_text(
+            f"_model: doc\n---\ntitle: {title}\n{extra}"
+        )
+    return site_copy
+
+
 @pytest.fixture
 def lektor_project(site_path):
     return lektor.project.Project.from_path(str(site_path))
@@ -0,0 +1,256 @@
+"""Profile the memory used by the index trees of a synthetic site.
+
+This generates a site (see ``tests.synthsite``), then, with
+``tracemalloc`` tracing, constructs every ``IndexRoot`` and
+``IndexSource`` of every configured index, filling the plugin cache
+along the way.  It reports:
+
+- the bytes allocated while computing each index;
+
+- the bytes held by the entries of each family of plugin cache keys
+  (``subindex_groups``, ``subindex_ids``, ``child_ids``, etc.), by the
+  virtual sources in the pad's record cache, and by the records loaded
+  into the pad;
+
+- the same bytes, grouped by object type;
+
+- the source lines which allocated the most memory.
+
+The pad, the environment, the plugin configuration and the index models
+(which are shared by all index sources) are not counted.  An object
+reachable from more than one cache key family is counted only in the
+first.
+
+Run it with::
+
+    python -m tests.memprofile --posts 10000 --tags 100
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import tracemalloc
+import types
+import weakref
+from collections import Counter
+from functools import partial
+from pathlib import Path
+from typing import Iterator
+from typing import NamedTuple
+
+import lektor.db
+from lektor.db import Database
+from lektor.environment import Environment
+from lektor.project import Project
+
+from lektor_index_pages import indexmodel
+from lektor_index_pages.buildprog import iter_index_tree
+from lektor_index_pages.config import Config
+from lektor_index_pages.plugin import Cache
+from lektor_index_pages.plugin import IndexPagesPlugin
+from lektor_index_pages.stats import iter_objects
+
+from .synthsite import make_site
+
+PLUGIN_ID = "index-pages"
+
+# The plugin cache key families which are always reported
+CACHE_KEY_FAMILIES = (
+    "items",
+    "subindex_groups",
+    "subindex_ids",
+    "child_ids",
+    "resolved_path",
+    "url_map",
+)
+
+PAD_VIRTUAL_CACHE = "pad virtual cache"
+PAD_RECORDS = "pad records"
+
+# Objects of these types are neither counted, nor looked into
+UNCOUNTED_TYPES = (
+    lektor.db.Pad,
+    lektor.db.Database,
+    Environment,
+    Config,
+    weakref.ref,
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    property,
+)
+
+# The number of frames of traceback stored by tracemalloc
+TRACEBACK_FRAMES = 10
+
+
+class IndexMemory(NamedTuple):
+    """The memory allocated while computing an index tree."""
+
+    index_name: str
+    sources: int
+    bytes: int
+
+
+class MemoryProfile(NamedTuple):
+    indexes: tuple[IndexMemory, ...]
+    # bytes, keyed by cache key family
+    families: dict[str, int]
+    # (count, bytes), keyed by type name
+    types: dict[str, tuple[int, int]]
+    snapshot: tracemalloc.Snapshot
+
+
+def profile_site(site_path: Path) -> MemoryProfile:
+    """Profile the memory used by the indexes of the site at ``site_path``."""
+    project = Project.from_path(str(site_path))
+    env = project.make_env(load_plugins=False)
+    env.plugin_controller.instanciate_plugin(PLUGIN_ID, IndexPagesPlugin)
+    env.plugin_controller.emit("setup-env")
+    plugin = env.plugins[PLUGIN_ID]
+    config = plugin.read_config()
+    pad = Database(env).new_pad()
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(TRACEBACK_FRAMES)
+    try:
+        indexes = []
+        for index_name in config.index_models:
+            before, _ = tracemalloc.get_traced_memory()
+            index_root = config.get_index_root(index_name, pad)
+            sources = sum(1 for _ in iter_index_tree(index_root))
+            after, _ = tracemalloc.get_traced_memory()
+            indexes.append(IndexMemory(index_name, sources, after - before))
+
+        families: dict[str, int] = {}
+        type_bytes: Counter[str] = Counter()
+        type_counts: Counter[str] = Counter()
+        seen: set[int] = set()
+        for family, roots in _iter_families(plugin.cache, pad):
+            families[family] = 0
+            include = partial(_is_counted, records=family == PAD_RECORDS)
+            for obj in iter_objects(roots, seen, include):
+                size = sys.getsizeof(obj)
+                type_name = _type_name(obj)
+                families[family] += size
+                type_bytes[type_name] += size
+                type_counts[type_name] += 1
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    return MemoryProfile(
+        indexes=tuple(indexes),
+        families=families,
+        types={name: (type_counts[name], size) for name, size in type_bytes.items()},
+        snapshot=snapshot,
+    )
+
+
+def _iter_families(
+    cache: Cache, pad: lektor.db.Pad
+) -> Iterator[tuple[str, list[object]]]:
+    """Iterate over the cache key families, and the objects in each."""
+    with cache.lock:
+        entries = list(cache.data.items())
+    families: dict[str, list[object]] = {name: [] for name in CACHE_KEY_FAMILIES}
+    for key, value in entries:
+        family = key[0] if isinstance(key, tuple) else key
+        families.setdefault(family, []).extend((key, value))
+    yield from families.items()
+
+    virtual_sources = []
+    records = []
+    for source in pad.cache.persistent.values():
+        if source is None:
+            continue
+        if isinstance(source, lektor.db.Record):
+            records.append(source)
+        else:
+            virtual_sources.append(source)
+    records.extend(
+        record for record in pad.cache.ephemeral.values() if record is not None
+    )
+    yield PAD_VIRTUAL_CACHE, virtual_sources
+    yield PAD_RECORDS, records
+
+
+def _is_counted(obj: object, records: bool = False) -> bool:
+    if isinstance(obj, UNCOUNTED_TYPES):
+        return False
+    if isinstance(obj, lektor.db.Record) and not records:
+        # Records are counted in the PAD_RECORDS family
+        return False
+    # The index models, and their field descriptors
+    return type(obj).__module__ != indexmodel.__name__
+
+
+def _type_name(obj: object) -> str:
+    cls = type(obj)
+    if cls.__module__ == "builtins":
+        return cls.__qualname__
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def format_profile(profile: MemoryProfile, top: int = 10) -> Iterator[str]:
+    """Format a memory profile as lines of text."""
+
+    def kib(size: int) -> str:
+        return f"{size / 1024:10.1f}"
+
+    yield f"{'Index':<40} {'sources':>8} {'KiB':>10}"
+    for index in profile.indexes:
+        yield f"{index.index_name:<40} {index.sources:>8} {kib(index.bytes)}"
+
+    yield ""
+    yield f"{'Cache key family':<49} {'KiB':>10}"
+    for family, size in profile.families.items():
+        yield f"{family:<49} {kib(size)}"
+
+    yield ""
+    yield f"{'Object type':<40} {'count':>8} {'KiB':>10}"
+    types = sorted(profile.types.items(), key=lambda item: item[1][1], reverse=True)
+    for type_name, (count, size) in types[:top]:
+        yield f"{type_name:<40} {count:>8} {kib(size)}"
+
+    yield ""
+    yield "Top allocation sites"
+    for stat in profile.snapshot.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        yield f"  {frame.filename}:{frame.lineno}: {kib(stat.size)} KiB"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.memprofile",
+        description="Profile the memory used by the indexes of a synthetic site.",
+    )
+    parser.add_argument("--posts", type=int, default=1000, help="number of posts")
+    parser.add_argument("--tags", type=int, default=20, help="number of tags")
+    parser.add_argument(
+        "--top", type=int, default=10, help="number of types and lines to show"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        site_path = make_site(Path(tmpdir), num_posts=args.posts, num_tags=args.tags)
+        profile = profile_site(site_path)
+    for line in format_profile(profile, top=args.top):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Generate synthetic Lektor sites of a fixed size.
+
+The generated site has a single blog, whose posts are indexed by year
+(with a month sub-index) and by tag.  Everything about the site is a
+deterministic function of its size, so that operation counts (and
+memory use) measured while building it are reproducible.
+
+"""
+
+import datetime
+import inspect
+from pathlib import Path
+
+PROJECT = """
+[project]
+name = Synthetic Site
+"""
+
+MODELS = {
+    "page.ini": """
+        [model]
+        name = Page
+
+        [fields.title]
+        type = string
+        """,
+    "blog.ini": """
+        [model]
+        name = Blog
+
+        [fields.title]
+        type = string
+
+        [children]
+        model = blog-post
+        order_by = -pub_date, title
+        """,
+    "blog-post.ini": """
+        [model]
+        name = Blog Post
+
+        [fields.title]
+        type = string
+
+        [fields.pub_date]
+        type = date
+
+        [fields.tags]
+        type = strings
+        """,
+}
+
+TEMPLATES = {
+    "page.html": "<h1>{{ this.title }}</h1>",
+    "blog.html": """
+        {% for child in this.children %}<p>{{ child.title }}</p>{% endfor %}
+        """,
+    "blog-post.html": "<h1>{{ this.title }}</h1>",
+    "index.html": """
+        <h1>{{ this._id }}</h1>
+        {% for name in ["year", "month", "tag"] if name in this %}
+          <p>{{ name }}: {{ this[name] }}</p>
+        {% endfor %}
+        {% for child in this.pagination.items %}<p>{{ child.title }}</p>{% endfor %}
+        {% if this.subindexes is defined %}
+          {% for index in this.subindexes %}<p>{{ index._id }}</p>{% endfor %}
+        {% endif %}
+        """,
+}
+
+CONFIG = """
+[pagination]
+enabled = yes
+per_page = 10
+
+[year-index]
+parent_path = /blog
+key = "{0.year:04d}".format(item.pub_date)
+template = index.html
+subindex = bymonth
+
+[year-index.fields]
+year = this.key|int
+
+[year-index.bymonth]
+key = '{:02d}'.format(item.pub_date.month)
+template = index.html
+
+[year-index.bymonth.fields]
+month = this.key|int
+
+[tag-index]
+parent_path = /blog
+key = item.tags
+template = index.html
+
+[tag-index.fields]
+tag = this.key
+"""
+
+# The date of the first post
+START_DATE = datetime.date(2018, 1, 1)
+
+# Days between posts
+POST_INTERVAL = 9
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(inspect.cleandoc(text) + "\n")
+
+
+def make_site(
+    path: Path, num_posts: int = 100, num_tags: int = 10, persist_cache: bool = False
+) -> Path:
+    """Generate a site with ``num_posts`` blog posts in directory ``path``.
+
+    Each post has two of ``num_tags`` tags.  If ``persist_cache`` is set,
+    the plugin is configured to persist its cache between builds.
+    Returns ``path``.
+
+    """
+    _write(path / "Synthetic Site.lektorproject", PROJECT)
+    for name, text in MODELS.items():
+        _write(path / "models" / name, text)
+    for name, text in TEMPLATES.items():
+        _write(path / "templates" / name, text)
+    config = CONFIG + "\n[cache]\npersist = yes\n" if persist_cache else CONFIG
+    _write(path / "configs" / "index-pages.ini", config)
+
+    content = path / "content"
+    _write(content / "contents.lr", "_model: page\n---\ntitle: Home")
+    _write(content / "blog" / "contents.lr", "_model: blog\n---\ntitle: Blog")
+    for n in range(num_posts):
+        pub_date = START_DATE + datetime.timedelta(days=n * POST_INTERVAL)
+        tags = sorted({f"tag{n % num_tags}", f"tag{n * 7 % num_tags}"})
+        _write(
+            content / "blog" / f"post-{n:05d}" / "contents.lr",
+            f"title: Post {n}\n---\n"
+            f"pub_date: {pub_date.isoformat()}\n---\n"
+            "tags:\n\n" + "\n".join(tags),
+        )
+    return path
@@ -3,7 +3,9 @@ from pathlib import Path
 import lektor.context
 import pytest
 
+from lektor_index_pages.buildprog import get_prerenderer
 from lektor_index_pages.buildprog import IndexBuildProgram
+from lektor_index_pages.buildprog import iter_index_tree
 
 
 @pytest.fixture
@@ -27,6 +29,13 @@ class Test_build_index_root:
         prog.produce_artifacts()
         assert not declare_artifact.called
 
+    def test_produce_artifacts_prerenders(
+        self, prog, source, plugin, lektor_build_state, mocker
+    ):
+        plugin.prerenderer = mocker.Mock(name="prerenderer")
+        prog.produce_artifacts()
+        plugin.prerenderer.prerender.assert_called_once_with(source, lektor_build_state)
+
     def test_iter_child_sources_pages(self, prog, source):
         assert [src.path for src in prog.iter_child_sources()] == [
             "/blog@index-pages/year-index/2020"
@@ -66,6 +75,27 @@ class TestIndexBuildProgram:
             mocker.call.render_template_into(template, this=source),
         ]
 
+    def test_build_artifact_prerendered(self, prog, plugin, mocker):
+        plugin.prerenderer = mocker.Mock(name="prerenderer")
+        rendered = plugin.prerenderer.take.return_value
+        artifact = mocker.Mock(name="artifact", artifact_name="blog/2020/index.html")
+
+        prog.build_artifact(artifact)
+        plugin.prerenderer.take.assert_called_once_with("blog/2020/index.html")
+        rendered.write_into.assert_called_once_with(artifact, None)
+        assert not artifact.render_template_into.called
+
+    def test_build_artifact_not_prerendered(self, prog, source, plugin, mocker):
+        plugin.prerenderer = mocker.Mock(name="prerenderer")
+        plugin.prerenderer.take.return_value = None
+        artifact = mocker.Mock(name="artifact", spec=("render_template_into",))
+        artifact.artifact_name = "blog/2020/index.html"
+
+        prog.build_artifact(artifact)
+        assert artifact.mock_calls == [
+            mocker.call.render_template_into("year-index.html", this=source),
+        ]
+
     def test_build_artifact_records_dependency(self, prog, source, inifile, mocker):
         artifact = mocker.Mock(name="artifact")
         with lektor.context.Context(artifact, pad=None) as ctx:
@@ -94,3 +124,25 @@ class TestIndexBuildProgram:
     )
     def test_iter_child_sources(self, prog, expected):
         assert [src.path for src in prog.iter_child_sources()] == expected
+
+
+@pytest.mark.parametrize("pagination_enabled", [True])
+@pytest.mark.parametrize("month_index_enabled", [True])
+def test_iter_index_tree(index_root):
+    assert [source.path for source in iter_index_tree(index_root)] == [
+        "/blog@index-pages/year-index",
+        "/blog@index-pages/year-index/2020",
+        "/blog@index-pages/year-index/2020/page/1",
+        "/blog@index-pages/year-index/2020/04",
+        "/blog@index-pages/year-index/2020/04/page/1",
+        "/blog@index-pages/year-index/2020/03",
+        "/blog@index-pages/year-index/2020/03/page/1",
+    ]
+
+
+def test_get_prerenderer(plugin, lektor_env):
+    assert get_prerenderer(lektor_env) is None
+
+
+def test_get_prerenderer_without_plugin(lektor_env):
+    assert get_prerenderer(lektor_env) is None
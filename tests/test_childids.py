@@ -0,0 +1,201 @@
+import pickle
+
+import lektor.context
+import pytest
+from lektor.db import F
+
+from lektor_index_pages.childids import ChildIds
+from lektor_index_pages.childids import ChildQuery
+from lektor_index_pages.childids import IdTable
+from lektor_index_pages.childids import ItemsQuery
+
+
+@pytest.fixture
+def id_table():
+    return IdTable(["c", "a", "b", "d"])
+
+
+class TestIdTable:
+    def test_len(self, id_table):
+        assert len(id_table) == 4
+
+    @pytest.mark.parametrize("id_, ordinal", [("c", 0), ("d", 3), ("x", None)])
+    def test_ordinal(self, id_table, id_, ordinal):
+        assert id_table.ordinal(id_) == ordinal
+
+    def test_all(self, id_table):
+        assert list(id_table.all()) == ["c", "a", "b", "d"]
+
+    def test_select(self, id_table):
+        child_ids = id_table.select(["d", "x", "a", "d"])
+        assert list(child_ids) == ["a", "d"]
+        assert child_ids.ordinals.tolist() == [1, 3]
+
+    @pytest.mark.parametrize("undiscoverable", [False, True])
+    def test_pickle(self, undiscoverable):
+        table = pickle.loads(pickle.dumps(IdTable(["a", "b"], undiscoverable)))
+        assert table.ids == ("a", "b")
+        assert table.undiscoverable is undiscoverable
+        assert table.ordinal("b") == 1
+
+
+class TestChildIds:
+    @pytest.fixture
+    def child_ids(self, id_table):
+        return ChildIds(id_table, [3, 0, 1])
+
+    def test_len(self, child_ids):
+        assert len(child_ids) == 3
+
+    def test_getitem(self, child_ids):
+        assert child_ids[0] == "c"
+        assert child_ids[-1] == "d"
+
+    def test_getitem_slice(self, child_ids):
+        sliced = child_ids[1:]
+        assert isinstance(sliced, ChildIds)
+        assert sliced.table is child_ids.table
+        assert list(sliced) == ["a", "d"]
+
+    def test_iter(self, child_ids):
+        assert list(child_ids) == ["c", "a", "d"]
+
+    @pytest.mark.parametrize(
+        "id_, expected",
+        [
+            ("c", True),
+            ("d", True),
+            ("b", False),
+            ("x", False),
+            (0, False),
+        ],
+    )
+    def test_contains(self, child_ids, id_, expected):
+        assert (id_ in child_ids) is expected
+
+    def test_contains_past_end(self, id_table):
+        assert "d" not in ChildIds(id_table, [0])
+
+    def test_repr(self, child_ids):
+        assert repr(child_ids) == "<ChildIds ['c', 'a', 'd']>"
+
+
+class TestChildQuery:
+    @pytest.fixture
+    def id_table(self, blog_record):
+        return IdTable(post["_id"] for post in blog_record.children)
+
+    @pytest.fixture
+    def query(self, id_table, lektor_pad):
+        return ChildQuery("/blog", lektor_pad, id_table.select(["first-post"]))
+
+    def test_iter(self, query):
+        assert [post.path for post in query] == ["/blog/first-post"]
+
+    def test_iter_tests_no_membership(self, query, mocker):
+        contains = mocker.spy(ChildIds, "__contains__")
+        assert len(list(query)) == 1
+        contains.assert_not_called()
+
+    def test_count(self, query):
+        assert query.count() == 1
+
+    def test_get(self, query):
+        assert query.get("first-post").path == "/blog/first-post"
+        assert query.get("second-post") is None
+        assert query._get("second-post") is None
+
+    def test_bool(self, lektor_pad, id_table):
+        assert not ChildQuery("/blog", lektor_pad, id_table.select([]))
+
+    def test_bool_filtered(self, query):
+        assert query
+        assert not query.filter(lambda post: False)
+
+    def test_request_page(self, query):
+        assert [post.page_num for post in query.request_page(2)] == [2]
+
+    def test_missing_record(self, lektor_pad):
+        query = ChildQuery("/blog", lektor_pad, IdTable(["missing"]).all())
+        with pytest.raises(RuntimeError, match="could not load source"):
+            list(query)
+
+    def test_filter(self, query):
+        assert query.filter(lambda post: False).count() == 0
+
+    @pytest.mark.parametrize(
+        "offset, limit, expected",
+        [
+            (None, 1, ["second-post"]),
+            (1, None, ["first-post"]),
+            (1, 1, ["first-post"]),
+            (2, 1, []),
+        ],
+    )
+    def test_offset_limit(self, lektor_pad, id_table, offset, limit, expected):
+        query = ChildQuery("/blog", lektor_pad, id_table.all())
+        sliced = query.offset(offset).limit(limit)
+        assert [post["_id"] for post in sliced] == expected
+        assert list(query.child_ids) == ["second-post", "first-post"]
+
+    def test_offset_with_filter(self, lektor_pad, id_table):
+        query = ChildQuery("/blog", lektor_pad, id_table.all())
+        sliced = query.filter(F._id != "second-post").offset(0).limit(1)
+        assert [post["_id"] for post in sliced] == ["first-post"]
+
+    def test_offset_with_order_by(self, lektor_pad, id_table):
+        query = ChildQuery("/blog", lektor_pad, id_table.all())
+        sliced = query.order_by("_id").offset(1)
+        assert [post["_id"] for post in sliced] == ["second-post"]
+
+
+class TestChildQueryUndiscoverable:
+    @pytest.fixture
+    def site_path(self, docs_site_path):
+        return docs_site_path
+
+    @pytest.fixture
+    def query(self, lektor_pad):
+        # /docs/api/internals is hidden
+        id_table = IdTable(["internals", "reference"], undiscoverable=True)
+        return ChildQuery("/docs/api", lektor_pad, id_table.all())
+
+    @pytest.mark.parametrize(
+        "include_hidden, include_undiscoverable, offset, limit, expected",
+        [
+            (None, False, None, 1, ["reference"]),
+            (None, False, 1, None, []),
+            (None, True, None, 1, ["internals"]),
+            (None, True, 1, None, ["reference"]),
+            (False, True, None, 1, ["reference"]),
+            (True, True, 1, 1, ["reference"]),
+        ],
+    )
+    def test_offset_limit(
+        self, query, include_hidden, include_undiscoverable, offset, limit, expected
+    ):
+        sliced = (
+            query.include_undiscoverable(include_undiscoverable)
+            .include_hidden(include_hidden)
+            .offset(offset)
+            .limit(limit)
+        )
+        assert [post["_id"] for post in sliced] == expected
+
+
+class TestItemsQuery:
+    @pytest.fixture
+    def query(self, blog_record, lektor_pad):
+        id_table = IdTable(post["_id"] for post in blog_record.children)
+        return ItemsQuery("/blog", lektor_pad, id_table.all())
+
+    def test_iter(self, query):
+        assert [post.path for post in query] == [
+            "/blog/second-post",
+            "/blog/first-post",
+        ]
+
+    def test_records_directory_dependency(self, query, lektor_pad):
+        with lektor.context.Context(pad=lektor_pad) as ctx:
+            list(query)
+        assert lektor_pad.db.to_fs_path("/blog") in ctx.referenced_dependencies
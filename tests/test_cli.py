@@ -0,0 +1,80 @@
+import shutil
+
+import pytest
+from click.testing import CliRunner
+
+from lektor_index_pages.cli import cli
+
+
+@pytest.fixture
+def runner():
+    return CliRunner()
+
+
+def test_stats(runner, site_path):
+    result = runner.invoke(cli, ["--project", str(site_path), "stats"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].startswith("[year-index]  ")
+    assert lines[1:] == [
+        "  year-index: 1 keys, children per key: max 2, median 2, 1 pages",
+        "  year-index.bymonth: 2 keys, children per key: max 1, median 1, 2 pages",
+    ]
+
+
+def test_plan(runner, site_path):
+    result = runner.invoke(cli, ["--project", str(site_path), "plan"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].startswith("# [year-index] alt=en: 3 artifacts, ")
+    assert lines[1].startswith("/blog/2020/index.html\t")
+    assert len(lines) == 8
+
+
+def test_plan_output(runner, site_path, tmp_path):
+    output = tmp_path / "plan.txt"
+    result = runner.invoke(
+        cli, ["--project", str(site_path), "plan", "--output", str(output)]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output == ""
+    assert output.read_text().startswith("# [year-index] alt=en: ")
+
+
+def test_write_keys(runner, site_path, tmp_path):
+    output = tmp_path / "index-keys.bin"
+    result = runner.invoke(
+        cli, ["--project", str(site_path), "write-keys", str(output)]
+    )
+    assert result.exit_code == 0, result.output
+    assert output.read_bytes().startswith(b"LIPKEYS\0")
+
+
+def test_discovers_project(runner, site_path, monkeypatch):
+    monkeypatch.chdir(site_path / "content")
+    result = runner.invoke(cli, ["stats"])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("[year-index]  ")
+
+
+def test_no_project(runner, tmp_path):
+    result = runner.invoke(cli, ["--project", str(tmp_path), "stats"])
+    assert result.exit_code == 2
+    assert "Could not find a Lektor project" in result.output
+
+
+def test_check(runner, site_path):
+    result = runner.invoke(cli, ["--project", str(site_path), "check"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "No errors found.\n"
+
+
+def test_check_error(runner, site_path, tmp_path):
+    site_copy = tmp_path / "site"
+    shutil.copytree(site_path, site_copy)
+    with open(site_copy / "configs" / "index-pages.ini", "a") as fp:
+        fp.write("\n[broken]\nkey = messed up\n")
+    result = runner.invoke(cli, ["--project", str(site_copy), "check"])
+    assert result.exit_code == 1
+    assert "syntax error in config" in result.output
+    assert "section [broken]" in result.output
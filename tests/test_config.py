@@ -2,6 +2,9 @@ import pytest
 
 from lektor_index_pages.config import Config
 from lektor_index_pages.config import NoSuchIndex
+from lektor_index_pages.config import ResolvedPath
+from lektor_index_pages.sourceobj import get_cache
+from lektor_index_pages.sourceobj import IndexBase
 from lektor_index_pages.sourceobj import IndexRoot
 
 
@@ -39,6 +42,20 @@ class TestConfig:
         assert isinstance(roots[0], IndexRoot)
         assert roots[0]._id == "year-index"
 
+    @pytest.mark.parametrize(
+        "index_names, expected",
+        [
+            (["year-index"], ["year-index"]),
+            (["other-index"], []),
+            ([], []),
+        ],
+    )
+    def test_iter_index_roots_selected(
+        self, config, blog_record, index_names, expected
+    ):
+        roots = config.iter_index_roots(blog_record, index_names)
+        assert [root._id for root in roots] == expected
+
     def test_resolve_virtual_path(self, config, blog_record):
         root = config.resolve_virtual_path(blog_record, ["year-index"])
         assert isinstance(root, IndexRoot)
@@ -52,6 +69,50 @@ class TestConfig:
     def test_resolve_virtual_path_failure(self, config, blog_record):
         assert config.resolve_virtual_path(blog_record, ["missing"]) is None
 
+    @pytest.mark.usefixtures("plugin")
+    def test_resolve_virtual_path_failure_not_cached(self, config, blog_record):
+        pieces = ["year-index", "1999"]
+        assert config.resolve_virtual_path(blog_record, pieces) is None
+        cache = get_cache(blog_record.pad)
+        with cache.lock:
+            assert not any(
+                isinstance(key, tuple) and key[0] == "resolved_path"
+                for key in cache.data
+            )
+
+    @pytest.mark.usefixtures("plugin")
+    @pytest.mark.parametrize("pagination_enabled", [1])
+    @pytest.mark.parametrize(
+        "pieces, expected",
+        [
+            (["year-index"], ResolvedPath((), None)),
+            (["year-index", "2020"], ResolvedPath(("2020",), None)),
+            (["year-index", "2020", "page", "2"], ResolvedPath(("2020",), 2)),
+            (["year-index", "1999"], None),
+        ],
+    )
+    def test_resolve_virtual_path_across_pads(
+        self, config, blog_record, lektor_pad, pieces, expected, mocker
+    ):
+        source = config.resolve_virtual_path(blog_record, pieces)
+        if expected is None:
+            assert source is None
+        else:
+            assert ResolvedPath.from_source(source) == expected
+
+        resolve_virtual_path = mocker.spy(IndexBase, "resolve_virtual_path")
+        pad = lektor_pad.db.new_pad()
+        record = pad.get("/blog", alt=blog_record.alt)
+        reget = config.resolve_virtual_path(record, pieces)
+        if expected is None:
+            # Failures are not cached
+            resolve_virtual_path.assert_called_once()
+            assert reget is None
+        else:
+            resolve_virtual_path.assert_not_called()
+            assert reget.path == source.path
+            assert reget.pad is pad
+
     @pytest.mark.usefixtures("plugin")
     def test_resolve_url_path(self, config, blog_record):
         year_idx = config.resolve_url_path(blog_record, ["2020"])
@@ -60,3 +121,32 @@ class TestConfig:
     @pytest.mark.usefixtures("plugin")
     def test_resolve_url_path_failure(self, config, blog_record):
         assert config.resolve_url_path(blog_record, ["missing"]) is None
+
+    def test_defaults(self, config):
+        assert config.prerender_workers == 0
+        assert config.lazy_resolve is False
+        assert config.persist_cache is False
+        assert config.cache_backend == "memory"
+
+    def test_settings(self, lektor_env, inifile):
+        inifile["prerender.workers"] = "3"
+        inifile["resolver.lazy"] = "true"
+        inifile["cache.persist"] = "yes"
+        inifile["cache.backend"] = "sqlite"
+        config = Config.from_ini(lektor_env, inifile)
+        assert config.prerender_workers == 3
+        assert config.lazy_resolve is True
+        assert config.persist_cache is True
+        assert config.cache_backend == "sqlite"
+
+    def test_validate(self, lektor_env, inifile):
+        inifile["broken.key"] = "messed up"
+        config = Config.from_ini(lektor_env, inifile)
+        config.validate(["year-index"])
+        with pytest.raises(RuntimeError, match=r"section \[broken\]"):
+            config.validate()
+
+    def test_unknown_cache_backend(self, lektor_env, inifile):
+        inifile["cache.backend"] = "redis"
+        with pytest.raises(RuntimeError, match="unknown backend"):
+            Config.from_ini(lektor_env, inifile)
@@ -0,0 +1,141 @@
+import jinja2
+import lektor.context
+import pytest
+
+from lektor_index_pages.fragments import Fragment
+from lektor_index_pages.fragments import FragmentCache
+from lektor_index_pages.fragments import source_fingerprint
+
+
+@pytest.fixture
+def post(lektor_pad):
+    return lektor_pad.get("/blog/first-post")
+
+
+@pytest.fixture
+def index_fragment(plugin):
+    return plugin.env.jinja_env.globals["index_fragment"]
+
+
+def new_context(pad, source):
+    ctx = lektor.context.Context(pad=pad)
+    # Set up the context the way the builder does for an artifact
+    ctx.source = source
+    return ctx
+
+
+class TestFragmentCache:
+    @pytest.fixture
+    def fragments(self):
+        return FragmentCache()
+
+    @pytest.fixture
+    def render_template(self, lektor_env, mocker):
+        return mocker.spy(lektor_env, "render_template")
+
+    def test_render(self, fragments, post, lektor_pad, render_template):
+        with new_context(lektor_pad, post.parent):
+            html = fragments.render("blog-teaser.html", post)
+            assert fragments.render("blog-teaser.html", post) == html
+        assert isinstance(html, jinja2.utils.markupsafe.Markup)
+        assert '<a href="/blog/first-post/">Hello Website</a>' in html
+        assert render_template.call_count == 1
+
+    def test_replays_dependencies(self, fragments, post, lektor_pad, site_path):
+        with new_context(lektor_pad, post.parent):
+            fragments.render("blog-teaser.html", post)
+        with new_context(lektor_pad, post.parent) as ctx:
+            fragments.render("blog-teaser.html", post)
+        template = site_path / "templates" / "blog-teaser.html"
+        assert str(template) in ctx.referenced_dependencies
+        assert post.source_filename in ctx.referenced_dependencies
+
+    @pytest.mark.usefixtures("plugin")
+    def test_replays_virtual_dependencies(
+        self, fragments, post, lektor_pad, lektor_env, mocker
+    ):
+        year_index = lektor_pad.get("/blog@index-pages/year-index/2020")
+
+        def render_template(name, pad, this):
+            lektor.context.get_ctx().record_virtual_dependency(year_index)
+            return "html"
+
+        mocker.patch.object(lektor_env, "render_template", render_template)
+        with new_context(lektor_pad, post.parent):
+            fragments.render("blog-teaser.html", post)
+        with new_context(lektor_pad, post.parent) as ctx:
+            fragments.render("blog-teaser.html", post)
+        assert set(ctx.referenced_virtual_dependencies) == {year_index.path}
+
+    def test_rerendered_if_source_changes(
+        self, fragments, post, lektor_pad, render_template, mocker
+    ):
+        fingerprint = mocker.patch(
+            "lektor_index_pages.fragments.source_fingerprint", return_value="1"
+        )
+        with new_context(lektor_pad, post.parent):
+            fragments.render("blog-teaser.html", post)
+            fingerprint.return_value = "2"
+            fragments.render("blog-teaser.html", post)
+        assert render_template.call_count == 2
+
+    def test_keyed_by_alt(self, fragments, lektor_pad, render_template):
+        for alt in ("en", "xx"):
+            post = lektor_pad.get("/blog/first-post", alt=alt)
+            with new_context(lektor_pad, post.parent):
+                fragments.render("blog-teaser.html", post)
+        assert render_template.call_count == 2
+
+    def test_render_without_context(self, fragments, post, lektor_env, mocker):
+        render_template = mocker.patch.object(
+            lektor_env, "render_template", return_value="html"
+        )
+        assert fragments.render("blog-teaser.html", post) == "html"
+        assert fragments.render("blog-teaser.html", post) == "html"
+        assert render_template.call_count == 1
+
+    def test_clear(self, fragments, post, lektor_pad, render_template):
+        with new_context(lektor_pad, post.parent):
+            fragments.render("blog-teaser.html", post)
+            fragments.clear()
+            fragments.render("blog-teaser.html", post)
+        assert render_template.call_count == 2
+
+
+def test_replay_missing_virtual_dependency(lektor_pad):
+    fragment = Fragment(
+        "html", frozenset(), frozenset([("/blog@index-pages/missing", "en")])
+    )
+    with lektor.context.Context(pad=lektor_pad) as ctx:
+        fragment.replay_dependencies(ctx)
+    assert ctx.referenced_virtual_dependencies == {}
+
+
+def test_source_fingerprint(tmp_path, mocker):
+    source = tmp_path / "contents.lr"
+    source.write_text("x")
+    record = mocker.Mock(iter_source_filenames=lambda: [str(source)])
+    orig = source_fingerprint(record)
+    assert source_fingerprint(record) == orig
+    source.write_text("xx")
+    assert source_fingerprint(record) != orig
+    source.unlink()
+    assert source_fingerprint(record) != orig
+
+
+class TestIndexFragment:
+    def test(self, index_fragment, post, lektor_pad, plugin):
+        with new_context(lektor_pad, post.parent):
+            html = index_fragment("blog-teaser.html", post)
+        assert "Hello Website" in html
+        assert len(plugin.fragments.fragments) == 1
+
+    def test_undefined(self, index_fragment):
+        item = jinja2.Undefined("missing")
+        assert index_fragment("blog-teaser.html", item) is item
+
+    def test_cleared_before_build(self, index_fragment, post, plugin, lektor_builder):
+        with new_context(post.pad, post.parent):
+            index_fragment("blog-teaser.html", post)
+        plugin.on_before_build_all(lektor_builder)
+        assert plugin.fragments.fragments == {}
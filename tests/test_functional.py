@@ -6,8 +6,15 @@ from lektor.project import Project
 from lektor.reporter import CliReporter
 
 
+@pytest.fixture(scope="module", params=[0, 2], ids=["serial", "prerender"])
+def prerender_workers(request):
+    return request.param
+
+
 @pytest.fixture(scope="module")
-def demo_output(site_path, my_plugin_id, my_plugin_cls, tmp_path_factory):
+def demo_output(
+    site_path, my_plugin_id, my_plugin_cls, prerender_workers, tmp_path_factory
+):
     """Build the demo site.
 
     Return path to output directory.
@@ -18,6 +25,11 @@ def demo_output(site_path, my_plugin_id, my_plugin_cls, tmp_path_factory):
 
     # Load our plugin
     env.plugin_controller.instanciate_plugin(my_plugin_id, my_plugin_cls)
+    if prerender_workers:
+        plugin = env.plugins[my_plugin_id]
+        inifile = plugin.get_config()
+        inifile["prerender.workers"] = str(prerender_workers)
+        plugin._inifile = inifile
     env.plugin_controller.emit("setup-env")
 
     pad = Database(env).new_pad()
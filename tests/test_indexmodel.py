@@ -3,18 +3,30 @@ import datetime
 import inspect
 import re
 from operator import attrgetter
+from types import SimpleNamespace
 
 import pytest
 from inifile import IniFile
+from lektor.utils import slugify
 
 from lektor_index_pages.indexmodel import _field_config_from_ini
 from lektor_index_pages.indexmodel import _index_model_from_ini
 from lektor_index_pages.indexmodel import _pagination_config_from_ini
+from lektor_index_pages.indexmodel import DateFieldDescriptor
+from lektor_index_pages.indexmodel import DateIndexModel
 from lektor_index_pages.indexmodel import ExpressionCompiler
+from lektor_index_pages.indexmodel import fold_diacritics
+from lektor_index_pages.indexmodel import group_items
 from lektor_index_pages.indexmodel import index_models_from_ini
 from lektor_index_pages.indexmodel import IndexModel
 from lektor_index_pages.indexmodel import IndexRootModel
+from lektor_index_pages.indexmodel import ItemsModel
 from lektor_index_pages.indexmodel import PaginationConfig
+from lektor_index_pages.indexmodel import parse_range_key
+from lektor_index_pages.indexmodel import PrefixIndexModel
+from lektor_index_pages.indexmodel import range_key
+from lektor_index_pages.indexmodel import RangeFieldDescriptor
+from lektor_index_pages.indexmodel import RangeIndexModel
 from lektor_index_pages.indexmodel import VIRTUAL_PATH_PREFIX
 
 
@@ -107,6 +119,196 @@ class TestIndexRootModel:
     def test_get_items(self, model, blog_record, paths):
         assert [post.path for post in model.get_items(blog_record)] == paths
 
+    def test_items_model(self, model):
+        assert model.items_model.parent_path == "/"
+        assert model.items_model.index_models == [model]
+
+    def test_shared_items_model(self, lektor_env, model, mocker):
+        other = IndexRootModel(
+            lektor_env,
+            index_name="other-index",
+            index_model=mocker.sentinel.index_model,
+            items_model=model.items_model,
+            config_filename="dummy.ini",
+        )
+        assert model.items_model.index_models == [model, other]
+
+
+class TestItemsModel:
+    @pytest.fixture
+    def items_model(self, lektor_env):
+        return ItemsModel(
+            lektor_env,
+            "/blog",
+            "this.children.filter(F._id == 'first-post')",
+            section="test-index",
+            config_filename="dummy.ini",
+        )
+
+    def test_get_items(self, items_model, blog_record):
+        assert [post.path for post in items_model.get_items(blog_record)] == [
+            "/blog/first-post"
+        ]
+
+    def test_get_item_ids(self, items_model, blog_record):
+        assert items_model.get_item_ids(blog_record) == (
+            "/blog",
+            blog_record.alt,
+            ["first-post"],
+            False,
+        )
+
+    def test_cache_id(self, items_model):
+        assert items_model.cache_id == "this.children.filter(F._id == 'first-post')"
+
+    def test_syntax_error(self, lektor_env):
+        items_model = ItemsModel(
+            lektor_env,
+            "/blog",
+            "messed up",
+            section="test-index",
+            config_filename="dummy.ini",
+        )
+        with pytest.raises(RuntimeError, match=r"in section \[test-index\]"):
+            items_model.validate()
+
+
+class TestItemsModelUndiscoverable:
+    @pytest.fixture
+    def site_path(self, docs_site_path):
+        return docs_site_path
+
+    @pytest.mark.parametrize(
+        "items, expected",
+        [
+            ("this.children", (["reference"], False)),
+            ("this.children.include_undiscoverable(true)", (["reference"], False)),
+            (
+                "this.children.include_undiscoverable(true).include_hidden(true)",
+                (["internals", "reference"], True),
+            ),
+        ],
+    )
+    def test_get_item_ids(self, lektor_env, lektor_pad, items, expected):
+        items_model = ItemsModel(
+            lektor_env,
+            "/docs/api",
+            items,
+            section="test-index",
+            config_filename="dummy.ini",
+        )
+        _, _, ids, undiscoverable = items_model.get_item_ids(
+            lektor_pad.get("/docs/api")
+        )
+        assert (ids, undiscoverable) == expected
+
+
+class TestItemsModelSourcePaths:
+    @pytest.fixture
+    def site_path(self, news_site_path):
+        return news_site_path
+
+    @pytest.fixture
+    def order_by(self):
+        return ()
+
+    @pytest.fixture
+    def items_model(self, lektor_env, order_by):
+        return ItemsModel(
+            lektor_env,
+            "/",
+            source_paths=["/blog", "/news", "/missing"],
+            order_by=order_by,
+            section="test-index",
+            config_filename="dummy.ini",
+        )
+
+    def test_get_item_ids(self, items_model, lektor_pad):
+        record = lektor_pad.get("/")
+        assert items_model.get_item_ids(record) == (
+            "/",
+            record.alt,
+            [
+                "blog/second-post",
+                "blog/first-post",
+                "news/launch",
+                "news/preview",
+            ],
+            False,
+        )
+
+    @pytest.mark.parametrize("order_by", [("-pub_date",)])
+    def test_get_item_ids_ordered(self, items_model, lektor_pad):
+        record = lektor_pad.get("/")
+        _, _, ids, _ = items_model.get_item_ids(record)
+        assert ids == [
+            "blog/second-post",
+            "news/launch",
+            "blog/first-post",
+            "news/preview",
+        ]
+
+    @pytest.mark.parametrize("order_by", [("-pub_date",)])
+    def test_cache_id(self, items_model):
+        assert items_model.cache_id == (
+            ("/blog", "/news", "/missing"),
+            ("-pub_date",),
+            False,
+        )
+
+
+class TestItemsModelRecursive:
+    @pytest.fixture
+    def site_path(self, docs_site_path):
+        return docs_site_path
+
+    @pytest.fixture
+    def source_paths(self):
+        return ()
+
+    @pytest.fixture
+    def order_by(self):
+        return ()
+
+    @pytest.fixture
+    def items_model(self, lektor_env, source_paths, order_by):
+        return ItemsModel(
+            lektor_env,
+            "/docs",
+            source_paths=source_paths,
+            order_by=order_by,
+            recursive=True,
+            section="test-index",
+            config_filename="dummy.ini",
+        )
+
+    def test_get_item_ids(self, items_model, lektor_pad):
+        record = lektor_pad.get("/docs")
+        assert items_model.get_item_ids(record) == (
+            "/docs",
+            record.alt,
+            ["guide", "guide/install", "guide/usage", "api", "api/reference"],
+            False,
+        )
+
+    @pytest.mark.parametrize("order_by", [("title",)])
+    def test_get_item_ids_ordered(self, items_model, lektor_pad):
+        _, _, ids, _ = items_model.get_item_ids(lektor_pad.get("/docs"))
+        assert ids == ["guide", "api", "guide/install", "api/reference", "guide/usage"]
+
+    @pytest.mark.parametrize("source_paths", [("/docs/guide", "/blog")])
+    def test_get_item_ids_source_paths(self, items_model, lektor_pad):
+        _, _, ids, _ = items_model.get_item_ids(lektor_pad.get("/docs"))
+        assert ids == [
+            "docs/guide/install",
+            "docs/guide/usage",
+            "blog/second-post",
+            "blog/first-post",
+        ]
+
+    def test_cache_id(self, items_model):
+        assert items_model.cache_id == ((), (), True)
+
 
 class TestIndexModel:
     @pytest.fixture
@@ -243,6 +445,325 @@ class TestIndexModel:
         assert data["id_upper"].__get__(source) == "SOURCE-ID"
 
 
+class TestDateIndexModel:
+    @pytest.fixture
+    def level(self):
+        return "year"
+
+    @pytest.fixture
+    def model(self, lektor_env, level, pagination_config):
+        return DateIndexModel(
+            lektor_env,
+            "pub_date",
+            level,
+            fields=None,
+            pagination_config=pagination_config,
+            config_filename="dummy.ini",
+            index_name="test",
+        )
+
+    @pytest.fixture
+    def posts(self):
+        return [
+            {"pub_date": datetime.date(2019, 12, 3)},
+            {"pub_date": datetime.datetime(2020, 3, 21, 12, 0)},
+            {},
+            {"pub_date": datetime.date(2020, 12, 3)},
+            {"pub_date": datetime.date(2019, 12, 24)},
+            {"pub_date": None},
+        ]
+
+    @pytest.mark.parametrize("level", ["week"])
+    def test_unknown_level(self, level, request):
+        with pytest.raises(RuntimeError, match="unknown date index level"):
+            request.getfixturevalue("model")
+
+    @pytest.mark.parametrize(
+        "level, expected",
+        [
+            ("year", {"2020": [1, 3], "2019": [0, 4]}),
+            ("month", {"12": [0, 3, 4], "03": [1]}),
+            ("day", {"24": [4], "21": [1], "03": [0, 3]}),
+        ],
+    )
+    def test_group_items(self, model, posts, expected):
+        grouping = model.group_items(posts)
+        assert grouping == expected
+        assert list(grouping) == list(expected)
+
+    def test_keys_for_post(self, model, posts):
+        with pytest.raises(TypeError, match="only groups items natively"):
+            model.keys_for_post(posts[0])
+
+    @pytest.mark.parametrize(
+        "level, names",
+        [
+            ("year", ["date", "year"]),
+            ("month", ["date", "year", "month"]),
+            ("day", ["date", "year", "month", "day"]),
+        ],
+    )
+    def test_data_descriptors(self, model, names):
+        assert [name for name, _ in model.data_descriptors] == names
+
+
+class TestDateFieldDescriptor:
+    @pytest.fixture
+    def source(self, lektor_env, pagination_config):
+        def model(level):
+            return DateIndexModel(
+                lektor_env,
+                "pub_date",
+                level,
+                fields=None,
+                pagination_config=pagination_config,
+                config_filename="dummy.ini",
+                index_name=level,
+            )
+
+        root = SimpleNamespace(_model=None)
+        year = SimpleNamespace(_model=model("year"), _id="2020", parent=root)
+        return SimpleNamespace(_model=model("month"), _id="03", parent=year)
+
+    @pytest.mark.parametrize(
+        "name, expected",
+        [
+            ("date", datetime.date(2020, 3, 1)),
+            ("year", 2020),
+            ("month", 3),
+        ],
+    )
+    def test(self, source, name, expected):
+        assert DateFieldDescriptor(name).__get__(source) == expected
+
+
+class TestRangeIndexModel:
+    @pytest.fixture
+    def edges(self):
+        return [0, 10, 50]
+
+    @pytest.fixture
+    def nbuckets(self):
+        return None
+
+    @pytest.fixture
+    def model(self, lektor_env, edges, nbuckets, pagination_config):
+        return RangeIndexModel(
+            lektor_env,
+            "price",
+            edges=edges,
+            nbuckets=nbuckets,
+            fields=None,
+            pagination_config=pagination_config,
+            config_filename="dummy.ini",
+            index_name="test",
+        )
+
+    @pytest.fixture
+    def posts(self):
+        prices = [12, 3.5, None, 50, -1, 10.0, "cheap", True, 999, 7]
+        return [{"price": price} for price in prices] + [{}]
+
+    @pytest.mark.parametrize(
+        "edges, nbuckets",
+        [
+            (None, None),
+            ([0, 1], 2),
+            ([], None),
+            ([0, 10, 10], None),
+            ([10, 0], None),
+            (None, 0),
+        ],
+    )
+    def test_invalid(self, edges, nbuckets, request):
+        with pytest.raises(ValueError):
+            request.getfixturevalue("model")
+
+    def test_group_items(self, model, posts):
+        grouping = model.group_items(posts)
+        assert grouping == {"0-10": [1, 9], "10-50": [0, 5], "50-up": [3, 8]}
+        assert list(grouping) == ["0-10", "10-50", "50-up"]
+
+    @pytest.mark.parametrize("edges, nbuckets", [(None, 3)])
+    def test_group_items_equal_frequency(self, model, nbuckets, posts):
+        grouping = model.group_items(posts)
+        assert grouping == {"m1-7": [1, 4], "7-12": [5, 9], "12-up": [0, 3, 8]}
+
+    @pytest.mark.parametrize("edges, nbuckets", [(None, 3)])
+    def test_group_items_equal_frequency_duplicates(self, model, nbuckets):
+        posts = [{"price": 1}] * 4 + [{"price": 2}]
+        assert model.group_items(posts) == {"1-up": [0, 1, 2, 3, 4]}
+
+    @pytest.mark.parametrize("edges, nbuckets", [(None, 3)])
+    def test_group_items_equal_frequency_empty(self, model, nbuckets):
+        assert model.group_items([{}]) == {}
+
+    def test_data_descriptors(self, model):
+        assert [name for name, _ in model.data_descriptors] == ["low", "high"]
+
+
+@pytest.mark.parametrize(
+    "low, high, key",
+    [
+        (0, 10, "0-10"),
+        (0.0, 2.5, "0-2p5"),
+        (0.5, 1, "0p5-1"),
+        (100, None, "100-up"),
+        (-10, -5, "m10-m5"),
+        (-5, -1, "m5-m1"),
+        (-1.5, None, "m1p5-up"),
+        (1e-05, 2.5e-05, "1em05-2p5em05"),
+        (-1e-05, 0, "m1em05-0"),
+        (1e20, None, "100000000000000000000-up"),
+    ],
+)
+def test_range_key(low, high, key):
+    assert range_key(low, high) == key
+    assert slugify(key) == key
+    assert parse_range_key(key) == (low, high)
+
+
+@pytest.mark.parametrize("key", ["10", "a-b-c", "x-10", "-1-2", "0.5-1"])
+def test_parse_range_key_invalid(key):
+    with pytest.raises(ValueError):
+        parse_range_key(key)
+
+
+@pytest.mark.parametrize(
+    "key, name, expected",
+    [
+        ("10-up", "low", 10),
+        ("10-up", "high", None),
+        ("1em05-0p5", "low", 1e-05),
+        ("1em05-0p5", "high", 0.5),
+    ],
+)
+def test_range_field_descriptor(key, name, expected):
+    source = SimpleNamespace(_id=key)
+    assert RangeFieldDescriptor(name).__get__(source) == expected
+
+
+class TestPrefixIndexModel:
+    @pytest.fixture
+    def prefix_length(self):
+        return 1
+
+    @pytest.fixture
+    def fold(self):
+        return False
+
+    @pytest.fixture
+    def model(self, lektor_env, prefix_length, fold, pagination_config):
+        return PrefixIndexModel(
+            lektor_env,
+            "title",
+            prefix_length=prefix_length,
+            fold=fold,
+            fields=None,
+            pagination_config=pagination_config,
+            config_filename="dummy.ini",
+            index_name="test",
+        )
+
+    @pytest.fixture
+    def posts(self):
+        titles = ["zebra", "Émile", "apple", '"Avocado"', "...", None, "42", "Ant"]
+        return [{"title": title} for title in titles] + [{}]
+
+    @pytest.mark.parametrize("prefix_length", [0])
+    def test_invalid_prefix_length(self, prefix_length, request):
+        with pytest.raises(ValueError):
+            request.getfixturevalue("model")
+
+    def test_group_items(self, model, posts):
+        grouping = model.group_items(posts)
+        assert grouping == {"4": [6], "A": [2, 3, 7], "Z": [0], "É": [1]}
+        assert list(grouping) == ["4", "A", "Z", "É"]
+
+    @pytest.mark.parametrize("fold", [True])
+    def test_group_items_folded(self, model, posts):
+        grouping = model.group_items(posts)
+        assert list(grouping) == ["4", "A", "E", "Z"]
+        assert grouping["E"] == [1]
+
+    @pytest.mark.parametrize("fold", [False, True])
+    def test_group_items_slug_collisions(self, model, fold):
+        titles = ["Élan", "Echo", "ßig", "Zulu", "Ssh", "Eagle"]
+        grouping = model.group_items([{"title": title} for title in titles])
+        assert grouping == {"E": [0, 1, 5], "S": [2, 4], "Z": [3]}
+
+    @pytest.mark.parametrize("prefix_length", [2])
+    def test_group_items_slug_collisions_merged(self, model):
+        titles = ["Æ", "Aero", "Élan", "Echo"]
+        grouping = model.group_items([{"title": title} for title in titles])
+        assert grouping == {"AE": [0, 1], "EC": [3], "ÉL": [2]}
+        assert len({slugify(key) for key in grouping}) == len(grouping)
+
+    @pytest.mark.parametrize("prefix_length", [2])
+    def test_group_items_prefix_length(self, model, posts):
+        grouping = model.group_items(posts)
+        assert list(grouping) == ["42", "AN", "AP", "AV", "ZE", "ÉM"]
+
+    def test_data_descriptors(self, model):
+        assert [name for name, _ in model.data_descriptors] == ["count"]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Émile", "Emile"),
+        ("Ångström", "Angstrom"),
+        ("ﬁne", "fine"),
+        ("plain", "plain"),
+    ],
+)
+def test_fold_diacritics(text, expected):
+    assert fold_diacritics(text) == expected
+
+
+class Test_group_items:
+    class DummyModel:
+        def __init__(self, keys):
+            self.keys = keys
+
+        def keys_for_post(self, post):
+            return self.keys[post]
+
+    def test(self):
+        posts = ["p1", "p2", "p3"]
+        models = [
+            self.DummyModel({"p1": ["b", "a"], "p2": ["a", "a"], "p3": []}),
+            self.DummyModel({"p1": ["x"], "p2": ["x"], "p3": ["x"]}),
+        ]
+        groupings = group_items(models, posts)
+        assert groupings == [{"b": [0], "a": [0, 1]}, {"x": [0, 1, 2]}]
+        assert list(groupings[0]) == ["b", "a"]
+
+    def test_native_grouping(self, lektor_env, pagination_config, mocker):
+        date_model = DateIndexModel(
+            lektor_env,
+            "pub_date",
+            "year",
+            fields=None,
+            pagination_config=pagination_config,
+            config_filename="dummy.ini",
+            index_name="test",
+        )
+        keys_for_post = mocker.patch.object(date_model, "keys_for_post")
+        keyed_model = mocker.Mock(spec=["keys_for_post"])
+        keyed_model.keys_for_post.return_value = ["x"]
+        posts = [{"pub_date": datetime.date(2020, 1, 1)}]
+        groupings = group_items([date_model, keyed_model], posts)
+        assert groupings == [{"2020": [0]}, {"x": [0]}]
+        keys_for_post.assert_not_called()
+
+    def test_evaluates_keys_once(self, mocker):
+        model = mocker.Mock(spec=["keys_for_post"])
+        model.keys_for_post.return_value = ["k"]
+        assert group_items([model], ["p1", "p2"]) == [{"k": [0, 1]}]
+        assert model.keys_for_post.mock_calls == [mocker.call("p1"), mocker.call("p2")]
+
+
 class TestExpressionCompiler:
     @pytest.fixture
     def filename(self):
@@ -266,10 +787,25 @@ class TestExpressionCompiler:
             expect = rf"\[{re.escape(section)}\]"
             assert re.search(expect, compiler.location)
 
-    def test_error_report(self, compiler):
+    def test_error_report(self, compiler, section):
+        desc = compiler("test", "messed up")
         with pytest.raises(RuntimeError, match=r"syntax error in config") as excinfo:
-            compiler("test", "messed up")
+            desc.validate()
         assert "messed up" in str(excinfo.value)
+        assert f"[{section}]" in str(excinfo.value)
+
+    def test_compiled_lazily(self, compiler, blog_record, mocker):
+        compile = mocker.spy(compiler, "compile")
+        desc = compiler("test", "this.path")
+        assert compile.call_count == 0
+        assert desc.__get__(blog_record) == blog_record.path
+        assert desc.__get__(blog_record) == blog_record.path
+        assert compile.call_count == 1
+
+    def test_error_on_first_use(self, compiler, blog_record):
+        desc = compiler("test", "messed up")
+        with pytest.raises(RuntimeError, match=r"syntax error in config"):
+            desc.__get__(blog_record)
 
     def test_call(self, compiler, blog_record):
         desc = compiler("test", "this.path")
@@ -301,6 +837,10 @@ class Test_index_models_from_ini(IniReaderBase):
         [index3]
         template = tmpl.html
 
+        [index5]
+        parent_path = /blog
+        key = item.tags
+
         [index4.subindex]
         key = item.tags
         """
@@ -313,8 +853,130 @@ class Test_index_models_from_ini(IniReaderBase):
         assert list(map(attrgetter("parent_path", "index_name"), models)) == [
             ("/blog", "index1"),
             ("/", "index2"),
+            ("/blog", "index5"),
         ]
 
+    def test_items_model_shared(self, lektor_env, inifile):
+        models = {
+            model.index_name: model
+            for model in index_models_from_ini(lektor_env, inifile)
+        }
+        items_model = models["index1"].items_model
+        assert models["index5"].items_model is items_model
+        assert models["index2"].items_model is not items_model
+        assert items_model.index_models == [models["index1"], models["index5"]]
+
+    def test_source_paths(self, lektor_env, inifile):
+        inifile["index1.parent_path"] = "/"
+        inifile["index1.source_paths"] = "/blog, /news /blog"
+        inifile["index1.order_by"] = "-pub_date, title"
+        inifile["index2.source_paths"] = "/blog /news"
+        inifile["index2.order_by"] = "-pub_date title"
+        models = {
+            model.index_name: model
+            for model in index_models_from_ini(lektor_env, inifile)
+        }
+        items_model = models["index1"].items_model
+        assert items_model.source_paths == ("/blog", "/news")
+        assert items_model.order_by == ("-pub_date", "title")
+        assert models["index2"].items_model is items_model
+
+    def test_recursive(self, lektor_env, inifile):
+        inifile["index1.recursive"] = "yes"
+        inifile["index5.recursive"] = "true"
+        models = {
+            model.index_name: model
+            for model in index_models_from_ini(lektor_env, inifile)
+        }
+        items_model = models["index1"].items_model
+        assert items_model.recursive
+        assert models["index5"].items_model is items_model
+        assert not models["index2"].items_model.recursive
+
+    @pytest.mark.parametrize(
+        "settings, message",
+        [
+            (
+                {"index1.source_paths": "/blog", "index1.items": "this.children"},
+                "items may not be set",
+            ),
+            (
+                {"index1.recursive": "yes", "index1.items": "this.children"},
+                "items may not be set",
+            ),
+            ({"index1.order_by": "title"}, "order_by requires source_paths"),
+        ],
+    )
+    def test_source_paths_errors(self, lektor_env, inifile, settings, message):
+        inifile.update(settings)
+        with pytest.raises(RuntimeError, match=message):
+            list(index_models_from_ini(lektor_env, inifile))
+
+
+class TestValidate:
+    @pytest.fixture
+    def inifile(self, tmp_path, settings):
+        test_ini = tmp_path / "test.ini"
+        test_ini.write_text(
+            inspect.cleandoc(
+                """
+        [index1]
+        parent_path = /blog
+        key = item.category
+        subindex = sub
+
+        [index1.fields]
+        foo = this._id
+
+        [index1.sub]
+        key = item.tags
+
+        [index2]
+        type = date
+        field = pub_date
+        items = this.children
+        """
+            )
+        )
+        inifile = IniFile(str(test_ini))
+        inifile.update(settings)
+        return inifile
+
+    @pytest.fixture
+    def settings(self):
+        return {}
+
+    @pytest.fixture
+    def models(self, lektor_env, inifile):
+        return list(index_models_from_ini(lektor_env, inifile))
+
+    def test_valid(self, models):
+        for model in models:
+            model.validate()
+
+    def test_not_compiled_when_read(self, models):
+        model = models[0].subindex_model
+        assert "expression" not in model.key_expr.__dict__
+        models[0].validate()
+        assert "expression" in model.key_expr.__dict__
+
+    @pytest.mark.parametrize(
+        "settings, section",
+        [
+            ({"index1.key": "messed up"}, "[index1]"),
+            ({"index1.slug_format": "messed up"}, "[index1]"),
+            ({"index1.fields.foo": "messed up"}, "[index1.fields]"),
+            ({"index1.sub.key": "messed up"}, "[index1.sub]"),
+            ({"index2.items": "messed up"}, "[index2]"),
+            ({"index2.fields.foo": "messed up"}, "[index2.fields]"),
+        ],
+    )
+    def test_error(self, models, section):
+        with pytest.raises(RuntimeError, match=r"syntax error in config") as excinfo:
+            for model in models:
+                model.validate()
+        assert section in str(excinfo.value)
+
 
 class Test_index_model_from_ini(IniReaderBase):
     @pytest.fixture(scope="session")
@@ -361,6 +1023,162 @@ class Test_index_model_from_ini(IniReaderBase):
             _index_model_from_ini(lektor_env, inifile, "index1")
 
 
+class Test_date_index_model_from_ini(IniReaderBase):
+    @pytest.fixture(scope="session")
+    def test_ini(self, tmp_path_factory):
+        test_ini = tmp_path_factory.mktemp("dimfi") / "test.ini"
+        test_ini.write_text(
+            inspect.cleandoc(
+                """
+        [archive]
+        type = date
+        field = pub_date
+        levels = year, month
+        template = year.html
+
+        [archive.fields]
+        foo = bar
+
+        [archive.month]
+        template = month.html
+        subindex = tags
+
+        [archive.month.tags]
+        key = item.tags
+        """
+            )
+        )
+        return test_ini
+
+    def test(self, lektor_env, inifile):
+        model = _index_model_from_ini(lektor_env, inifile, "archive")
+        assert isinstance(model, DateIndexModel)
+        assert model.key_expr is None
+        assert (model.field, model.level) == ("pub_date", "year")
+        assert model.template == "year.html"
+        assert [name for name, _ in model.data_descriptors] == ["date", "year", "foo"]
+
+        month_model = model.subindex_model
+        assert isinstance(month_model, DateIndexModel)
+        assert month_model.level == "month"
+        assert month_model.template == "month.html"
+
+        tags_model = month_model.subindex_model
+        assert tags_model.key_expr.expr == "item.tags"
+        assert tags_model.subindex_model is None
+
+    def test_default_levels(self, lektor_env, inifile):
+        del inifile["archive.levels"]
+        model = _index_model_from_ini(lektor_env, inifile, "archive")
+        assert model.level == "year"
+        assert model.subindex_model is None
+
+    def test_index_models_from_ini(self, lektor_env, inifile):
+        (model,) = index_models_from_ini(lektor_env, inifile)
+        assert model.index_name == "archive"
+        assert isinstance(model.subindex_model, DateIndexModel)
+
+    def test_field_required(self, lektor_env, inifile):
+        del inifile["archive.field"]
+        with pytest.raises(RuntimeError, match=r"\[archive\]: field required"):
+            _index_model_from_ini(lektor_env, inifile, "archive")
+
+    @pytest.mark.parametrize("levels", ["", "month", "year, day", "year, month, week"])
+    def test_bad_levels(self, lektor_env, inifile, levels):
+        inifile["archive.levels"] = levels
+        with pytest.raises(RuntimeError, match="levels must be"):
+            _index_model_from_ini(lektor_env, inifile, "archive")
+
+    def test_unknown_type(self, lektor_env, inifile):
+        inifile["archive.type"] = "fancy"
+        with pytest.raises(RuntimeError, match="unknown index type 'fancy'"):
+            _index_model_from_ini(lektor_env, inifile, "archive")
+
+
+class Test_range_index_model_from_ini(IniReaderBase):
+    @pytest.fixture(scope="session")
+    def test_ini(self, tmp_path_factory):
+        test_ini = tmp_path_factory.mktemp("rimfi") / "test.ini"
+        test_ini.write_text(
+            inspect.cleandoc(
+                """
+        [by-price]
+        type = range
+        field = price
+        buckets = 0, 9.99, 100
+        subindex = tags
+
+        [by-price.tags]
+        key = item.tags
+        """
+            )
+        )
+        return test_ini
+
+    def test(self, lektor_env, inifile):
+        model = _index_model_from_ini(lektor_env, inifile, "by-price")
+        assert isinstance(model, RangeIndexModel)
+        assert model.field == "price"
+        assert model.edges == (0, 9.99, 100)
+        assert model.nbuckets is None
+        assert model.subindex_model.key_expr.expr == "item.tags"
+
+    def test_nbuckets(self, lektor_env, inifile):
+        inifile["by-price.buckets"] = "4"
+        model = _index_model_from_ini(lektor_env, inifile, "by-price")
+        assert model.edges is None
+        assert model.nbuckets == 4
+
+    @pytest.mark.parametrize("buckets", ["0", "10, 5", "cheap, dear"])
+    def test_invalid_buckets(self, lektor_env, inifile, buckets):
+        inifile["by-price.buckets"] = buckets
+        with pytest.raises(RuntimeError, match=r"\[by-price\]: invalid buckets"):
+            _index_model_from_ini(lektor_env, inifile, "by-price")
+
+    def test_buckets_required(self, lektor_env, inifile):
+        del inifile["by-price.buckets"]
+        with pytest.raises(RuntimeError, match="buckets required"):
+            _index_model_from_ini(lektor_env, inifile, "by-price")
+
+
+class Test_prefix_index_model_from_ini(IniReaderBase):
+    @pytest.fixture(scope="session")
+    def test_ini(self, tmp_path_factory):
+        test_ini = tmp_path_factory.mktemp("pimfi") / "test.ini"
+        test_ini.write_text(
+            inspect.cleandoc(
+                """
+        [glossary]
+        type = prefix
+        field = term
+        prefix_length = 2
+        fold = yes
+        """
+            )
+        )
+        return test_ini
+
+    def test(self, lektor_env, inifile):
+        model = _index_model_from_ini(lektor_env, inifile, "glossary")
+        assert isinstance(model, PrefixIndexModel)
+        assert model.field == "term"
+        assert model.prefix_length == 2
+        assert model.fold
+        assert model.subindex_model is None
+
+    def test_defaults(self, lektor_env, inifile):
+        del inifile["glossary.prefix_length"]
+        del inifile["glossary.fold"]
+        model = _index_model_from_ini(lektor_env, inifile, "glossary")
+        assert model.prefix_length == 1
+        assert not model.fold
+
+    def test_invalid_prefix_length(self, lektor_env, inifile):
+        inifile["glossary.prefix_length"] = "0"
+        with pytest.raises(RuntimeError, match="prefix_length must be positive"):
+            _index_model_from_ini(lektor_env, inifile, "glossary")
+
+
 class Test_field_config_from_ini(IniReaderBase):
     @pytest.fixture(scope="session")
     def test_ini(self, tmp_path_factory):
@@ -0,0 +1,134 @@
+import io
+import pickle
+import sys
+
+import pytest
+
+from lektor_index_pages import keyfile
+from lektor_index_pages.childids import ChildIds
+from lektor_index_pages.childids import IdTable
+from lektor_index_pages.keyfile import compute_indexes
+from lektor_index_pages.keyfile import load_key_file
+from lektor_index_pages.keyfile import read_key_file
+from lektor_index_pages.keyfile import write_key_file
+from lektor_index_pages.plugin import Cache
+from lektor_index_pages.sqlstore import SqliteGroupStore
+
+
+@pytest.fixture
+def id_table():
+    return IdTable(["c", "a", "b", "d"])
+
+
+@pytest.fixture
+def data(id_table):
+    shared = id_table.select(["a", "d"])
+    return {
+        "config": object(),
+        ("items", "/blog"): ("/blog", "en", id_table.all()),
+        ("subindex_groups", "/blog@x"): {"k": shared, "l": id_table.select([])},
+        ("child_ids", "/blog@x", "k"): shared,
+    }
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return str(tmp_path / "keys" / "index-keys.bin")
+
+
+@pytest.fixture
+def loaded(data, filename):
+    write_key_file(filename, "hash", data)
+    return read_key_file(filename, "hash")
+
+
+def test_compute_indexes(config, lektor_pad, plugin):
+    compute_indexes(config, lektor_pad)
+    assert ("subindex_ids", "/blog@index-pages/year-index") in plugin.cache
+
+
+def test_compute_indexes_no_parent_record(config, lektor_pad, plugin):
+    config.index_models["year-index"].parent_path = "/missing"
+    compute_indexes(config, lektor_pad)
+    assert ("subindex_ids", "/blog@index-pages/year-index") not in plugin.cache
+
+
+class Test_read_key_file:
+    def test_roundtrip(self, loaded):
+        assert "config" not in loaded
+        path, alt, items = loaded["items", "/blog"]
+        assert (path, alt, list(items)) == ("/blog", "en", ["c", "a", "b", "d"])
+        groups = loaded["subindex_groups", "/blog@x"]
+        assert {key: list(ids) for key, ids in groups.items()} == {
+            "k": ["a", "d"],
+            "l": [],
+        }
+
+    def test_ordinals_are_mapped(self, loaded):
+        child_ids = loaded["child_ids", "/blog@x", "k"]
+        assert isinstance(child_ids.ordinals, memoryview)
+        assert child_ids.ordinals.readonly
+        assert "d" in child_ids
+        assert list(child_ids[1:]) == ["d"]
+
+    def test_shares_tables_and_child_ids(self, loaded):
+        table = loaded["items", "/blog"][2].table
+        child_ids = loaded["child_ids", "/blog@x", "k"]
+        assert child_ids.table is table
+        assert loaded["subindex_groups", "/blog@x"]["k"] is child_ids
+
+    def test_pickle_mapped_child_ids(self, loaded):
+        child_ids = loaded["child_ids", "/blog@x", "k"]
+        unpickled = pickle.loads(pickle.dumps(child_ids))
+        assert type(unpickled.ordinals) is not memoryview
+        assert list(unpickled) == ["a", "d"]
+
+    def test_sql_child_ids(self, id_table, filename, tmp_path):
+        store = SqliteGroupStore(str(tmp_path / "groups.sqlite3"))
+        try:
+            groups = store.store("i", "en", id_table, {"k": ["b", "c"]})
+            write_key_file(filename, "hash", {"groups": groups})
+        finally:
+            store.close()
+        loaded = read_key_file(filename, "hash")
+        assert list(loaded["groups"]["k"]) == ["c", "b"]
+
+    def test_config_changed(self, data, filename):
+        write_key_file(filename, "hash", data)
+        with pytest.raises(RuntimeError, match="different configuration"):
+            read_key_file(filename, "other")
+
+    def test_other_platform(self, data, filename, monkeypatch):
+        write_key_file(filename, "hash", data)
+        monkeypatch.setattr(sys, "byteorder", "middle")
+        with pytest.raises(RuntimeError, match="another platform"):
+            read_key_file(filename, "hash")
+
+    def test_not_a_key_file(self, tmp_path):
+        filename = tmp_path / "junk"
+        filename.write_bytes(b"junk")
+        with pytest.raises(RuntimeError, match="not a key file"):
+            read_key_file(str(filename), "hash")
+
+    def test_wrong_version(self, data, filename, monkeypatch):
+        monkeypatch.setattr(keyfile, "FORMAT_VERSION", 0)
+        write_key_file(filename, "hash", data)
+        monkeypatch.undo()
+        with pytest.raises(RuntimeError, match="not a version 2 key file"):
+            read_key_file(filename, "hash")
+
+
+def test_unsupported_persistent_id():
+    unpickler = keyfile._Unpickler(io.BytesIO(), memoryview(b""))
+    with pytest.raises(pickle.UnpicklingError):
+        unpickler.persistent_load(("other", None, 0, 0))
+
+
+def test_load_key_file(data, filename):
+    write_key_file(filename, "hash", data)
+    cache = Cache()
+    load_key_file(cache, filename, "hash")
+    assert ("child_ids", "/blog@x", "k") in cache
+    assert isinstance(
+        cache.get_or_create(("child_ids", "/blog@x", "k"), list), ChildIds
+    )
@@ -0,0 +1,48 @@
+import pytest
+
+from .memprofile import CACHE_KEY_FAMILIES
+from .memprofile import main
+from .memprofile import PAD_RECORDS
+from .memprofile import PAD_VIRTUAL_CACHE
+from .memprofile import profile_site
+from .synthsite import make_site
+
+
+@pytest.fixture(scope="module")
+def profile(tmp_path_factory):
+    site_path = make_site(tmp_path_factory.mktemp("synth-site"), num_posts=20)
+    return profile_site(site_path)
+
+
+def test_indexes(profile):
+    assert [index.index_name for index in profile.indexes] == [
+        "year-index",
+        "tag-index",
+    ]
+    assert all(index.sources > 1 for index in profile.indexes)
+    assert all(index.bytes > 0 for index in profile.indexes)
+
+
+def test_families(profile):
+    assert set(profile.families) >= {
+        *CACHE_KEY_FAMILIES,
+        PAD_VIRTUAL_CACHE,
+        PAD_RECORDS,
+    }
+    assert profile.families["subindex_groups"] > 0
+    assert profile.families[PAD_VIRTUAL_CACHE] > 0
+
+
+def test_types(profile):
+    count, size = profile.types["lektor_index_pages.sourceobj.IndexSource"]
+    assert count == sum(index.sources - 1 for index in profile.indexes)
+    assert size > 0
+    assert "lektor_index_pages.indexmodel.IndexModel" not in profile.types
+
+
+def test_main(capsys):
+    main(["--posts", "10", "--tags", "3", "--top", "3"])
+    output = capsys.readouterr().out
+    assert "year-index" in output
+    assert PAD_VIRTUAL_CACHE in output
+    assert "Top allocation sites" in output
@@ -0,0 +1,106 @@
+"""Operation-count performance tests.
+
+These build a synthetic site of fixed size, and count the operations
+which dominate the cost of computing the indexes.  Unlike timings,
+operation counts are deterministic, so they can be checked against
+fixed budgets.  A count exceeding its budget most likely indicates a
+complexity regression (e.g. evaluating the keys of every item once per
+key, rather than once.)
+
+If a change legitimately alters the counts, update ``BUDGETS``.
+
+"""
+
+import lektor.db
+import pytest
+from lektor.builder import Builder
+from lektor.db import Database
+from lektor.environment import Environment
+from lektor.project import Project
+
+from lektor_index_pages.indexmodel import FieldDescriptor
+from lektor_index_pages.indexmodel import IndexModel
+
+from .synthsite import make_site
+
+NUM_POSTS = 100
+NUM_TAGS = 10
+
+# Upper limits on the operation counts, for a site of NUM_POSTS posts
+BUDGETS = {
+    "build": {
+        # Each post is keyed once by each of the year, month and tag indexes
+        "key_evaluations": 300,
+        "field_evaluations": 60,
+        "record_loads": 102,
+    },
+    # Rebuilding, with nothing changed, using the persisted cache
+    "rebuild": {
+        "key_evaluations": 0,
+        "field_evaluations": 0,
+        "record_loads": 102,
+    },
+}
+
+
+@pytest.fixture
+def persist_cache():
+    return False
+
+
+@pytest.fixture
+def synth_site_path(tmp_path, persist_cache, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return make_site(
+        tmp_path / "site",
+        num_posts=NUM_POSTS,
+        num_tags=NUM_TAGS,
+        persist_cache=persist_cache,
+    )
+
+
+@pytest.fixture
+def env(synth_site_path, my_plugin_id, my_plugin_cls):
+    project = Project.from_path(str(synth_site_path))
+    env = Environment(project, load_plugins=False)
+    env.plugin_controller.instanciate_plugin(my_plugin_id, my_plugin_cls)
+    env.plugin_controller.emit("setup-env")
+    return env
+
+
+@pytest.fixture
+def counters(mocker):
+    return {
+        "key_evaluations": mocker.spy(IndexModel, "keys_for_post"),
+        "field_evaluations": mocker.spy(FieldDescriptor, "__get__"),
+        "record_loads": mocker.spy(lektor.db.Pad, "instance_from_data"),
+    }
+
+
+def get_counts(counters):
+    return {name: spy.call_count for name, spy in counters.items()}
+
+
+def build(env, output_path):
+    pad = Database(env).new_pad()
+    builder = Builder(pad, str(output_path))
+    assert builder.build_all() == 0
+
+
+def check_budget(counters, budget):
+    counts = get_counts(counters)
+    assert all(counts[name] <= limit for name, limit in budget.items()), counts
+
+
+def test_build(env, counters, tmp_path):
+    build(env, tmp_path / "output")
+    check_budget(counters, BUDGETS["build"])
+
+
+@pytest.mark.parametrize("persist_cache", [True])
+def test_rebuild(env, counters, tmp_path):
+    build(env, tmp_path / "output")
+    for spy in counters.values():
+        spy.reset_mock()
+    build(env, tmp_path / "output")
+    check_budget(counters, BUDGETS["rebuild"])
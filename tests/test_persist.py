@@ -0,0 +1,181 @@
+import os
+import shutil
+
+import pytest
+
+from lektor_index_pages.persist import CacheStore
+from lektor_index_pages.persist import config_hash
+from lektor_index_pages.persist import FORMAT_VERSION
+from lektor_index_pages.persist import get_cache_filename
+from lektor_index_pages.persist import get_mtime
+from lektor_index_pages.persist import iter_covered_files
+from lektor_index_pages.sourceobj import IndexRoot
+
+
+@pytest.fixture
+def site_path(site_path, tmp_path):
+    # We modify the site, so work on a copy
+    site_copy = tmp_path / "site"
+    shutil.copytree(site_path, site_copy)
+    return site_copy
+
+
+@pytest.fixture
+def cache_data(plugin, config, blog_record):
+    index_root = IndexRoot.get_index(config.index_models["year-index"], blog_record)
+    list(index_root.subindexes)
+    with plugin.cache.lock:
+        return dict(plugin.cache.data)
+
+
+@pytest.fixture
+def store(tmp_path, inifile):
+    return CacheStore(str(tmp_path / "cache" / "test.pickle"), config_hash(inifile))
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_get_cache_filename(lektor_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    filename = get_cache_filename(lektor_env)
+    assert filename.startswith(str(tmp_path / "lektor" / "index-pages"))
+    assert filename.endswith(f"{lektor_env.project.id}.pickle")
+
+
+def test_config_hash(inifile):
+    orig = config_hash(inifile)
+    assert config_hash(inifile) == orig
+    inifile["year-index.template"] = "other.html"
+    assert config_hash(inifile) != orig
+
+
+class Test_iter_covered_files:
+    def test(self, lektor_pad, cache_data, site_path, lektor_alt):
+        files = dict(iter_covered_files(lektor_pad, cache_data))
+        assert files[str(site_path / "models")] is None
+        assert files[str(site_path / "models" / "blog-post.ini")] is None
+        assert files[str(site_path / "content" / "blog")] is None
+        post_path = site_path / "content" / "blog" / "first-post"
+        item = "/blog/first-post", lektor_alt
+        assert files[str(post_path)] == item
+        assert files[str(post_path / "contents.lr")] == item
+
+    @pytest.mark.parametrize("lektor_alt", ["xx"])
+    def test_alt(self, lektor_pad, cache_data, site_path):
+        files = dict(iter_covered_files(lektor_pad, cache_data))
+        post_path = site_path / "content" / "blog" / "first-post"
+        assert str(post_path / "contents.lr") in files
+        assert str(post_path / "contents+xx.lr") in files
+
+    def test_project_and_databags(self, lektor_pad, site_path):
+        (site_path / "databags").mkdir()
+        (site_path / "databags" / "menu.ini").write_text("[home]\n")
+        files = dict(iter_covered_files(lektor_pad, {}))
+        assert files[str(site_path / "Test Project.lektorproject")] is None
+        assert files[str(site_path / "databags")] is None
+        assert files[str(site_path / "databags" / "menu.ini")] is None
+
+    def test_no_models(self, lektor_pad, site_path, monkeypatch):
+        shutil.rmtree(site_path / "models")
+        monkeypatch.setattr(lektor_pad.env.project, "project_file", None)
+        assert list(iter_covered_files(lektor_pad, {})) == [
+            (str(site_path / "models"), None),
+            (str(site_path / "databags"), None),
+        ]
+
+
+class Test_iter_covered_files_source_paths:
+    @pytest.fixture
+    def site_path(self, news_site_path):
+        return news_site_path
+
+    @pytest.fixture
+    def inifile(self, inifile):
+        inifile["all-years.parent_path"] = "/"
+        inifile["all-years.source_paths"] = "/blog, /news"
+        inifile["all-years.key"] = "item.pub_date.year|string"
+        return inifile
+
+    @pytest.fixture
+    def cache_data(self, plugin, config, lektor_pad):
+        list(config.get_index_root("all-years", lektor_pad).subindexes)
+        with plugin.cache.lock:
+            return dict(plugin.cache.data)
+
+    def test(self, lektor_pad, cache_data, site_path, lektor_alt):
+        files = dict(iter_covered_files(lektor_pad, cache_data))
+        assert files[str(site_path / "content" / "blog")] is None
+        assert files[str(site_path / "content" / "news")] is None
+        post_path = site_path / "content" / "news" / "launch"
+        assert files[str(post_path / "contents.lr")] == ("/news/launch", lektor_alt)
+
+
+def test_get_mtime(tmp_path):
+    path = tmp_path / "file"
+    path.write_text("x")
+    orig = get_mtime(str(path))
+    assert orig == os.stat(path).st_mtime_ns
+    touch(path)
+    assert get_mtime(str(path)) != orig
+    assert get_mtime(str(tmp_path / "missing")) == -1
+
+
+class TestCacheStore:
+    def test_round_trip(self, store, lektor_pad, cache_data):
+        store.save(lektor_pad, cache_data)
+        loaded, changed_items = store.load(lektor_pad)
+        assert changed_items == set()
+        assert "config" in cache_data
+        assert set(loaded) == set(cache_data) - {"config"}
+        key = ("items", "/blog", "_primary", None)
+        path, alt, child_ids = loaded[key]
+        assert list(child_ids) == list(cache_data[key][2])
+
+    def test_missing(self, store, lektor_pad):
+        assert store.load(lektor_pad) == ({}, set())
+
+    def test_corrupt(self, store, lektor_pad):
+        os.makedirs(os.path.dirname(store.filename))
+        with open(store.filename, "wb") as fp:
+            fp.write(b"junk")
+        assert store.load(lektor_pad) == ({}, set())
+
+    def test_config_changed(self, store, lektor_pad, cache_data):
+        store.save(lektor_pad, cache_data)
+        other = CacheStore(store.filename, "other-hash")
+        assert other.load(lektor_pad) == ({}, set())
+
+    def test_format_changed(self, store, lektor_pad, cache_data, mocker):
+        store.save(lektor_pad, cache_data)
+        mocker.patch("lektor_index_pages.persist.FORMAT_VERSION", FORMAT_VERSION + 1)
+        assert store.load(lektor_pad) == ({}, set())
+
+    @pytest.mark.parametrize(
+        "changed",
+        [
+            "content/blog",
+            "content/blog/contents.lr",
+            "models/blog-post.ini",
+            "Test Project.lektorproject",
+        ],
+    )
+    def test_sources_changed(self, store, lektor_pad, cache_data, site_path, changed):
+        store.save(lektor_pad, cache_data)
+        touch(site_path / changed)
+        assert store.load(lektor_pad) == ({}, set())
+
+    def test_databag_added(self, store, lektor_pad, cache_data, site_path):
+        store.save(lektor_pad, cache_data)
+        (site_path / "databags").mkdir()
+        (site_path / "databags" / "menu.ini").write_text("[home]\n")
+        assert store.load(lektor_pad) == ({}, set())
+
+    def test_item_changed(self, store, lektor_pad, cache_data, site_path, lektor_alt):
+        store.save(lektor_pad, cache_data)
+        touch(site_path / "content/blog/first-post/contents.lr")
+        loaded, changed_items = store.load(lektor_pad)
+        assert set(loaded) == set(cache_data) - {"config"}
+        assert changed_items == {("/blog/first-post", lektor_alt)}
@@ -0,0 +1,81 @@
+import io
+
+import pytest
+from lektor.builder import PathCache
+
+from lektor_index_pages.plan import IndexPlan
+from lektor_index_pages.plan import iter_plans
+from lektor_index_pages.plan import plan_index
+from lektor_index_pages.plan import PlannedArtifact
+from lektor_index_pages.plan import write_plan
+
+
+@pytest.fixture
+def path_cache(lektor_env):
+    return PathCache(lektor_env)
+
+
+@pytest.fixture
+def index_root(config, lektor_pad):
+    return config.get_index_root("year-index", lektor_pad)
+
+
+@pytest.mark.usefixtures("plugin")
+class Test_plan_index:
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test(self, index_root, path_cache):
+        plan = plan_index(index_root, path_cache)
+        assert plan.index_name == "year-index"
+        assert plan.alt == "_primary"
+        assert [artifact.artifact_name for artifact in plan.artifacts] == [
+            "/blog/2020/index.html",
+            "/blog/2020/04/index.html",
+            "/blog/2020/03/index.html",
+        ]
+        year_index = index_root.subindexes.first()
+        assert plan.artifacts[0].checksum == year_index.get_checksum(path_cache)
+
+    @pytest.mark.parametrize("pagination_enabled", [1])
+    def test_paginated(self, index_root, path_cache):
+        plan = plan_index(index_root, path_cache)
+        assert [artifact.artifact_name for artifact in plan.artifacts] == [
+            "/blog/2020/index.html",
+            "/blog/2020/page/2/index.html",
+        ]
+
+    def test_renders_nothing(self, index_root, path_cache, mocker):
+        render_template = mocker.patch.object(
+            index_root.pad.env, "render_template", autospec=True
+        )
+        plan_index(index_root, path_cache)
+        render_template.assert_not_called()
+
+
+@pytest.mark.usefixtures("plugin")
+class Test_iter_plans:
+    def test(self, config, lektor_pad, path_cache):
+        plans = list(iter_plans(config, lektor_pad, path_cache))
+        assert [(plan.index_name, plan.alt) for plan in plans] == [
+            ("year-index", "en"),
+            ("year-index", "xx"),
+        ]
+
+    def test_no_parent_record(self, config, lektor_pad, path_cache):
+        config.index_models["year-index"].parent_path = "/missing"
+        assert list(iter_plans(config, lektor_pad, path_cache)) == []
+
+
+def test_write_plan():
+    plans = [
+        IndexPlan(
+            "idx",
+            "en",
+            (PlannedArtifact("/a/index.html", "abc"), PlannedArtifact("/b", "def")),
+            0.0125,
+        )
+    ]
+    fp = io.StringIO()
+    write_plan(plans, fp)
+    assert fp.getvalue() == (
+        "# [idx] alt=en: 2 artifacts, 12.5 ms\n/a/index.html\tabc\n/b\tdef\n"
+    )
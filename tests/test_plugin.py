@@ -1,15 +1,21 @@
+import os
 import re
+import shutil
 
 import jinja2
 import pytest
+from lektor.builder import Builder
 from lektor.db import Query
 from lektor.environment import PRIMARY_ALT
 
+from lektor_index_pages.config import Config
 from lektor_index_pages.indexmodel import VIRTUAL_PATH_PREFIX
 from lektor_index_pages.plugin import Cache
 from lektor_index_pages.plugin import IndexPages
 from lektor_index_pages.plugin import IndexPagesPlugin
+from lektor_index_pages.prerender import Prerenderer
 from lektor_index_pages.sourceobj import IndexSource
+from lektor_index_pages.sqlstore import SqliteGroupStore
 
 
 @pytest.fixture
@@ -33,6 +39,11 @@ class TestCache:
         assert cache.get_or_create("other", creator) is creator.return_value
         assert creator.mock_calls == [mocker.call(), mocker.call()]
 
+    def test_contains(self, cache):
+        assert "key" not in cache
+        cache.get_or_create("key", lambda: None)
+        assert "key" in cache
+
     def test_clear(self, cache, mocker):
         creator = mocker.Mock(name="creator", spec=())
         assert cache.get_or_create("key", creator) is creator.return_value
@@ -42,6 +53,11 @@ class TestCache:
         assert cache.get_or_create("key", creator) is creator.return_value
         assert creator.mock_calls == [mocker.call(), mocker.call()]
 
+    def test_clear_increments_generation(self, cache):
+        generation = cache.generation
+        cache.clear()
+        assert cache.generation == generation + 1
+
 
 class TestIndexPagesPlugin:
     @pytest.fixture
@@ -55,6 +71,35 @@ class TestIndexPagesPlugin:
         plugin.on_before_build_all("builder")
         assert plugin.read_config() is not config
 
+    def test_prerenderer(self, plugin, inifile, lektor_builder):
+        inifile["prerender.workers"] = "2"
+        plugin._inifile = inifile
+
+        plugin.on_before_build_all(lektor_builder)
+        prerenderer = plugin.prerenderer
+        assert isinstance(prerenderer, Prerenderer)
+        assert prerenderer.executor._max_workers == 2
+
+        plugin.on_before_build_all(lektor_builder)
+        assert plugin.prerenderer is not prerenderer
+
+        plugin.on_after_build_all(lektor_builder)
+        assert plugin.prerenderer is None
+
+    def test_prerenderer_disabled(self, plugin, inifile, lektor_builder):
+        plugin._inifile = inifile
+        plugin.on_before_build_all(lektor_builder)
+        assert plugin.prerenderer is None
+
+    def test_validates_built_indexes(self, plugin, inifile, lektor_builder):
+        inifile["broken.key"] = "messed up"
+        plugin._inifile = inifile
+        with pytest.raises(RuntimeError, match="syntax error in config"):
+            plugin.on_before_build_all(lektor_builder)
+
+        plugin.skip_indexes = {"broken"}
+        plugin.on_before_build_all(lektor_builder)
+
     @pytest.fixture
     def generate_index(self, plugin, lektor_env):
         plugin.on_setup_env()
@@ -75,6 +120,65 @@ class TestIndexPagesPlugin:
         plugin.on_setup_env(extra_flags={"index-pages": "skip-build"})
         assert len(lektor_env.custom_generators) == 0
 
+    @pytest.mark.parametrize(
+        "flags, plan_filename",
+        [
+            ("plan", "index-pages-plan.txt"),
+            ("plan=out/plan.txt", "out/plan.txt"),
+            ("skip-build,plan=plan.txt", "plan.txt"),
+        ],
+    )
+    def test_plan_flag(self, plugin, lektor_env, flags, plan_filename):
+        plugin.on_setup_env(extra_flags={"index-pages": flags})
+        assert plugin.plan_filename == plan_filename
+        assert len(lektor_env.custom_generators) == 0
+
+    @pytest.mark.parametrize(
+        "flags, only_indexes, skip_indexes",
+        [
+            ("", None, set()),
+            ("only=tags", {"tags"}, set()),
+            ("only=tags,series", {"tags", "series"}, set()),
+            ("skip=year,month", None, {"year", "month"}),
+            ("only=tags,series,skip=series", {"tags", "series"}, {"series"}),
+            ("only=tags,skip-build,series", {"tags"}, set()),
+            ("only=tags,plan,series", {"tags"}, set()),
+            ("only=tags,keys=k.bin,series", {"tags"}, set()),
+            ("only=tags,,series", {"tags", "series"}, set()),
+            ("only=,tags", {"tags"}, set()),
+            ("series,only=tags", {"tags"}, set()),
+        ],
+    )
+    def test_selection_flags(self, plugin, flags, only_indexes, skip_indexes):
+        plugin.on_setup_env(extra_flags={"index-pages": flags})
+        assert plugin.only_indexes == only_indexes
+        assert plugin.skip_indexes == skip_indexes
+
+    @pytest.mark.parametrize(
+        "flags, expected",
+        [
+            ("only=year-index", ["/blog@index-pages/year-index"]),
+            ("skip=year-index", []),
+        ],
+    )
+    def test_generate_selected_indexes(
+        self, plugin, lektor_env, blog_record, flags, expected
+    ):
+        plugin.on_setup_env(extra_flags={"index-pages": flags})
+        generate_index = lektor_env.custom_generators[0]
+        assert [idx.path for idx in generate_index(blog_record)] == expected
+
+    def test_unknown_index_in_flags(self, plugin, lektor_env, blog_record):
+        plugin.on_setup_env(extra_flags={"index-pages": "only=year-index,tags"})
+        generate_index = lektor_env.custom_generators[0]
+        with pytest.raises(RuntimeError, match=r"unknown index names"):
+            generate_index(blog_record)
+
+    def test_keys_flag(self, plugin, lektor_env):
+        plugin.on_setup_env(extra_flags={"index-pages": "keys=index-keys.bin"})
+        assert plugin.keys_filename == "index-keys.bin"
+        assert len(lektor_env.custom_generators) == 1
+
     @pytest.fixture
     def resolve_virtual_path(self, plugin, lektor_env):
         plugin.on_setup_env()
@@ -88,12 +192,45 @@ class TestIndexPagesPlugin:
     def resolve_url(self, plugin, lektor_env):
         plugin.on_setup_env()
         assert len(lektor_env.custom_url_resolvers) == 1
-        return lektor_env.custom_url_resolvers[0]
+        yield lektor_env.custom_url_resolvers[0]
+        plugin.url_mapper.wait()
 
     def test_resolve_url(self, resolve_url, blog_record):
         index = resolve_url(blog_record, ["2020"])
         assert index.path == "/blog@index-pages/year-index/2020"
 
+    def test_resolve_url_from_url_map(
+        self, resolve_url, plugin, blog_record, lektor_pad, mocker
+    ):
+        assert resolve_url(blog_record, ["2021"]) is None
+        plugin.url_mapper.wait()
+        resolve_url_path = mocker.spy(Config, "resolve_url_path")
+        pad = lektor_pad.db.new_pad()
+        record = pad.get("/blog", alt=blog_record.alt)
+        assert resolve_url(record, ["2020"]).pad is pad
+        assert resolve_url(record, ["2021"]) is None
+        resolve_url_path.assert_not_called()
+
+    def test_resolve_url_lazily(self, resolve_url, plugin, inifile, blog_record):
+        inifile["resolver.lazy"] = "yes"
+        plugin._inifile = inifile
+        assert resolve_url(blog_record, ["2020"]) is not None
+        assert plugin.url_mapper.pending == {}
+
+    def test_resolve_url_misses_cached(
+        self, resolve_url, plugin, inifile, blog_record, mocker
+    ):
+        inifile["resolver.lazy"] = "yes"
+        plugin._inifile = inifile
+        resolve_url_path = mocker.spy(Config, "resolve_url_path")
+        assert resolve_url(blog_record, ["static", "app.js"]) is None
+        assert resolve_url(blog_record, ["static", "app.js"]) is None
+        assert resolve_url_path.call_count == 1
+
+        plugin.cache.clear()
+        assert resolve_url(blog_record, ["static", "app.js"]) is None
+        assert resolve_url_path.call_count == 2
+
     @pytest.fixture
     def jinja_env(self, lektor_env):
         return lektor_env.jinja_env
@@ -121,6 +258,160 @@ class TestIndexPagesPlugin:
         assert jinja2.is_undefined(rv)
 
 
+def test_writes_plan(plugin, inifile, lektor_builder, tmp_path):
+    inifile["prerender.workers"] = "2"
+    plugin.plan_filename = str(tmp_path / "plan.txt")
+
+    plugin.on_before_build_all(lektor_builder)
+    assert plugin.prerenderer is None
+    lines = (tmp_path / "plan.txt").read_text().splitlines()
+    assert lines[0].startswith("# [year-index] alt=en: 1 artifacts, ")
+    assert lines[1].startswith("/blog/2020/index.html\t")
+
+
+def test_loads_key_file(plugin, lektor_builder, lektor_pad, tmp_path, mocker):
+    filename = str(tmp_path / "index-keys.bin")
+    plugin.write_key_file(lektor_pad, filename)
+    plugin.keys_filename = filename
+
+    plugin.on_before_build_all(lektor_builder)
+    group_items = mocker.patch("lektor_index_pages.sourceobj.group_items")
+    config = plugin.read_config()
+    pad = lektor_pad.db.new_pad()
+    index_root = config.get_index_root("year-index", pad, "en")
+    assert [index._id for index in index_root.subindexes] == ["2020"]
+    assert isinstance(index_root._subindex_groups["2020"].ordinals, memoryview)
+    group_items.assert_not_called()
+
+
+class TestCachePersistence:
+    @pytest.fixture(autouse=True)
+    def cache_home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        return tmp_path
+
+    @pytest.fixture
+    def site_path(self, site_path, tmp_path):
+        # We modify the site, so work on a copy
+        site_copy = tmp_path / "site"
+        shutil.copytree(site_path, site_copy)
+        return site_copy
+
+    @pytest.fixture
+    def inifile(self, inifile):
+        inifile["cache.persist"] = "yes"
+        return inifile
+
+    def compute_index(self, plugin, lektor_pad):
+        config = plugin.read_config()
+        index_root = config.get_index_root("year-index", lektor_pad)
+        return list(index_root.subindexes)
+
+    def test_get_cache_store(self, plugin, lektor_env):
+        cache_store = plugin.get_cache_store()
+        assert cache_store.filename.endswith(f"{lektor_env.project.id}.pickle")
+
+    def test_get_cache_store_disabled(self, plugin, inifile):
+        inifile["cache.persist"] = "no"
+        assert plugin.get_cache_store() is None
+
+    def test_persistence(self, plugin, lektor_builder, lektor_pad):
+        self.compute_index(plugin, lektor_pad)
+        plugin.on_after_build_all(lektor_builder)
+
+        plugin.cache.clear()
+        plugin.on_before_build_all(lektor_builder)
+        key = ("subindex_ids", "/blog@index-pages/year-index")
+        assert key in plugin.cache
+        assert plugin.cache.get_or_create(key, lambda: None) == ("2020",)
+
+    def test_unchanged_cache_not_resaved(
+        self, plugin, lektor_builder, lektor_pad, mocker
+    ):
+        self.compute_index(plugin, lektor_pad)
+        plugin.on_after_build_all(lektor_builder)
+
+        plugin.cache.clear()
+        plugin.on_before_build_all(lektor_builder)
+        save = mocker.spy(plugin.get_cache_store().__class__, "save")
+        self.compute_index(plugin, lektor_pad.db.new_pad())
+        plugin.on_after_build_all(lektor_builder)
+        assert save.call_count == 0
+
+        self.compute_index(plugin, lektor_pad.db.new_pad())
+        plugin.cache.get_or_create(("subindex_ids", "/new"), tuple)
+        plugin.on_after_build_all(lektor_builder)
+        assert save.call_count == 1
+
+    @pytest.mark.parametrize(
+        "pub_date, subindex_ids",
+        [
+            ("2019-03-24", ("2020", "2019")),
+            # The order of the items changes, so the cache is discarded
+            ("2021-03-24", None),
+        ],
+    )
+    def test_changed_items_rekeyed(
+        self,
+        plugin,
+        lektor_builder,
+        lektor_pad,
+        site_path,
+        tmp_path,
+        pub_date,
+        subindex_ids,
+    ):
+        self.compute_index(plugin, lektor_pad)
+        plugin.on_after_build_all(lektor_builder)
+
+        contents = site_path / "content" / "blog" / "first-post" / "contents.lr"
+        contents.write_text(contents.read_text().replace("2020-03-24", pub_date))
+        stat = contents.stat()
+        os.utime(contents, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        plugin.cache.clear()
+        builder = Builder(lektor_pad.db.new_pad(), str(tmp_path / "output"))
+        plugin.on_before_build_all(builder)
+        key = ("subindex_ids", "/blog@index-pages/year-index")
+        assert plugin.cache.get_or_create(key, lambda: None) == subindex_ids
+
+    def test_not_persisted_when_disabled(
+        self, plugin, inifile, lektor_builder, lektor_pad, cache_home
+    ):
+        inifile["cache.persist"] = "no"
+        self.compute_index(plugin, lektor_pad)
+        plugin.on_after_build_all(lektor_builder)
+        assert not (cache_home / "lektor").exists()
+
+
+class TestGroupStore:
+    @pytest.fixture(autouse=True)
+    def cache_home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        return tmp_path
+
+    @pytest.fixture
+    def inifile(self, inifile):
+        inifile["cache.backend"] = "sqlite"
+        return inifile
+
+    def test_get_group_store(self, plugin):
+        group_store = plugin.get_group_store()
+        assert isinstance(group_store, SqliteGroupStore)
+        assert plugin.get_group_store() is group_store
+
+    def test_get_group_store_disabled(self, plugin, inifile):
+        inifile["cache.backend"] = "memory"
+        assert plugin.get_group_store() is None
+
+    def test_cleared_before_build(self, plugin, lektor_builder, lektor_pad):
+        index_root = plugin.read_config().get_index_root("year-index", lektor_pad)
+        child_ids = index_root._subindex_groups["2020"]
+        assert len(list(child_ids)) == 2
+        plugin.on_before_build_all(lektor_builder)
+        assert list(child_ids) == []
+
+
 class TestIndexPages:
     @pytest.fixture
     def alt(self):
@@ -0,0 +1,91 @@
+from concurrent.futures import Future
+
+import pytest
+
+from lektor_index_pages.prerender import Prerenderer
+from lektor_index_pages.prerender import RenderResult
+
+
+@pytest.fixture
+def index_root(config, lektor_pad):
+    return config.get_index_root("year-index", lektor_pad)
+
+
+@pytest.fixture
+def prerenderer(lektor_builder):
+    prerenderer = Prerenderer(lektor_builder, 2)
+    yield prerenderer
+    prerenderer.close()
+
+
+class TestRenderResult:
+    @pytest.fixture
+    def result(self, mocker):
+        return RenderResult(
+            "<html>", frozenset(["dep.lr"]), (mocker.sentinel.virtual_source,)
+        )
+
+    def test_write_into(self, result, mocker):
+        artifact = mocker.MagicMock(name="artifact")
+        ctx = mocker.Mock(name="ctx")
+        result.write_into(artifact, ctx)
+        fp = artifact.open.return_value.__enter__.return_value
+        assert fp.write.mock_calls == [mocker.call(b"<html>\n")]
+        ctx.record_dependency.assert_called_once_with("dep.lr")
+        ctx.record_virtual_dependency.assert_called_once_with(
+            mocker.sentinel.virtual_source
+        )
+
+    def test_write_into_without_ctx(self, result, mocker):
+        artifact = mocker.MagicMock(name="artifact")
+        result.write_into(artifact, None)
+        assert artifact.open.called
+
+
+class TestPrerenderer:
+    def test_prerender(self, prerenderer, index_root, lektor_build_state):
+        prerenderer.prerender(index_root, lektor_build_state)
+        assert list(prerenderer.futures) == ["blog/2020/index.html"]
+
+        result = prerenderer.take("blog/2020/index.html")
+        assert "Blog - 2020" in result.html
+        blog_contents = index_root.record.source_filename
+        assert blog_contents in result.dependencies
+        assert prerenderer.futures == {}
+
+    def test_prerender_skips_current_artifacts(
+        self, prerenderer, index_root, lektor_build_state, mocker
+    ):
+        mocker.patch(
+            "lektor.builder.Artifact.is_current",
+            new_callable=mocker.PropertyMock,
+            return_value=True,
+        )
+        prerenderer.prerender(index_root, lektor_build_state)
+        assert prerenderer.futures == {}
+
+    def test_prerender_submits_once(self, prerenderer, index_root, lektor_build_state):
+        prerenderer.prerender(index_root, lektor_build_state)
+        future = prerenderer.futures["blog/2020/index.html"]
+        prerenderer.prerender(index_root, lektor_build_state)
+        assert prerenderer.futures["blog/2020/index.html"] is future
+
+    def test_take_missing(self, prerenderer):
+        assert prerenderer.take("missing.html") is None
+
+    def test_take_failed(self, prerenderer):
+        future = Future()
+        future.set_exception(RuntimeError("failed"))
+        prerenderer.futures["failed.html"] = future
+        assert prerenderer.take("failed.html") is None
+
+    def test_render_missing_source(self, prerenderer):
+        with pytest.raises(LookupError):
+            prerenderer._render("/missing", "_primary", "year-index.html")
+
+    def test_close(self, prerenderer):
+        future = Future()
+        prerenderer.futures["pending.html"] = future
+        prerenderer.close()
+        assert future.cancelled()
+        assert prerenderer.futures == {}
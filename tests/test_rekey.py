@@ -0,0 +1,240 @@
+import re
+import shutil
+
+import pytest
+
+from lektor_index_pages.buildprog import iter_index_tree
+from lektor_index_pages.childids import ChildIds
+from lektor_index_pages.config import Config
+from lektor_index_pages.rekey import _Rekeyer
+from lektor_index_pages.rekey import rekey
+
+
+@pytest.fixture
+def site_path(site_path, tmp_path):
+    # We modify the site, so work on a copy
+    site_copy = tmp_path / "site"
+    shutil.copytree(site_path, site_copy)
+    return site_copy
+
+
+@pytest.fixture
+def month_index_enabled():
+    return True
+
+
+@pytest.fixture
+def inifile(inifile):
+    inifile["words.parent_path"] = "/blog"
+    inifile["words.key"] = "item.title.split()"
+    inifile["archive.type"] = "date"
+    inifile["archive.parent_path"] = "/blog"
+    inifile["archive.field"] = "pub_date"
+    inifile["archive.levels"] = "year, month"
+    return inifile
+
+
+def compute_indexes(config, pad, alt):
+    for index_name in config.index_models:
+        index_root = config.get_index_root(index_name, pad, alt)
+        for _ in iter_index_tree(index_root):
+            pass
+
+
+def groupings(cache):
+    def normalize(value):
+        if isinstance(value, ChildIds):
+            return list(value)
+        return [(key, normalize(val)) for key, val in value.items()]
+
+    with cache.lock:
+        return {
+            key: normalize(value)
+            for key, value in cache.data.items()
+            if isinstance(key, tuple)
+            and key[0] in ("subindex_groups", "subindex_ids")
+            and not isinstance(value, tuple)
+        }
+
+
+def edit_post(site_path, post_id, pattern, repl):
+    contents = site_path / "content" / "blog" / post_id / "contents.lr"
+    contents.write_text(re.sub(pattern, repl, contents.read_text()))
+
+
+@pytest.fixture
+def cached(plugin, config, lektor_pad, lektor_alt):
+    compute_indexes(config, lektor_pad, lektor_alt)
+
+
+@pytest.mark.usefixtures("cached")
+class Test_rekey:
+    def rekey(self, plugin, config, lektor_pad, lektor_alt, post_id="first-post"):
+        pad = lektor_pad.db.new_pad()
+        changed_items = {(f"/blog/{post_id}", lektor_alt)}
+        return rekey(config, pad, plugin.cache, changed_items)
+
+    def assert_rekeyed(self, plugin, config, lektor_pad, lektor_alt, post_id):
+        assert self.rekey(plugin, config, lektor_pad, lektor_alt, post_id)
+        compute_indexes(config, lektor_pad.db.new_pad(), lektor_alt)
+        rekeyed = groupings(plugin.cache)
+        plugin.cache.clear()
+        compute_indexes(config, lektor_pad.db.new_pad(), lektor_alt)
+        assert rekeyed == groupings(plugin.cache)
+
+    @pytest.mark.parametrize(
+        "post_id, pattern, repl",
+        [
+            ("first-post", "2020-03-24", "2019-03-24"),
+            ("first-post", "2020-03-24", "2020-02-29"),
+            ("second-post", "2020-04-03", "2020-03-24"),
+            ("first-post", "Hello Website", "Goodbye"),
+            ("second-post", "Hello Again", "Again Hello"),
+            ("second-post", "Hello Again", "Hello Website Again"),
+            ("first-post", "Hello Website", "Hello Website"),
+        ],
+    )
+    def test_rekeyed(
+        self, plugin, config, lektor_pad, lektor_alt, site_path, post_id, pattern, repl
+    ):
+        edit_post(site_path, post_id, pattern, repl)
+        self.assert_rekeyed(plugin, config, lektor_pad, lektor_alt, post_id)
+
+    def test_unchanged_nodes_kept(
+        self, plugin, config, lektor_pad, lektor_alt, site_path
+    ):
+        key = "subindex_groups", "/blog", lektor_alt, None
+        before = plugin.cache.get_or_create(key, dict)["words"]
+        edit_post(site_path, "first-post", "Hello Website", "Goodbye")
+        assert self.rekey(plugin, config, lektor_pad, lektor_alt)
+        after = plugin.cache.get_or_create(key, dict)["words"]
+        assert list(after) == ["Hello", "Again", "Goodbye"]
+        assert after["Again"] is before["Again"]
+
+    def test_discards_stale_data(
+        self, plugin, config, lektor_pad, lektor_alt, site_path
+    ):
+        root_path = "/blog@index-pages/year-index"
+        stale = [
+            ("child_ids", root_path, "2020"),
+            ("subindex_ids", f"{root_path}/page/2"),
+            ("subindex_ids", "/blog@index-pages/words/Website"),
+            ("resolved_path", "/blog@index-pages/archive/2020", lektor_alt),
+        ]
+        kept = ("child_ids", "/blog@index-pages/words/Again", "x")
+        for key in (*stale, kept):
+            plugin.cache.get_or_create(key, tuple)
+        edit_post(site_path, "first-post", "Hello Website", "Goodbye")
+        assert self.rekey(plugin, config, lektor_pad, lektor_alt)
+        assert kept in plugin.cache
+        assert not any(key in plugin.cache for key in stale)
+
+    def test_root_groups_not_cached(
+        self, plugin, config, lektor_pad, lektor_alt, site_path
+    ):
+        with plugin.cache.lock:
+            del plugin.cache.data["subindex_groups", "/blog", lektor_alt, None]
+        edit_post(site_path, "first-post", "2020-03-24", "2019-03-24")
+        assert self.rekey(plugin, config, lektor_pad, lektor_alt)
+        with plugin.cache.lock:
+            assert not any(
+                key[1].startswith("/blog@index-pages/")
+                for key in plugin.cache.data
+                if key[0] == "subindex_groups"
+            )
+
+    def test_subindex_groups_not_cached(
+        self, plugin, config, lektor_pad, lektor_alt, site_path
+    ):
+        key = "subindex_groups", "/blog@index-pages/year-index/2020"
+        with plugin.cache.lock:
+            del plugin.cache.data[key]
+        edit_post(site_path, "first-post", "2020-03-24", "2020-02-29")
+        assert self.rekey(plugin, config, lektor_pad, lektor_alt)
+        assert ("subindex_ids", "/blog@index-pages/year-index/2020") not in (
+            plugin.cache
+        )
+
+    def test_order_changed(self, plugin, config, lektor_pad, lektor_alt, site_path):
+        edit_post(site_path, "first-post", "2020-03-24", "2021-01-01")
+        assert not self.rekey(plugin, config, lektor_pad, lektor_alt)
+
+    def test_item_removed(self, plugin, config, lektor_pad, lektor_alt, site_path):
+        shutil.rmtree(site_path / "content" / "blog" / "first-post")
+        assert not self.rekey(plugin, config, lektor_pad, lektor_alt)
+
+    def test_undiscoverable_changed(self, plugin, config, lektor_pad, lektor_alt):
+        with plugin.cache.lock:
+            for key, value in plugin.cache.data.items():
+                if isinstance(key, tuple) and key[0] == "items":
+                    _, _, child_ids = value
+                    child_ids.table.undiscoverable = True
+        assert not self.rekey(plugin, config, lektor_pad, lektor_alt)
+
+    def test_missing_record(self, plugin, config, lektor_pad, lektor_alt):
+        with plugin.cache.lock:
+            data = plugin.cache.data
+            for key in [key for key in data if key[0] == "items"]:
+                data[key[0], "/missing", *key[2:]] = data.pop(key)
+        assert not self.rekey(plugin, config, lektor_pad, lektor_alt)
+
+    def test_no_index_models(self, plugin, lektor_pad, lektor_alt):
+        assert not self.rekey(plugin, Config({}), lektor_pad, lektor_alt)
+
+    def test_missing_item(self, plugin, config, lektor_pad, lektor_alt, monkeypatch):
+        def get_post(self, id_):
+            raise LookupError(id_)
+
+        monkeypatch.setattr(_Rekeyer, "_get_post", get_post)
+        assert not self.rekey(plugin, config, lektor_pad, lektor_alt)
+
+    def test_unchanged_items_ignored(self, plugin, config, lektor_pad, lektor_alt):
+        before = groupings(plugin.cache)
+        assert rekey(config, lektor_pad, plugin.cache, {("/about", lektor_alt)})
+        assert groupings(plugin.cache) == before
+
+
+def test_get_post_missing(plugin, config, blog_record, lektor_pad):
+    index_root = config.get_index_root("year-index", lektor_pad)
+    table = index_root.children.child_ids.table
+    rekeyer = _Rekeyer(lektor_pad, plugin.cache, "/blog", "_primary", table, [])
+    with pytest.raises(LookupError, match="can not find"):
+        rekeyer._get_post("missing")
+
+
+class Test_rekey_source_paths:
+    @pytest.fixture
+    def site_path(self, news_site_path):
+        return news_site_path
+
+    @pytest.fixture
+    def inifile(self, inifile):
+        inifile["all-words.parent_path"] = "/"
+        inifile["all-words.source_paths"] = "/blog, /news"
+        inifile["all-words.order_by"] = "-pub_date"
+        inifile["all-words.key"] = "item.title.split()"
+        return inifile
+
+    def test_rekeyed(self, plugin, config, lektor_pad, lektor_alt, site_path, cached):
+        contents = site_path / "content" / "news" / "launch" / "contents.lr"
+        contents.write_text(contents.read_text().replace("launch", "Hello launch"))
+        changed_items = {("/news/launch", lektor_alt)}
+        assert rekey(config, lektor_pad.db.new_pad(), plugin.cache, changed_items)
+        compute_indexes(config, lektor_pad.db.new_pad(), lektor_alt)
+        rekeyed = groupings(plugin.cache)
+        plugin.cache.clear()
+        compute_indexes(config, lektor_pad.db.new_pad(), lektor_alt)
+        assert rekeyed == groupings(plugin.cache)
+        index = config.get_index_root("all-words", lektor_pad.db.new_pad(), lektor_alt)
+        assert list(index._subindex_groups["Hello"]) == [
+            "blog/second-post",
+            "news/launch",
+            "blog/first-post",
+        ]
+
+    def test_unrelated_items_ignored(
+        self, plugin, config, lektor_pad, lektor_alt, cached, mocker
+    ):
+        rekey_items = mocker.spy(_Rekeyer, "rekey_items")
+        assert rekey(config, lektor_pad, plugin.cache, {("/about", lektor_alt)})
+        rekey_items.assert_not_called()
@@ -2,13 +2,19 @@ import copy
 import datetime
 from operator import itemgetter
 
+import jinja2
 import pytest
 from lektor.environment import PRIMARY_ALT
 
+from lektor_index_pages.indexmodel import group_items as group_items_
 from lektor_index_pages.indexmodel import index_models_from_ini
 from lektor_index_pages.indexmodel import VIRTUAL_PATH_PREFIX
+from lektor_index_pages.sourceobj import DummyCache
+from lektor_index_pages.sourceobj import FieldState
+from lektor_index_pages.sourceobj import FieldValues
 from lektor_index_pages.sourceobj import IndexRoot
 from lektor_index_pages.sourceobj import IndexSource
+from lektor_index_pages.sqlstore import SqlChildIds
 
 
 @pytest.fixture
@@ -16,10 +22,16 @@ def year_index_slug_format():
     return None
 
 
+@pytest.fixture
+def lazy_resolve():
+    return False
+
+
 @pytest.fixture
 def inifile(
     inifile,
     year_index_slug_format,
+    lazy_resolve,
     # XXX: not sure why I need to explicitly call these out
     # They are used by our inherited inifile fixture
     pagination_enabled,
@@ -27,6 +39,8 @@ def inifile(
 ):
     if year_index_slug_format is not None:
         inifile["year-index.slug_format"] = year_index_slug_format
+    if lazy_resolve:
+        inifile["resolver.lazy"] = "yes"
     return inifile
 
 
@@ -139,6 +153,57 @@ class TestIndexSource:
     def test__subindex_ids_missing_if_no_subindex(self, year_index):
         assert not hasattr(year_index, "_subindex_ids")
 
+    def test__subindex_groups(self, index_root):
+        groups = index_root._subindex_groups
+        assert {key: list(ids) for key, ids in groups.items()} == {
+            "2020": ["second-post", "first-post"],
+        }
+
+    @pytest.mark.parametrize("pagination_enabled", [True])
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test__subindex_groups_shared_by_pages(self, year_index, mocker):
+        assert year_index._subindex_ids == ("04", "03")
+        group_children = mocker.spy(year_index.__class__, "_group_children")
+        page = year_index.__for_page__(1)
+        assert page._node_path == year_index.path
+        assert page._subindex_ids == ("04", "03")
+        assert group_children.call_count == 0
+
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test__subindex_groups_of_subindex(self, year_index):
+        groups = year_index._subindex_groups
+        assert {key: list(ids) for key, ids in groups.items()} == {
+            "04": ["second-post"],
+            "03": ["first-post"],
+        }
+        assert groups["04"].table is year_index._id_table
+
+    def test__subindex_groups_missing_if_no_subindex(self, year_index):
+        assert not hasattr(year_index, "_subindex_groups")
+
+    def test_children_materialized_once(self, index_root_model, blog_record, mocker):
+        get_items = mocker.spy(index_root_model.items_model, "get_items")
+        root = IndexRoot(index_root_model, blog_record)
+        reroot = IndexRoot(index_root_model, blog_record)
+        assert get_items.call_count == 1
+        assert root.children.child_ids is reroot.children.child_ids
+        assert list(reroot.children) == list(blog_record.children)
+
+    def test_index_roots_share_items(self, lektor_env, inifile, blog_record, mocker):
+        inifile["id-index.parent_path"] = "/blog"
+        inifile["id-index.key"] = "item._id"
+        year_model, id_model = index_models_from_ini(lektor_env, inifile)
+        group_items = mocker.patch(
+            "lektor_index_pages.sourceobj.group_items", wraps=group_items_
+        )
+
+        year_root = IndexRoot(year_model, blog_record)
+        id_root = IndexRoot(id_model, blog_record)
+        assert year_root._subindex_ids == ("2020",)
+        assert id_root._subindex_ids == ("second-post", "first-post")
+        assert id_root._id_table is year_root._id_table
+        assert group_items.call_count == 1
+
     def test_path(self, index_root):
         assert index_root.path == f"/blog@{VIRTUAL_PATH_PREFIX}/year-index"
 
@@ -182,6 +247,7 @@ class TestIndexSource:
     )
     @pytest.mark.parametrize("pagination_enabled", [True, False])
     @pytest.mark.parametrize("month_index_enabled", [True, False])
+    @pytest.mark.parametrize("lazy_resolve", [False, True])
     def test_resolve_virtual_path(
         self, index_root, path, should_resolve, pagination_enabled, month_index_enabled
     ):
@@ -219,10 +285,20 @@ class TestIndexSource:
         ],
     )
     @pytest.mark.parametrize("month_index_enabled", [True, False])
+    @pytest.mark.parametrize("lazy_resolve", [False, True])
+    @pytest.mark.parametrize("year_index_slug_format", [None, "'y' ~ this._id"])
     def test_resolve_url_path(
-        self, index_root, url_path, index_type, path, month_index_enabled
+        self,
+        index_root,
+        url_path,
+        index_type,
+        path,
+        month_index_enabled,
+        year_index_slug_format,
     ):
         url_path = url_path.split("/") if url_path else []
+        if year_index_slug_format is not None and url_path:
+            url_path[0] = "y" + url_path[0]
 
         should_resolve = bool(index_type)
         if not month_index_enabled and index_type == "month":
@@ -235,11 +311,54 @@ class TestIndexSource:
         else:
             assert source is None
 
+    @pytest.mark.parametrize("lazy_resolve", [True])
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test_lazy_resolve_virtual_path(self, index_root):
+        month_index = index_root.resolve_virtual_path(["2020", "03"])
+        assert [post.path for post in month_index.children] == ["/blog/first-post"]
+        assert not index_root._has_subindex_groups()
+        assert not month_index.parent._has_subindex_groups()
+
+    @pytest.mark.parametrize("lazy_resolve", [True])
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test_lazy_resolve_url_path(self, index_root):
+        month_index = index_root.resolve_url_path(["2020", "03"])
+        assert month_index.path == "/blog@index-pages/year-index/2020/03"
+        assert not index_root._has_subindex_groups()
+
+    @pytest.mark.parametrize("lazy_resolve", [True])
+    def test_lazy_mode_uses_existing_groups(self, index_root, mocker):
+        assert index_root._subindex_ids == ("2020",)
+        keys_for_post = mocker.spy(index_root._model.subindex_model, "keys_for_post")
+        year_index = index_root.resolve_virtual_path(["2020"])
+        assert year_index.children.count() == 2
+        assert keys_for_post.call_count == 0
+
+    @pytest.mark.parametrize("lazy_resolve", [True])
+    def test_lazy_mode_misses_not_cached(self, plugin, index_root):
+        assert index_root.resolve_virtual_path(["1999"]) is None
+        with plugin.cache.lock:
+            assert not any(key[0] == "child_ids" for key in plugin.cache.data)
+        assert index_root.resolve_virtual_path(["2020"]) is not None
+        assert ("child_ids", index_root.path, "2020") in plugin.cache
+
+    @pytest.mark.parametrize("lazy_resolve", [True])
+    def test_lazy_mode_uses_existing_subindex_ids(self, plugin, index_root, mocker):
+        plugin.cache.get_or_create(("subindex_ids", index_root.path), lambda: ("2020",))
+        keys_for_post = mocker.spy(index_root._model.subindex_model, "keys_for_post")
+        assert index_root.resolve_virtual_path(["1999"]) is None
+        assert keys_for_post.call_count == 0
+        assert index_root.resolve_virtual_path(["2020"]) is not None
+        assert keys_for_post.call_count == 2
+
     @pytest.mark.parametrize("page_num", [None, 1, 2])
     def test_for_page(self, year_index, page_num):
         paginated = year_index.__for_page__(page_num)
         assert paginated.page_num == page_num
 
+    def test__get_subindex_with_unknown_id(self, index_root):
+        assert index_root._get_subindex("1999").children.count() == 0
+
     def test__get_subindex_raises_if_no_subindex(self, year_index):
         with pytest.raises(LookupError):
             year_index._get_subindex("1")
@@ -347,3 +466,346 @@ class TestIndexSource:
     @pytest.mark.parametrize("lektor_alt", ["xx"])
     def test_repr_with_alt(self, index):
         assert repr(index).endswith(" alt='xx'>")
+
+
+@pytest.mark.usefixtures("plugin")
+class TestDateIndex:
+    @pytest.fixture
+    def index_root(self, lektor_env, inifile, blog_record):
+        inifile["date-index.parent_path"] = "/blog"
+        inifile["date-index.type"] = "date"
+        inifile["date-index.field"] = "pub_date"
+        inifile["date-index.levels"] = "year, month"
+        model = {
+            model.index_name: model
+            for model in index_models_from_ini(lektor_env, inifile)
+        }["date-index"]
+        return IndexRoot(model, blog_record)
+
+    def test_subindexes(self, index_root):
+        (year_index,) = index_root.subindexes
+        assert year_index._id == "2020"
+        assert [month._id for month in year_index.subindexes] == ["04", "03"]
+
+    def test_children(self, index_root):
+        month_index = index_root.subindexes.first().subindexes.first()
+        assert [post.path for post in month_index.children] == ["/blog/second-post"]
+
+    def test_fields(self, index_root):
+        year_index = index_root.subindexes.first()
+        month_index = year_index.subindexes.first()
+        assert year_index["year"] == 2020
+        assert year_index["date"] == datetime.date(2020, 1, 1)
+        assert "month" not in year_index
+        assert month_index["year"] == 2020
+        assert month_index["month"] == 4
+        assert month_index["date"] == datetime.date(2020, 4, 1)
+
+    @pytest.mark.parametrize("lazy_resolve", [False, True])
+    def test_resolve_virtual_path(self, index_root):
+        source = index_root.resolve_virtual_path(["2020", "03"])
+        assert source["date"] == datetime.date(2020, 3, 1)
+        assert index_root.resolve_virtual_path(["2020", "05"]) is None
+
+
+@pytest.mark.usefixtures("plugin")
+class TestPrefixIndex:
+    @pytest.fixture
+    def index_root(self, lektor_env, inifile, blog_record):
+        inifile["title-index.parent_path"] = "/blog"
+        inifile["title-index.type"] = "prefix"
+        inifile["title-index.field"] = "title"
+        inifile["title-index.prefix_length"] = "7"
+        model = {
+            model.index_name: model
+            for model in index_models_from_ini(lektor_env, inifile)
+        }["title-index"]
+        return IndexRoot(model, blog_record)
+
+    def test_subindexes(self, index_root):
+        assert [index._id for index in index_root.subindexes] == [
+            "HELLOAG",
+            "HELLOWE",
+        ]
+
+    def test_count(self, index_root, lektor_context):
+        index = index_root.subindexes.first()
+        assert index["count"] == 1
+        dependencies = set(lektor_context.referenced_dependencies)
+        post = index.children.first()
+        assert post.source_filename not in dependencies
+
+
+@pytest.mark.usefixtures("plugin")
+class TestSourcePaths:
+    @pytest.fixture
+    def site_path(self, news_site_path):
+        return news_site_path
+
+    @pytest.fixture
+    def inifile(self, inifile):
+        for name in ("all-years", "all-months"):
+            inifile[f"{name}.parent_path"] = "/"
+            inifile[f"{name}.source_paths"] = "/blog, /news"
+            inifile[f"{name}.order_by"] = "-pub_date"
+            inifile[f"{name}.key"] = "item.pub_date.year|string"
+        inifile["all-months.key"] = "item.pub_date.month|string"
+        return inifile
+
+    @pytest.fixture
+    def index_root(self, config, lektor_pad):
+        return config.get_index_root("all-years", lektor_pad)
+
+    def test_children(self, index_root):
+        assert [post.path for post in index_root.children] == [
+            "/blog/second-post",
+            "/news/launch",
+            "/blog/first-post",
+            "/news/preview",
+        ]
+
+    def test_subindexes(self, index_root):
+        assert {
+            index._id: [post.path for post in index.children]
+            for index in index_root.subindexes
+        } == {
+            "2020": ["/blog/second-post", "/news/launch", "/blog/first-post"],
+            "2019": ["/news/preview"],
+        }
+
+    def test_resolve_virtual_path(self, lektor_pad):
+        source = lektor_pad.get("/@index-pages/all-years/2019")
+        assert [post.path for post in source.children] == ["/news/preview"]
+
+    def test_items_shared(self, config, lektor_pad):
+        years = config.get_index_root("all-years", lektor_pad)
+        months = config.get_index_root("all-months", lektor_pad)
+        assert years._model.items_model is months._model.items_model
+        assert years.children.child_ids is months.children.child_ids
+
+    def test_dependencies(self, index_root, lektor_context, site_path):
+        list(index_root.children)
+        dependencies = lektor_context.referenced_dependencies
+        assert str(site_path / "content" / "blog") in dependencies
+        assert str(site_path / "content" / "news") in dependencies
+        assert str(site_path / "content" / "news" / "contents.lr") in dependencies
+        assert str(site_path / "content" / "contents.lr") not in dependencies
+
+
+@pytest.mark.usefixtures("plugin")
+class TestVisibility:
+    @pytest.fixture
+    def site_path(self, docs_site_path):
+        contents = docs_site_path / "content" / "docs" / "api" / "reference"
+        contents /= "contents.lr"
+        contents.write_text(contents.read_text() + "---\n_discoverable: no\n")
+        return docs_site_path
+
+    @pytest.fixture
+    def items(self):
+        return "this.children.include_undiscoverable(true).include_hidden(true)"
+
+    @pytest.fixture
+    def inifile(self, inifile, items):
+        inifile["by-title.parent_path"] = "/docs/api"
+        inifile["by-title.items"] = items
+        inifile["by-title.key"] = "item.title"
+        return inifile
+
+    @pytest.fixture
+    def index_root(self, config, lektor_pad):
+        return config.get_index_root("by-title", lektor_pad)
+
+    def test_children(self, index_root):
+        assert [post.path for post in index_root.children] == [
+            "/docs/api/internals",
+            "/docs/api/reference",
+        ]
+        assert index_root.children.count() == 2
+
+    def test_subindexes(self, index_root):
+        assert [index._id for index in index_root.subindexes] == [
+            "Internals",
+            "Reference",
+        ]
+
+    @pytest.mark.parametrize("items", ["this.children"])
+    def test_default_visibility(self, index_root):
+        assert list(index_root.children) == []
+        assert list(index_root.subindexes) == []
+
+
+@pytest.mark.usefixtures("plugin")
+class TestRecursive:
+    @pytest.fixture
+    def site_path(self, docs_site_path):
+        return docs_site_path
+
+    @pytest.fixture
+    def inifile(self, inifile):
+        inifile["by-letter.parent_path"] = "/docs"
+        inifile["by-letter.recursive"] = "yes"
+        inifile["by-letter.key"] = "item.title[0]"
+        return inifile
+
+    @pytest.fixture
+    def index_root(self, config, lektor_pad):
+        return config.get_index_root("by-letter", lektor_pad)
+
+    def test_children(self, index_root):
+        assert [post.path for post in index_root.children] == [
+            "/docs/guide",
+            "/docs/guide/install",
+            "/docs/guide/usage",
+            "/docs/api",
+            "/docs/api/reference",
+        ]
+
+    def test_subindexes(self, index_root):
+        assert {
+            index._id: list(index.children.child_ids) for index in index_root.subindexes
+        } == {
+            "A": ["guide"],
+            "I": ["guide/install"],
+            "U": ["guide/usage"],
+            "B": ["api"],
+            "R": ["api/reference"],
+        }
+
+    def test_resolve_virtual_path(self, lektor_pad):
+        source = lektor_pad.get("/docs@index-pages/by-letter/I")
+        assert [post.path for post in source.children] == ["/docs/guide/install"]
+
+    def test_dependencies(self, index_root, lektor_context, site_path):
+        list(index_root.children)
+        dependencies = lektor_context.referenced_dependencies
+        docs_path = site_path / "content" / "docs"
+        assert str(docs_path) in dependencies
+        assert str(docs_path / "guide") in dependencies
+        assert str(docs_path / "guide" / "install") in dependencies
+        assert str(docs_path / "api" / "internals") not in dependencies
+
+    def test_paginated_dependencies(self, index_root, lektor_context, site_path):
+        assert [post.path for post in index_root.children.offset(3).limit(2)] == [
+            "/docs/api",
+            "/docs/api/reference",
+        ]
+        dependencies = lektor_context.referenced_dependencies
+        docs_path = site_path / "content" / "docs"
+        assert str(docs_path / "guide") in dependencies
+        assert str(docs_path / "guide" / "usage") in dependencies
+        assert str(docs_path / "api" / "reference") in dependencies
+
+
+@pytest.mark.usefixtures("plugin")
+class TestSqliteBackend:
+    @pytest.fixture
+    def inifile(self, inifile, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        inifile["cache.backend"] = "sqlite"
+        return inifile
+
+    def test__subindex_groups(self, index_root):
+        groups = index_root._subindex_groups
+        assert isinstance(groups["2020"], SqlChildIds)
+        assert {key: list(ids) for key, ids in groups.items()} == {
+            "2020": ["second-post", "first-post"],
+        }
+
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test__subindex_groups_of_subindex(self, year_index):
+        groups = year_index._subindex_groups
+        assert isinstance(groups["04"], SqlChildIds)
+        assert list(groups["04"]) == ["second-post"]
+
+    @pytest.mark.parametrize("pagination_enabled", [1])
+    def test_pagination(self, year_index):
+        page2 = year_index.__for_page__(2)
+        assert page2.pagination.total == 2
+        assert [post["_id"] for post in page2.pagination.items] == ["first-post"]
+
+
+class Descriptor:
+    def __init__(self, func):
+        self.func = func
+        self.calls = 0
+
+    def __get__(self, source):
+        self.calls += 1
+        return self.func(source)
+
+
+class TestFieldValues:
+    @pytest.fixture
+    def source(self):
+        return object()
+
+    def test_resolved(self, source):
+        descriptor = Descriptor(lambda source: 42)
+        fields = FieldValues({"answer": descriptor})
+        assert fields.contains(source, "answer")
+        assert fields.get(source, "answer") == 42
+        assert fields.get_defined(source, "answer") == 42
+        assert fields.resolve(source, "answer") == (FieldState.RESOLVED, 42)
+        assert descriptor.calls == 1
+
+    def test_none_is_resolved(self, source):
+        fields = FieldValues({"none": None})
+        assert fields.contains(source, "none")
+        assert fields.get(source, "none") is None
+
+    def test_undefined(self, source):
+        descriptor = Descriptor(lambda source: jinja2.Undefined())
+        fields = FieldValues({"undef": descriptor})
+        assert not fields.contains(source, "undef")
+        assert jinja2.is_undefined(fields.get(source, "undef"))
+        assert fields.get_defined(source, "undef") is None
+        assert fields.resolve(source, "undef")[0] is FieldState.UNDEFINED
+        assert descriptor.calls == 1
+
+    def test_error(self, source):
+        def fail(source):
+            raise ZeroDivisionError("boom")
+
+        descriptor = Descriptor(fail)
+        fields = FieldValues({"bad": descriptor})
+        for _ in range(2):
+            with pytest.raises(ZeroDivisionError, match="boom"):
+                fields.contains(source, "bad")
+            with pytest.raises(ZeroDivisionError, match="boom"):
+                fields.get(source, "bad")
+        assert fields.resolve(source, "bad")[0] is FieldState.ERROR
+        assert descriptor.calls == 1
+
+    def test_error_traceback_not_kept(self, source):
+        def fail(source):
+            raise ZeroDivisionError("boom")
+
+        fields = FieldValues({"bad": Descriptor(fail)})
+        state, exc = fields.resolve(source, "bad")
+        assert isinstance(exc, ZeroDivisionError)
+        assert exc.__traceback__ is None
+
+    def test_missing(self, source):
+        fields = FieldValues({})
+        assert not fields.contains(source, "missing")
+        assert fields.get_defined(source, "missing") is None
+        with pytest.raises(KeyError):
+            fields.get(source, "missing")
+
+    def test_first_stored_wins(self, source):
+        def racing(source):
+            # Simulate another thread resolving the field meanwhile
+            fields.resolved["field"] = FieldState.RESOLVED, "first"
+            return "second"
+
+        fields = FieldValues({"field": Descriptor(racing)})
+        assert fields.get(source, "field") == "first"
+
+
+class TestDummyCache:
+    def test_get_or_create(self, mocker):
+        creator = mocker.Mock(name="creator", spec=())
+        cache = DummyCache()
+        assert cache.get_or_create("key", creator) is creator.return_value
+        assert "key" not in cache
@@ -0,0 +1,131 @@
+import os
+import pickle
+
+import pytest
+
+from lektor_index_pages import sqlstore
+from lektor_index_pages.childids import ChildIds
+from lektor_index_pages.childids import ChildQuery
+from lektor_index_pages.childids import IdTable
+from lektor_index_pages.sqlstore import get_store_filename
+from lektor_index_pages.sqlstore import SqlChildIds
+from lektor_index_pages.sqlstore import SqliteGroupStore
+
+
+@pytest.fixture
+def id_table():
+    return IdTable(["c", "a", "b", "d"])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteGroupStore(str(tmp_path / "groups.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def groups(store, id_table):
+    return store.store("/blog@index-pages/tag", "en", id_table, {"x": ["d", "c", "a"]})
+
+
+@pytest.fixture
+def child_ids(groups):
+    return groups["x"]
+
+
+def test_get_store_filename(lektor_env, monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    filename = get_store_filename(lektor_env)
+    assert filename.startswith(str(tmp_path))
+    assert lektor_env.project.id in filename
+
+
+class TestSqliteGroupStore:
+    def test_store(self, groups):
+        assert set(groups) == {"x"}
+        assert isinstance(groups["x"], SqlChildIds)
+
+    def test_store_ignores_unknown_ids(self, store, id_table):
+        groups = store.store("i", "en", id_table, {"x": ["a", "zz", "a"]})
+        assert len(groups["x"]) == 1
+        assert list(groups["x"]) == ["a"]
+
+    def test_store_replaces(self, store, id_table, child_ids):
+        store.store("/blog@index-pages/tag", "en", id_table, {"y": ["b"]})
+        assert list(child_ids) == []
+
+    def test_store_other_alt(self, store, id_table, child_ids):
+        store.store("/blog@index-pages/tag", "de", id_table, {"x": ["b"]})
+        assert list(child_ids) == ["c", "a", "d"]
+
+    def test_clear(self, store, child_ids):
+        store.clear()
+        assert list(child_ids) == []
+
+    def test_close(self, store):
+        store.close()
+        assert not os.path.exists(store.filename)
+        store.close()
+
+    def test_close_after_file_removed(self, store):
+        os.unlink(store.filename)
+        store.close()
+
+
+class TestSqlChildIds:
+    def test_len(self, child_ids):
+        assert len(child_ids) == 3
+
+    def test_getitem(self, child_ids):
+        assert child_ids[0] == "c"
+        assert child_ids[-1] == "d"
+
+    @pytest.mark.parametrize("index", [3, -4])
+    def test_getitem_out_of_range(self, child_ids, index):
+        with pytest.raises(IndexError):
+            child_ids[index]
+
+    @pytest.mark.parametrize(
+        "index, expected",
+        [
+            (slice(1, None), ["a", "d"]),
+            (slice(None, 2), ["c", "a"]),
+            (slice(2, 1), []),
+            (slice(None, None, 2), ["c", "d"]),
+        ],
+    )
+    def test_getitem_slice(self, child_ids, index, expected):
+        sliced = child_ids[index]
+        assert type(sliced) is ChildIds
+        assert list(sliced) == expected
+
+    def test_iter(self, child_ids):
+        assert list(child_ids) == ["c", "a", "d"]
+
+    def test_iter_batches(self, child_ids, monkeypatch):
+        monkeypatch.setattr(sqlstore, "BATCH_SIZE", 2)
+        assert list(child_ids) == ["c", "a", "d"]
+
+    @pytest.mark.parametrize(
+        "id_, expected",
+        [("c", True), ("d", True), ("b", False), ("x", False), (0, False)],
+    )
+    def test_contains(self, child_ids, id_, expected):
+        assert (id_ in child_ids) is expected
+
+    def test_pickle(self, child_ids):
+        unpickled = pickle.loads(pickle.dumps(child_ids))
+        assert type(unpickled) is ChildIds
+        assert list(unpickled) == ["c", "a", "d"]
+
+    def test_repr(self, child_ids):
+        assert repr(child_ids) == "<SqlChildIds ['c', 'a', 'd']>"
+
+
+def test_paginated_child_query(store, blog_record, lektor_pad):
+    id_table = IdTable(post["_id"] for post in blog_record.children)
+    child_ids = store.store("i", "en", id_table, {"x": id_table.ids})["x"]
+    query = ChildQuery("/blog", lektor_pad, child_ids)
+    assert query.count() == 2
+    assert [post["_id"] for post in query.offset(1).limit(1)] == ["first-post"]
@@ -0,0 +1,83 @@
+from array import array
+
+import pytest
+
+from lektor_index_pages.stats import deep_sizeof
+from lektor_index_pages.stats import iter_index_stats
+from lektor_index_pages.stats import iter_objects
+from lektor_index_pages.stats import LevelStats
+
+
+class Test_iter_index_stats:
+    @pytest.fixture
+    def index_stats(self, config, lektor_pad, plugin):
+        return list(iter_index_stats(config, lektor_pad, plugin.cache))
+
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test_levels(self, index_stats):
+        (stats,) = index_stats
+        assert stats.index_name == "year-index"
+        assert stats.alt == "_primary"
+        assert stats.levels == (
+            LevelStats("year-index", 1, 2, 2, 1),
+            LevelStats("year-index.bymonth", 2, 1, 1, 2),
+        )
+
+    @pytest.mark.parametrize("pagination_enabled", [1])
+    def test_pages(self, index_stats):
+        (stats,) = index_stats
+        assert stats.levels == (LevelStats("year-index", 1, 2, 2, 2),)
+
+    def test_cost(self, index_stats, plugin):
+        (stats,) = index_stats
+        assert stats.seconds > 0
+        assert stats.cache_bytes > 0
+
+    def test_no_parent_record(self, config, lektor_pad, plugin):
+        config.index_models["year-index"].parent_path = "/missing"
+        assert list(iter_index_stats(config, lektor_pad, plugin.cache)) == []
+
+
+class Test_deep_sizeof:
+    def test_counts_contents(self):
+        assert deep_sizeof(["x" * 1000]) > 1000
+
+    def test_counts_shared_objects_once(self):
+        shared = "x" * 1000
+        assert deep_sizeof([shared, shared]) < 2000
+
+    def test_follows_dicts(self):
+        assert deep_sizeof({"k": "x" * 1000}) > 1000
+        assert deep_sizeof({"x" * 1000: 1}) > 1000
+
+    def test_follows_slots_and_instance_dicts(self):
+        class Slotted:
+            __slots__ = ("value", "unset")
+
+            def __init__(self, value):
+                self.value = value
+
+        class Plain:
+            def __init__(self, value):
+                self.value = value
+
+        assert deep_sizeof(Slotted("x" * 1000)) > 1000
+        assert deep_sizeof(Plain("x" * 1000)) > 1000
+
+    def test_array(self):
+        assert deep_sizeof(array("I", range(1000))) >= 4000
+
+
+class Test_iter_objects:
+    def test_include(self):
+        big = "x" * 1000
+        roots = [[big, (1, 2)]]
+        objs = list(iter_objects(roots, include=lambda obj: obj is not big))
+        assert big not in objs
+        assert (1, 2) in objs
+
+    def test_seen(self):
+        shared = ["shared"]
+        seen = set()
+        assert shared in list(iter_objects([shared], seen))
+        assert list(iter_objects([[shared]], seen)) == [[shared]]
@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+
+from lektor_index_pages.config import ResolvedPath
+from lektor_index_pages.plugin import Cache
+from lektor_index_pages.urlmap import build_url_map
+from lektor_index_pages.urlmap import lookup_url_path
+from lektor_index_pages.urlmap import UrlMapper
+from lektor_index_pages.urlmap import UrlMisses
+
+
+@pytest.fixture
+def url_map(config, blog_record):
+    return build_url_map(config, blog_record)
+
+
+class Test_build_url_map:
+    def test(self, url_map):
+        assert url_map == {("2020",): ("year-index", ResolvedPath(("2020",), None))}
+
+    @pytest.mark.parametrize("month_index_enabled", [True])
+    def test_subindexes(self, url_map):
+        assert list(url_map) == [("2020",), ("2020", "04"), ("2020", "03")]
+        assert url_map["2020", "03"] == (
+            "year-index",
+            ResolvedPath(("2020", "03"), None),
+        )
+
+    @pytest.mark.parametrize("pagination_enabled", [1])
+    def test_paginated(self, url_map):
+        assert url_map == {
+            ("2020",): ("year-index", ResolvedPath(("2020",), 1)),
+            ("2020", "page", "2"): ("year-index", ResolvedPath(("2020",), 2)),
+        }
+
+    def test_no_indexes(self, config, lektor_pad):
+        assert build_url_map(config, lektor_pad.get("/")) == {}
+
+
+class Test_lookup_url_path:
+    def test(self, config, blog_record, url_map):
+        source = lookup_url_path(config, blog_record, url_map, ["2020"])
+        assert source.path == "/blog@index-pages/year-index/2020"
+
+    @pytest.mark.parametrize("pagination_enabled", [1])
+    def test_paginated(self, config, blog_record, url_map):
+        source = lookup_url_path(config, blog_record, url_map, ["2020", "page", "2"])
+        assert source.page_num == 2
+
+    def test_miss(self, config, blog_record, url_map):
+        assert lookup_url_path(config, blog_record, url_map, ["2021"]) is None
+
+
+class TestUrlMapper:
+    @pytest.fixture
+    def url_mapper(self, plugin):
+        url_mapper = UrlMapper(plugin.cache)
+        yield url_mapper
+        url_mapper.wait()
+
+    @pytest.fixture
+    def release(self, monkeypatch):
+        # Block building of url maps until released
+        release = threading.Event()
+
+        def build_url_map_(config, record):
+            release.wait()
+            return build_url_map(config, record)
+
+        monkeypatch.setattr("lektor_index_pages.urlmap.build_url_map", build_url_map_)
+        yield release
+        release.set()
+
+    def test_get_url_map(self, url_mapper, config, blog_record):
+        assert url_mapper.get_url_map(config, blog_record) is None
+        url_mapper.wait()
+        url_map = url_mapper.get_url_map(config, blog_record)
+        assert url_map == build_url_map(config, blog_record)
+
+    def test_built_once(self, url_mapper, config, blog_record, release):
+        assert url_mapper.get_url_map(config, blog_record) is None
+        assert url_mapper.get_url_map(config, blog_record) is None
+        assert len(url_mapper.pending) == 1
+        release.set()
+        url_mapper.wait()
+        assert url_mapper.pending == {}
+        assert url_mapper.get_url_map(config, blog_record) is not None
+
+    def test_discarded_if_cache_cleared(
+        self, url_mapper, plugin, config, blog_record, release
+    ):
+        assert url_mapper.get_url_map(config, blog_record) is None
+        plugin.cache.clear()
+        release.set()
+        url_mapper.wait()
+        assert ("url_map", "/blog", blog_record.alt) not in plugin.cache
+
+    def test_missing_record(self, url_mapper, plugin, config, lektor_pad):
+        record = lektor_pad.get("/blog")
+        url_mapper._refresh(config, lektor_pad.db, "/missing", record.alt, 0)
+        url_mapper.wait()
+        assert ("url_map", "/missing", record.alt) not in plugin.cache
+
+    def test_failure(self, url_mapper, plugin, config, blog_record, mocker, caplog):
+        build_url_map_ = mocker.patch(
+            "lektor_index_pages.urlmap.build_url_map", side_effect=RuntimeError("boom")
+        )
+        for _ in range(2):
+            assert url_mapper.get_url_map(config, blog_record) is None
+            url_mapper.wait()
+        assert build_url_map_.call_count == 1
+        assert "building the URL map for /blog failed" in caplog.text
+        assert url_mapper.pending == {}
+
+        # The map is built again once the cache has been cleared
+        plugin.cache.clear()
+        assert url_mapper.get_url_map(config, blog_record) is None
+        url_mapper.wait()
+        assert build_url_map_.call_count == 2
+
+
+class TestUrlMisses:
+    @pytest.fixture
+    def cache(self):
+        return Cache()
+
+    def test_add(self, cache):
+        misses = UrlMisses(cache)
+        key = "/blog", "en", ("missing",)
+        assert key not in misses
+        misses.add(key, cache.generation)
+        assert key in misses
+
+    def test_bounded(self, cache):
+        misses = UrlMisses(cache, maxsize=2)
+        keys = [("/blog", "en", (str(n),)) for n in range(3)]
+        misses.add(keys[0], cache.generation)
+        misses.add(keys[1], cache.generation)
+        assert keys[0] in misses  # now most recently used
+        misses.add(keys[2], cache.generation)
+        assert keys[1] not in misses
+        assert keys[0] in misses
+        assert keys[2] in misses
+
+    def test_invalidated_by_clear(self, cache):
+        misses = UrlMisses(cache)
+        key = "/blog", "en", ("missing",)
+        misses.add(key, cache.generation)
+        cache.clear()
+        assert key not in misses
+
+    def test_stale_miss_ignored(self, cache):
+        misses = UrlMisses(cache)
+        key = "/blog", "en", ("missing",)
+        generation = cache.generation
+        cache.clear()
+        misses.add(key, generation)
+        assert key not in misses